@@ -0,0 +1,177 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# clipboard_bench.py -- latency, throughput and memory benchmarks
+#
+# Usage:
+#   python -m benchmarks.clipboard_bench [--backend memory] [--quick] [--output results.json]
+#   python -m benchmarks.clipboard_bench --backend gtk --xvfb
+
+import os
+import argparse
+import contextlib
+
+from PIL import Image as PilImage
+
+from .common import measure, metadata, max_rss_bytes, write_results, Xvfb
+
+KB = 1024
+MB = 1024 * KB
+
+TEXT_SIZES = [1 * KB, 10 * KB, 100 * KB, 1 * MB, 10 * MB, 100 * MB]
+IMAGE_SIZES = [(100, 100), (640, 480), (1920, 1080), (3840, 2160), (7680, 4320)]
+
+QUICK_TEXT_LIMIT = 1 * MB
+QUICK_IMAGE_LIMIT = 1920 * 1080
+
+
+def make_text(size):
+    """
+    Builds an ASCII string of `size` characters.
+    """
+    chunk = 'The quick brown fox jumps over the lazy dog. 0123456789\n'
+    return (chunk * (size // len(chunk) + 1))[:size]
+
+
+def make_image(size, mode='RGB'):
+    """
+    Builds a noise image, which does not compress well, of the given size.
+    """
+    bands = len(mode)
+    return PilImage.frombytes(mode, size, os.urandom(size[0] * size[1] * bands))
+
+
+def bench_text(clipboard, sizes, repeat):
+    results = []
+    for size in sizes:
+        text = make_text(size)
+        set_stats = measure(lambda: clipboard.set_text(text), repeat, nbytes=size)
+        get_stats = measure(clipboard.get_text, repeat, nbytes=size)
+        results.append(dict(name='set_text', size=size, **set_stats))
+        results.append(dict(name='get_text', size=size, **get_stats))
+    return results
+
+
+def bench_image(clipboard, sizes, repeat, mode):
+    results = []
+    for size in sizes:
+        image = make_image(size, mode)
+        nbytes = size[0] * size[1] * len(mode)
+        label = '{}x{}'.format(*size)
+        set_stats = measure(lambda: clipboard.set_image(image), repeat, nbytes=nbytes)
+        get_stats = measure(clipboard.get_image, repeat, nbytes=nbytes)
+        results.append(dict(name='set_image', size=label, mode=mode, **set_stats))
+        results.append(dict(name='get_image', size=label, mode=mode, **get_stats))
+    return results
+
+
+def load_converters():
+    """
+    Returns the toolkit converters that can be imported here.
+
+    :returns dict: Name to converter instance
+    """
+    converters = {}
+    try:
+        import gi
+        gi.require_version('GdkPixbuf', '2.0')
+        # gtkbackend swallows a missing pygobject, so check for it here
+        from gi.repository import GdkPixbuf
+        from crossclip.gtkbackend import GtkImageConverter
+        converters['gtk'] = GtkImageConverter()
+    except (ImportError, ValueError):
+        pass
+    try:
+        from crossclip.qtbackend import QtImageConverter
+        converters['qt'] = QtImageConverter()
+    except ImportError:
+        pass
+    return converters
+
+
+def bench_converters(sizes, repeat, mode):
+    results = []
+    for name, converter in load_converters().items():
+        for size in sizes:
+            image = make_image(size, mode)
+            nbytes = size[0] * size[1] * len(mode)
+            label = '{}x{}'.format(*size)
+            native = converter.from_pillow(image)
+            from_stats = measure(lambda: converter.from_pillow(image), repeat, nbytes=nbytes)
+            to_stats = measure(lambda: converter.to_pillow(native), repeat, nbytes=nbytes)
+            results.append(dict(name='from_pillow', converter=name, size=label, mode=mode, **from_stats))
+            results.append(dict(name='to_pillow', converter=name, size=label, mode=mode, **to_stats))
+    return results
+
+
+def run(backend='memory', quick=False, repeat=5, mode='RGB', converters=True):
+    """
+    Runs the whole suite against `backend`.
+
+    :param backend: Registered backend name (default: 'memory')
+    :param quick: If true, skip the largest payloads (default: False)
+    :param repeat: Timed runs per case (default: 5)
+    :param mode: Pillow mode of the test images (default: 'RGB')
+    :param converters: If true, also benchmark the toolkit converters (default: True)
+    :returns dict: Results document
+    """
+    # Imported here so --xvfb can set DISPLAY before any toolkit loads
+    from crossclip.registry import default_registry
+    from crossclip.clipboard import Clipboard
+
+    text_sizes = TEXT_SIZES
+    image_sizes = IMAGE_SIZES
+    if quick:
+        text_sizes = [s for s in TEXT_SIZES if s <= QUICK_TEXT_LIMIT]
+        image_sizes = [s for s in IMAGE_SIZES if s[0] * s[1] <= QUICK_IMAGE_LIMIT]
+
+    # Repeated writes of the same payload would otherwise only be hashed and skipped
+    clipboard = Clipboard(default_registry.load(backend), deduplicate=False)
+    results = []
+    results += bench_text(clipboard, text_sizes, repeat)
+    results += bench_image(clipboard, image_sizes, repeat, mode)
+    if converters:
+        results += bench_converters(image_sizes, repeat, mode)
+
+    for result in results:
+        result['backend'] = backend
+
+    meta = metadata()
+    meta['backend'] = backend
+    meta['max_rss_bytes'] = max_rss_bytes()
+    return {'meta': meta, 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark crossclip backends')
+    parser.add_argument('--backend', default='memory', help="backend name (default: 'memory')")
+    parser.add_argument('--quick', action='store_true', help='skip payloads larger than 1 MB / 1080p')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (default: 5)')
+    parser.add_argument('--mode', default='RGB', choices=['RGB', 'RGBA'], help='image mode (default: RGB)')
+    parser.add_argument('--no-converters', action='store_true', help='skip the converter benchmarks')
+    parser.add_argument('--xvfb', action='store_true', help='run against a private Xvfb server')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    display = Xvfb() if args.xvfb else contextlib.nullcontext()
+    with display:
+        results = run(args.backend, args.quick, args.repeat, args.mode, not args.no_converters)
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
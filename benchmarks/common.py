@@ -0,0 +1,154 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# common.py -- shared helpers for the benchmark scripts
+
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import statistics
+import subprocess
+import tracemalloc
+
+
+def measure(func, repeat=5, nbytes=None, trace_memory=True):
+    """
+    Times `func` and optionally records its peak Python heap usage.
+
+    :param func: Callable taking no arguments
+    :param repeat: Number of timed runs (default: 5)
+    :param nbytes: Payload size used to compute throughput (default: None)
+    :param trace_memory: If true, one extra run is made under tracemalloc (default: True)
+    :returns dict: Timing statistics in seconds, throughput in MB/s and peak bytes
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    result = {
+        'repeat': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.mean(timings),
+    }
+    if nbytes is not None:
+        result['bytes'] = nbytes
+        result['throughput_mb_s'] = nbytes / result['median_s'] / 1e6 if result['median_s'] else None
+
+    if trace_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def metadata():
+    """
+    Describes the machine and interpreter a run was made on.
+
+    :returns dict: Run metadata
+    """
+    return {
+        'time': time.time(),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def max_rss_bytes():
+    """
+    Returns the peak resident set size of the process, if available.
+
+    :returns int: Peak RSS in bytes, or None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def write_results(results, output=None):
+    """
+    Writes results as JSON to `output`, or to stdout.
+
+    :param results: JSON serializable results
+    :param output: Path of the output file, or None for stdout
+    """
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output is None:
+        print(text)
+    else:
+        with open(output, 'w') as fh:
+            fh.write(text)
+            fh.write('\n')
+
+
+class Xvfb:
+    """ Runs a private Xvfb server for the lifetime of the context
+
+    The DISPLAY environment variable is pointed at the server while it runs,
+    so toolkits imported inside the context connect to it.
+    """
+
+    def __init__(self, display=':99', screen='1920x1080x24'):
+        self.display = display
+        self.screen = screen
+        self.process = None
+        self._old_display = None
+
+    def __enter__(self):
+        xvfb = shutil.which('Xvfb')
+        if xvfb is None:
+            raise RuntimeError('Xvfb is not installed')
+        self.process = subprocess.Popen([xvfb, self.display, '-screen', '0', self.screen, '-nolisten', 'tcp'],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Wait for the server socket to appear
+        socket_path = '/tmp/.X11-unix/X{}'.format(self.display.lstrip(':').split('.')[0])
+        deadline = time.monotonic() + 10
+        while not os.path.exists(socket_path):
+            if self.process.poll() is not None or time.monotonic() > deadline:
+                self.process.kill()
+                raise RuntimeError('Xvfb failed to start')
+            time.sleep(0.05)
+        self._old_display = os.environ.get('DISPLAY')
+        os.environ['DISPLAY'] = self.display
+        return self
+
+    def __exit__(self, *exc):
+        if self._old_display is None:
+            os.environ.pop('DISPLAY', None)
+        else:
+            os.environ['DISPLAY'] = self._old_display
+        self.process.terminate()
+        self.process.wait()
+        return False
@@ -0,0 +1,141 @@
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# encoding_bench.py -- cost of the image wire encodings
+#
+# Usage:
+#   python -m benchmarks.encoding_bench [--quick] [--output results.json]
+
+import argparse
+
+from PIL import Image as PilImage
+from PIL import ImageDraw
+
+from .common import measure, metadata, max_rss_bytes, write_results
+from .clipboard_bench import make_image
+
+IMAGE_SIZES = [(640, 480), (1920, 1080), (3840, 2160)]
+QUICK_IMAGE_LIMIT = 1920 * 1080
+
+ENCODINGS = [
+    ('bmp', {}),
+    ('png', dict(compress_level=0)),
+    ('png', dict(compress_level=1)),
+    ('png', dict(compress_level=6)),
+    ('png', dict(compress_level=9)),
+    ('jpeg', dict(quality=75)),
+    ('jpeg', dict(quality=90)),
+    ('webp', dict(quality=90)),
+]
+""" (encoding name, `ImageEncoding` settings) pairs to measure
+"""
+
+
+def make_screenshot(size, mode='RGB'):
+    """
+    Builds a screenshot-like image of flat areas and text, which compresses well.
+    """
+    image = PilImage.new(mode, size, (240, 240, 240, 255)[:len(mode)])
+    draw = ImageDraw.Draw(image)
+    for y in range(0, size[1], 20):
+        draw.text((10, y), 'The quick brown fox jumps over the lazy dog. ' * 8, fill=(0, 0, 0, 255)[:len(mode)])
+    draw.rectangle((size[0] // 5, size[1] // 4, size[0] // 2, size[1] // 2), fill=(30, 90, 160, 255)[:len(mode)])
+    return image
+
+
+def bench_codecs(content, image, repeat):
+    """
+    Measures encoding and decoding alone, per encoding and setting.
+    """
+    from crossclip.encoding import ImageEncoding, ENCODING_TARGETS, decode_image
+
+    results = []
+    nbytes = image.size[0] * image.size[1] * len(image.mode)
+    label = '{}x{}'.format(*image.size)
+    for name, settings in ENCODINGS:
+        encoding = ImageEncoding(name, **settings)
+        target = ENCODING_TARGETS[name]
+        data = encoding.encode(image, target)
+        encode_stats = measure(lambda: encoding.encode(image, target), repeat, nbytes=nbytes, trace_memory=False)
+        decode_stats = measure(lambda: decode_image(data), repeat, nbytes=nbytes, trace_memory=False)
+        common = dict(encoding=name, content=content, size=label, encoded_bytes=len(data), **settings)
+        results.append(dict(name='encode', **common, **encode_stats))
+        results.append(dict(name='decode', **common, **decode_stats))
+    return results
+
+
+def bench_round_trip(content, image, repeat):
+    """
+    Measures a set_image followed by a get_image on `MemoryBackend`, including
+    target negotiation, for the toolkit's default and for each encoding.
+    """
+    from crossclip.clipboard import Clipboard
+    from crossclip.memorybackend import MemoryBackend
+    from crossclip.encoding import ImageEncoding
+
+    results = []
+    nbytes = image.size[0] * image.size[1] * len(image.mode)
+    label = '{}x{}'.format(*image.size)
+    policies = [('default', {}, None)] + [(name, settings, ImageEncoding(name, **settings))
+                                         for name, settings in ENCODINGS]
+    for name, settings, encoding in policies:
+        clipboard = Clipboard(MemoryBackend, deduplicate=False, image_encoding=encoding)
+
+        def round_trip():
+            clipboard.set_image(image)
+            clipboard.get_image()
+
+        stats = measure(round_trip, repeat, nbytes=nbytes, trace_memory=False)
+        results.append(dict(name='round_trip', encoding=name, content=content, size=label, **settings, **stats))
+    return results
+
+
+def run(quick=False, repeat=5, mode='RGB'):
+    """
+    Measures every encoding on screenshot-like and noise images.
+
+    :param quick: If true, skip images larger than 1080p (default: False)
+    :param repeat: Timed runs per case (default: 5)
+    :param mode: Pillow mode of the test images (default: 'RGB')
+    :returns dict: Results document
+    """
+    sizes = IMAGE_SIZES
+    if quick:
+        sizes = [s for s in IMAGE_SIZES if s[0] * s[1] <= QUICK_IMAGE_LIMIT]
+
+    results = []
+    for size in sizes:
+        for content, image in (('screenshot', make_screenshot(size, mode)), ('noise', make_image(size, mode))):
+            results += bench_codecs(content, image, repeat)
+            results += bench_round_trip(content, image, repeat)
+
+    meta = metadata()
+    meta['max_rss_bytes'] = max_rss_bytes()
+    return {'meta': meta, 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the image wire encodings')
+    parser.add_argument('--quick', action='store_true', help='skip images larger than 1080p')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per case (default: 5)')
+    parser.add_argument('--mode', default='RGB', choices=['RGB', 'RGBA'], help='image mode (default: RGB)')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+    write_results(run(args.quick, args.repeat, args.mode), args.output)
+
+
+if __name__ == '__main__':
+    main()
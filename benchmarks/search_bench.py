@@ -0,0 +1,105 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# search_bench.py -- query latency of the clipboard text index
+#
+# Usage:
+#   python -m benchmarks.search_bench [--entries 1000000] [--output results.json]
+
+import time
+import random
+import argparse
+
+from .common import measure, metadata, max_rss_bytes, write_results
+
+WORDS = ('alpha bravo charlie delta echo foxtrot golf hotel india juliett kilo lima '
+         'mike november oscar papa quebec romeo sierra tango uniform victor whiskey '
+         'xray yankee zulu import return class def self print lambda yield async '
+         'await http https www example com user admin password token config').split()
+
+
+def make_entry(rng):
+    """
+    Builds a clipboard-like snippet of a few words and an identifier.
+    """
+    words = rng.choices(WORDS, k=rng.randint(3, 12))
+    words.insert(rng.randrange(len(words)), 'id{:07d}'.format(rng.randrange(10 ** 7)))
+    return ' '.join(words)
+
+
+def build(entries, seed=0):
+    """
+    Fills an index with one entry per second, ending now.
+
+    :returns: (index, seconds spent indexing)
+    """
+    from crossclip.search import TextIndex
+
+    rng = random.Random(seed)
+    index = TextIndex()
+    start_time = time.time() - entries
+    start = time.perf_counter()
+    for i in range(entries):
+        index.add(make_entry(rng), when=start_time + i)
+    return index, time.perf_counter() - start
+
+
+def run(entries=1000000, repeat=20, seed=0):
+    """
+    Measures indexing throughput and query latency.
+
+    :param entries: Number of indexed texts (default: 1000000)
+    :param repeat: Timed runs per query (default: 20)
+    :param seed: Seed of the generated texts (default: 0)
+    :returns dict: Results document
+    """
+    index, build_s = build(entries, seed)
+    now = time.time()
+    queries = [
+        ('substring_rare', dict(query='id00123')),
+        ('substring_common', dict(query='tango')),
+        ('substring_common_all', dict(query='tango', limit=None)),
+        ('substring_miss', dict(query='zzzz')),
+        ('prefix', dict(query='passw', prefix=True)),
+        ('substring_last_day', dict(query='tango', since=now - 86400, limit=None)),
+        ('short_scan', dict(query='q', limit=10)),
+    ]
+
+    results = [dict(name='build', entries=entries, seconds=build_s,
+                    entries_per_s=entries / build_s if build_s else None)]
+    for name, kwargs in queries:
+        stats = measure(lambda: index.search(**kwargs), repeat, trace_memory=False)
+        matches = len(index.search(**kwargs))
+        results.append(dict(name=name, entries=entries, matches=matches, **stats))
+
+    meta = metadata()
+    meta['max_rss_bytes'] = max_rss_bytes()
+    return {'meta': meta, 'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the clipboard text index')
+    parser.add_argument('--entries', type=int, default=1000000, help='indexed texts (default: 1000000)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per query (default: 20)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated texts (default: 0)')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    args = parser.parse_args(argv)
+    write_results(run(args.entries, args.repeat, args.seed), args.output)
+
+
+if __name__ == '__main__':
+    main()
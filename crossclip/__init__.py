@@ -1,10 +1,9 @@
 
 
-import sys
-import os
+from .registry import default_registry, BackendsView
 
-# Do some cross-platform importing. This module does not support
-# cygwin. 
+# Do some cross-platform backend selection. This module does not support
+# cygwin.
 # On linux, the system first looks for Gtk via PyGObject.
 # If that is not found, then it tries to get Qt. If neither are
 # found, then an error is thrown. Ill try to support more formats
@@ -15,58 +14,34 @@ import os
 # adding fallback support to use pb(copy|paste) as a backup.
 # On windows, use the win32clipboard module. If that's not found, then
 # no dice.
-
-platform_backend = None
-
-backends = {
-    'gtk': None,
-    'qt': None,
-    'apple': None,
-    'win': None
-}
-
-if sys.platform == 'linux':
-    # Get current desktop
-    current_desktop = os.environ.get('XDG_CURRENT_DESKTOP')
-    if current_desktop in ['MATE', 'GNOME', 'X-Cinnamon', 'LXDE', 'XFCE', 'Unity']:
-        # USE GTK AS BACKEND
-        platform_backend = 'gtk'
-        from .gtkbackend import GtkBackend
-        backends['gtk'] = GtkBackend
-    elif current_desktop in ['LXQt', 'KDE', ]:
-        # USE QT AS BACKEND
-        platform_backend = 'qt'
-        from .qtbackend import QtBackend
-        backends['qt'] = QtBackend
-    else:
-        # This block checks to see if using the Xfce4 desktop
-        try:
-            pipe = os.popen('xprop -root _DT_SAVE_MODE')
-            if ' = "xfce4"' in pipe.read():
-                platform_backend = 'gtk'
-                from .gtkbackend import GtkBackend
-                backends['gtk'] = GtkBackend
-            pipe.close()
-        except (OSError, RuntimeError):
-            raise RuntimeError('Not using a GTK or Qt-based Desktop')
-
-elif sys.platform == 'darwin':
-    try:
-        # Try getting PyObjC
-        from AppKit import NSPasteboard, NSStringPboardType
-        from PIL import ImageGrab as PilImageGrab
-
-        platform_backend = 'apple'
-    except ModuleNotFoundError:
-        raise RuntimeError("You need PyObjC if you are running on mac")
-
-elif sys.platform == 'win32':
-    try:
-        platform_backend = 'win'
-        from .winbackend import WindowsBackend
-        backends['win'] = WindowsBackend
-    except ModuleNotFoundError:
-        raise RuntimeError("You need pywin32 to run on windows")
-else:
-    raise RuntimeError('Your platform is not supported')
-
+#
+# Nothing is probed or imported here. The platform is detected the first time
+# a backend is needed (usually the first `Clipboard()`), and the result is
+# cached by `crossclip.registry.default_registry`.
+
+backends = BackendsView(default_registry)
+""" Mapping of backend name to backend class. Backends are imported on lookup.
+"""
+
+
+def select_backend(backend=None, disk_cache=None):
+    """
+    Selects the backend used by `Clipboard()` when none is given explicitly.
+
+    :param backend: Backend name (e.g 'gtk') or backend class. If None, the
+                    backend matching the platform is probed (default: None)
+    :param disk_cache: Path of an on-disk probe cache, True for the default
+                       location, False to disable it, or None to honour the
+                       CROSSCLIP_PROBE_CACHE environment variable (default: None)
+    :returns: Selected backend class
+    :raises RuntimeError: If no usable backend is found
+    """
+    return default_registry.select(backend, disk_cache)
+
+
+def __getattr__(name):
+    # `platform_backend` used to be computed at import time. It is now
+    # resolved on first access so that importing crossclip stays cheap.
+    if name == 'platform_backend':
+        return default_registry.current()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
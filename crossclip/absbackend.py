@@ -19,14 +19,79 @@
 
 import sys
 import os
+import time
+import threading
+from collections import namedtuple
 from abc import ABC, abstractmethod, abstractstaticmethod, abstractproperty
 
+from .targets import is_text_target, is_image_target
+from .scaling import fit_size, scale_pillow
+
+Conversion = namedtuple('Conversion', ['source', 'target', 'cost', 'function'])
+Conversion.__doc__ = """ A direct conversion between two image forms
+
+The forms are `image_str` values (e.g 'pil' or 'gdk-pixbuf'). `cost` is a
+relative weight used to choose between paths, and `function` takes an image of
+the source form and returns one of the target form.
+"""
+
+class ClipboardChange:
+    """ Describes a change of the clipboard contents
+
+    Change notifications never carry the payload. The list of targets offered
+    by the new owner is only fetched if `targets` is read.
+    """
+
+    def __init__(self, targets=None, timestamp=None):
+        """
+        :param targets: List of target names, or a callable returning it
+        :param timestamp: Toolkit timestamp of the change, if it provides one
+        """
+        self._targets = targets
+        self.timestamp = timestamp
+        """ Toolkit timestamp of the change (e.g the X server time), or None
+        """
+        self.time = time.time()
+        """ Time the change was received, in seconds since the epoch
+        """
+        self.count = 0
+        """ Value of the backend's `change_count` after this change
+        """
+
+    @property
+    def targets(self):
+        """
+        Targets (e.g 'text/plain', 'image/png') offered after the change. Reading
+        this may cost a round trip to the clipboard owner.
+
+        :returns list: Target names, or None if unknown
+        """
+        if callable(self._targets):
+            self._targets = self._targets()
+        return self._targets
+
+    def __repr__(self):
+        return 'ClipboardChange(count={}, timestamp={})'.format(self.count, self.timestamp)
+
+
 class AbstractBackend(ABC):
     """ Interface for all clipboard backends
 
     This class is an interface for all clipboard backends to
     be registered into.
     """
+    change_count = 0
+    """ Number of clipboard changes seen since change notifications were enabled
+    """
+    has_events = False
+    """ True if `process_events` waits on a toolkit event source that `wakeup`
+    can interrupt, so it can be given no timeout at all
+    """
+    notifies_in_background = False
+    """ True if change listeners run without anyone calling `process_events`:
+    from a thread of the backend, or from a toolkit main loop running
+    elsewhere. Waiting for a change then takes no event dispatching
+    """
     @abstractmethod
     def get_text(self):
         """ Synchronously gets text from clipboard
@@ -59,11 +124,235 @@ class AbstractBackend(ABC):
         """
         pass
 
+    def available_targets(self):
+        """ Lists the targets the clipboard owner offers, without fetching any
+
+        :returns list: Target names, e.g 'text/plain' or 'image/png'
+        :raises NotImplementedError: If the backend can't list targets
+        """
+        raise NotImplementedError('{} cannot list targets'.format(type(self).__name__))
+
+    def has_text(self):
+        """ Tells if text is available
+
+        The default implementation looks at `available_targets`, falling back
+        to fetching the text.
+
+        :returns bool: True if text can be read
+        """
+        try:
+            return any(is_text_target(target) for target in self.available_targets())
+        except NotImplementedError:
+            return self.get_text() is not None
+
+    def has_image(self):
+        """ Tells if an image is available
+
+        The default implementation looks at `available_targets`, falling back
+        to fetching the image.
+
+        :returns bool: True if an image can be read
+        """
+        try:
+            return any(is_image_target(target) for target in self.available_targets())
+        except NotImplementedError:
+            return self.get_image(self.image_converter.image_str) is not None
+
+    def size_hint(self, target):
+        """ Estimates the payload size of a target without fetching it
+
+        :param target: Target name
+        :returns int: Size in bytes, or None if the protocol doesn't tell
+        """
+        return None
+
+    def get_contents(self, target):
+        """ Synchronously gets the raw bytes of a target
+
+        :param target: Target name, e.g 'text/html'
+        :returns: bytes-like payload, or None if target isn't offered
+        :raises NotImplementedError: If the backend can't read arbitrary targets
+        """
+        raise NotImplementedError('{} cannot read arbitrary targets'.format(type(self).__name__))
+
+    def request_contents(self, target, callback):
+        """ Asynchronously gets the raw bytes of a target
+
+        See `request_text`.
+
+        :param target: Target name
+        :param callback: Called with the bytes-like payload, or None
+        """
+        callback(self.get_contents(target))
+
+    def iter_contents(self, target, chunk_size):
+        """ Reads the raw bytes of a target piece by piece
+
+        The default implementation fetches the whole payload with
+        `get_contents` and slices it without copying; backends that receive
+        the payload in pieces override it to keep memory bounded.
+
+        :param target: Target name
+        :param chunk_size: Largest chunk yielded, in bytes
+        :returns: Iterator of bytes-like chunks, empty if target isn't offered
+        """
+        data = self.get_contents(target)
+        if data is None:
+            return
+        view = memoryview(data).cast('B')
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+
+    def set_data(self, data):
+        """ Offers several targets in a single clipboard ownership
+
+        Nothing is rendered up front: each value is only turned into bytes
+        when a consumer asks for its target.
+
+        :param data: dict of target (e.g 'text/html') to str, bytes, `PIL.Image`,
+                     or a callable returning one of those
+        :raises NotImplementedError: If the backend can't offer arbitrary targets
+        """
+        raise NotImplementedError('{} cannot offer arbitrary targets'.format(type(self).__name__))
+
+    def request_text(self, callback):
+        """ Asynchronously gets text from clipboard
+
+        The callback runs from `process_events` once the text arrives. The
+        default implementation calls `get_text` and runs the callback
+        immediately; backends with a non-blocking API override it. A backend
+        able to abort a read in flight returns a callable doing so, which
+        `crossclip.timeouts.ReadRequest.cancel` calls.
+
+        :param callback: Called with the text, or None
+        :returns: Callable aborting the read, or None
+        """
+        callback(self.get_text())
+
+    def request_image(self, callback):
+        """ Asynchronously gets the native image from clipboard
+
+        See `request_text`.
+
+        :param callback: Called with the image of type `image_converter.image_type`, or None
+        """
+        callback(self.get_image(self.image_converter.image_str))
+
+    def request_targets(self, callback):
+        """ Asynchronously lists the offered targets
+
+        See `request_text`.
+
+        :param callback: Called with the list of target names
+        :raises NotImplementedError: If the backend can't list targets
+        """
+        callback(self.available_targets())
+
+    def process_events(self, timeout=0):
+        """ Dispatches pending toolkit events
+
+        This runs the callbacks of outstanding `request_*` calls and change
+        listeners. The default implementation has nothing to dispatch and
+        just waits out the timeout.
+
+        :param timeout: Longest time to wait for an event, in seconds, or None
+                        to wait until one arrives or `wakeup` is called. None
+                        is only meaningful if `has_events` is true (default: 0)
+        """
+        if timeout:
+            time.sleep(timeout)
+
+    def wakeup(self):
+        """ Makes a waiting `process_events` return
+
+        Safe to call from any thread. If nothing is waiting, the next
+        `process_events` returns without waiting. Backends setting
+        `has_events` override this.
+        """
+        pass
+
+    def close(self):
+        """ Releases what the backend holds on the toolkit
+
+        Backends sharing a process-wide toolkit connection leave it open.
+        The default implementation has nothing to release.
+        """
+        pass
+
+    def owns_clipboard(self):
+        """ Tells if this process currently owns the clipboard
+
+        :returns: True or False, or None if the backend can't tell
+        """
+        return None
+
+    def call_later(self, delay, callback):
+        """ Runs a callback after a delay
+
+        Backends run the callback on the thread their toolkit expects. The
+        default implementation uses a timer thread.
+
+        :param delay: Delay in seconds
+        :param callback: Callable taking no arguments
+        :returns: Handle with a `cancel()` method
+        """
+        timer = threading.Timer(delay, callback)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def add_change_listener(self, callback):
+        """ Registers a callback for clipboard changes
+
+        The callback receives a `ClipboardChange` from `process_events` (or the
+        toolkit's own main loop) whenever the clipboard owner changes.
+
+        :param callback: Called with a `ClipboardChange`
+        :returns: Handle to pass to `remove_change_listener`
+        :raises NotImplementedError: If the backend can't report changes
+        """
+        listeners = self.__dict__.get('_change_listeners')
+        if listeners is None:
+            self._connect_changes()
+            listeners = self._change_listeners = []
+        listeners.append(callback)
+        return callback
+
+    def remove_change_listener(self, handle):
+        """ Unregisters a callback added by `add_change_listener`
+
+        :param handle: Handle returned by `add_change_listener`
+        """
+        listeners = self.__dict__.get('_change_listeners', [])
+        if handle in listeners:
+            listeners.remove(handle)
+
+    def _connect_changes(self):
+        """ Hooks up the toolkit's change signal to `_notify_change`
+
+        Backends that can report changes override this.
+        """
+        raise NotImplementedError('{} does not report clipboard changes'.format(type(self).__name__))
+
+    def _notify_change(self, change):
+        """ Counts a change and hands it to the listeners
+
+        :param change: `ClipboardChange` describing it
+        """
+        self.change_count += 1
+        change.count = self.change_count
+        for callback in list(self.__dict__.get('_change_listeners', [])):
+            callback(change)
+
 class AbstractImageConverter(ABC):
     """ Converts an image between a Pillow Image and a native clipboard image
 
     This interface is needed to convert native images to pillow images and vice
-    versa.
+    versa. Converters may also declare direct conversions to other forms, which
+    are preferred over going through Pillow when they are cheaper.
+    """
+    pillow_cost = 10
+    """ Relative cost of `to_pillow` and `from_pillow`
     """
     @abstractproperty
     def image_type(self):
@@ -88,3 +377,31 @@ class AbstractImageConverter(ABC):
         """ Converts a pillow image to native type
         """
         pass
+
+    def conversions(self):
+        """ Returns the conversions this converter provides
+
+        By default these are `to_pillow` and `from_pillow`. Subclasses extend
+        the list with direct conversions to other forms.
+
+        :returns: list of `Conversion`
+        """
+        return [
+            Conversion(self.image_str, 'pil', self.pillow_cost, self.to_pillow),
+            Conversion('pil', self.image_str, self.pillow_cost, self.from_pillow),
+        ]
+
+    def scale(self, native_image, max_size=None, reduce=None):
+        """ Scales a native image down, keeping its aspect ratio
+
+        The default goes through Pillow. Converters whose toolkit can scale
+        natively override this, so that a thumbnail is never converted at
+        full resolution.
+
+        :param native_image: Image of `image_type`
+        :param max_size: (width, height) box to fit in, or None
+        :param reduce: Factor to divide both sides by, or None
+        :returns: Scaled image of `image_type`
+        """
+        image = self.to_pillow(native_image)
+        return self.from_pillow(scale_pillow(image, fit_size(image.size, max_size, reduce)))
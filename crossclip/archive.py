@@ -0,0 +1,402 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# archive.py -- persistent content-addressed clipboard archive
+
+import os
+import json
+import mmap
+import time
+import zlib
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+from PIL import Image as PilImage
+from PIL.Image import Image as PilImageType
+
+from .converters import default_graph
+from .hashing import content_digest
+from .instrument import Instrument, instrumented, phase
+from .targets import encode_image
+from .watch import read_change
+
+INDEX_NAME = 'index.jsonl'
+BLOB_DIRECTORY = 'blobs'
+
+
+class ArchiveRecord:
+    """ Index entry of one distinct archived value
+    """
+    __slots__ = ('digest', 'kind', 'encoding', 'size', 'time', 'count')
+
+    def __init__(self, digest, kind, encoding, size, time, count=1):
+        self.digest = digest
+        """ Hex content digest, also the name of the blob file
+        """
+        self.kind = kind
+        """ 'text' or 'image'
+        """
+        self.encoding = encoding
+        """ How the blob is stored: 'utf-8', 'zlib' (compressed UTF-8) or 'png'
+        """
+        self.size = size
+        """ Size of the blob on disk, in bytes
+        """
+        self.time = time
+        """ Last time the value was archived, in seconds since the epoch
+        """
+        self.count = count
+        """ Number of times the value was archived
+        """
+
+    def to_json(self):
+        return json.dumps({'digest': self.digest, 'kind': self.kind, 'encoding': self.encoding,
+                           'size': self.size, 'time': self.time, 'count': self.count})
+
+    def __repr__(self):
+        return 'ArchiveRecord({}, kind={!r}, size={})'.format(self.digest, self.kind, self.size)
+
+
+class ClipboardArchive:
+    """ On-disk archive of clipboard values
+
+    Each distinct value is stored once, in a blob file named after its
+    content digest; copying the same image again only appends a line to the
+    index. The index is an append-only file of JSON lines, so several
+    processes can read the archive while one writes to it, picking up new
+    entries with `refresh`.
+
+    Blobs are read through memory maps: `get_bytes` hands out a view of the
+    file, and large images never have to be copied into the heap to be
+    served. Text longer than `compress_threshold` is compressed with zlib.
+
+    Removing values only appends tombstones; `compact` rewrites the index
+    and deletes unreferenced blobs. It must not run while another process
+    writes to the archive.
+    """
+
+    compress_threshold = 256
+    """ Texts of at least this many bytes are compressed, if compression is on
+    """
+    instrument = None
+    """ `Instrument` receiving the timings of `store`, or None
+    """
+
+    def __init__(self, path, compress_text=True, instrument=None):
+        """
+        Opens an archive, creating it if needed.
+
+        :param path: Directory holding the archive
+        :param compress_text: If true, long texts are stored compressed (default: True)
+        :param instrument: `Instrument`, or a callable taking an `OperationRecord` (default: None)
+        """
+        self.path = path
+        self.compress_text = compress_text
+        if instrument is not None and not isinstance(instrument, Instrument):
+            instrument = Instrument(instrument)
+        self.instrument = instrument
+        self._index_path = os.path.join(path, INDEX_NAME)
+        self._blob_path = os.path.join(path, BLOB_DIRECTORY)
+        os.makedirs(self._blob_path, exist_ok=True)
+
+        self._records = OrderedDict()
+        self._maps = {}
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, digest):
+        return digest in self._records
+
+    def __iter__(self):
+        """
+        Iterates over the records, most recently archived first.
+        """
+        with self._lock:
+            records = list(reversed(self._records.values()))
+        return iter(records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def get(self, digest):
+        """
+        :param digest: Hex content digest
+        :returns: `ArchiveRecord`, or None if it isn't archived
+        """
+        return self._records.get(digest)
+
+    def refresh(self):
+        """
+        Reads index lines appended since the last refresh, e.g by another
+        process. The whole index is reread if it was compacted meanwhile.
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self._index_path)
+            except FileNotFoundError:
+                return
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                self._records.clear()
+                self._offset = 0
+                self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return
+
+            with open(self._index_path, 'rb') as fh:
+                fh.seek(self._offset)
+                data = fh.read()
+            # A line is only complete, and applied, once its newline is written
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                if line.strip():
+                    self._apply(json.loads(line.decode('utf-8')))
+            self._offset += end
+
+    def _apply(self, entry):
+        digest = entry['digest']
+        if entry.get('deleted'):
+            self._records.pop(digest, None)
+            # Views handed out keep the mapping alive on their own
+            self._maps.pop(digest, None)
+            return
+        record = self._records.pop(digest, None)
+        count = entry.get('count', 1)
+        if record is None:
+            record = ArchiveRecord(digest, entry['kind'], entry['encoding'], entry['size'],
+                                   entry['time'], count)
+        else:
+            record.time = entry['time']
+            record.count += count
+        self._records[digest] = record
+
+    def _append(self, line):
+        with open(self._index_path, 'ab') as fh:
+            fh.write(line.encode('utf-8') + b'\n')
+        self.refresh()
+
+    def _blob_file(self, digest):
+        return os.path.join(self._blob_path, digest[:2], digest)
+
+    def _write_blob(self, digest, data):
+        path = self._blob_file(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _encode(self, value):
+        """
+        :returns: (kind, encoding, blob bytes)
+        """
+        if isinstance(value, str):
+            data = value.encode('utf-8')
+            if self.compress_text and len(data) >= self.compress_threshold:
+                return 'text', 'zlib', zlib.compress(data)
+            return 'text', 'utf-8', data
+        return 'image', 'png', encode_image(value, 'image/png')
+
+    @instrumented('store', 'argument')
+    def store(self, value, when=None):
+        """
+        Archives a value. A value that is already archived isn't written again.
+
+        :param value: Text, or an image of any type known to `default_graph`
+        :param when: Time the value was seen, in seconds since the epoch (default: now)
+        :returns: `ArchiveRecord` of the value
+        :raises RuntimeError: If value can't be archived
+        """
+        if not isinstance(value, (str, PilImageType)):
+            # Hash the pixels, so an image archives alike whatever its type
+            with phase('convert'):
+                try:
+                    value = default_graph.convert(value, 'pil')
+                except RuntimeWarning:
+                    raise RuntimeError('Cannot archive {}'.format(type(value).__name__))
+        with phase('hash'):
+            digest = content_digest(value)
+        if digest is None:
+            raise RuntimeError('Cannot archive {}'.format(type(value).__name__))
+        digest = digest.hex()
+        when = time.time() if when is None else when
+
+        with self._lock:
+            self.refresh()
+            record = self._records.get(digest)
+            if record is not None and os.path.exists(self._blob_file(digest)):
+                kind, encoding, size = record.kind, record.encoding, record.size
+            else:
+                with phase('encode'):
+                    kind, encoding, data = self._encode(value)
+                size = len(data)
+                with phase('write'):
+                    self._write_blob(digest, data)
+            with phase('write'):
+                self._append(ArchiveRecord(digest, kind, encoding, size, when).to_json())
+            return self._records[digest]
+
+    def get_bytes(self, digest):
+        """
+        Maps the stored blob of a value. The view stays valid as long as it is
+        referenced, even if the value is removed or the archive closed.
+
+        :param digest: Hex content digest
+        :returns memoryview: Stored bytes (compressed or PNG encoded, see
+                             `ArchiveRecord.encoding`), or None if not archived
+        """
+        with self._lock:
+            if digest not in self._records:
+                return None
+            mapped = self._maps.get(digest)
+            if mapped is None:
+                try:
+                    fh = open(self._blob_file(digest), 'rb')
+                except FileNotFoundError:
+                    # Removed and compacted away by another process
+                    self.refresh()
+                    return None
+                with fh:
+                    if os.fstat(fh.fileno()).st_size == 0:
+                        return memoryview(b'')
+                    mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[digest] = mapped
+            return memoryview(mapped)
+
+    def get_text(self, digest):
+        """
+        :param digest: Hex content digest
+        :returns str: Archived text, or None if digest isn't an archived text
+        """
+        record = self.get(digest)
+        if record is None or record.kind != 'text':
+            return None
+        data = self.get_bytes(digest)
+        if data is None:
+            return None
+        if record.encoding == 'zlib':
+            return zlib.decompress(data).decode('utf-8')
+        return str(data, 'utf-8')
+
+    def get_image(self, digest):
+        """
+        :param digest: Hex content digest
+        :returns PIL.Image: Archived image, or None if digest isn't an archived image
+        """
+        record = self.get(digest)
+        if record is None or record.kind != 'image':
+            return None
+        data = self.get_bytes(digest)
+        if data is None:
+            return None
+        image = PilImage.open(BytesIO(data))
+        image.load()
+        return image
+
+    def remove(self, digest):
+        """
+        Removes a value. Its blob is deleted by the next `compact`.
+
+        :param digest: Hex content digest
+        :returns bool: True if the value was archived
+        """
+        with self._lock:
+            self.refresh()
+            if digest not in self._records:
+                return False
+            self._append(json.dumps({'digest': digest, 'deleted': True}))
+            return True
+
+    def compact(self):
+        """
+        Rewrites the index with one line per archived value and deletes the
+        blobs of removed values.
+
+        :returns int: Number of blobs deleted
+        """
+        with self._lock:
+            self.refresh()
+            tmp = '{}.{}.tmp'.format(self._index_path, os.getpid())
+            with open(tmp, 'w') as fh:
+                for record in self._records.values():
+                    fh.write(record.to_json() + '\n')
+            os.replace(tmp, self._index_path)
+            self.refresh()
+
+            deleted = 0
+            for directory in os.listdir(self._blob_path):
+                directory = os.path.join(self._blob_path, directory)
+                for name in os.listdir(directory):
+                    if name not in self._records:
+                        os.remove(os.path.join(directory, name))
+                        deleted += 1
+            return deleted
+
+    def close(self):
+        """
+        Releases the memory maps of this archive. Maps still viewed by a
+        `get_bytes` result are unmapped once the last view is gone.
+        """
+        with self._lock:
+            maps, self._maps = self._maps, {}
+        for mapped in maps.values():
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+
+    def capture(self, clipboard, images=True):
+        """
+        Archives what is on a clipboard now, text if there is any, else the image.
+
+        :param clipboard: `Clipboard` to read
+        :param images: If false, images are ignored (default: True)
+        :returns: `ArchiveRecord`, or None if nothing was archived
+        """
+        if clipboard.has_text():
+            value = clipboard.get_text()
+        elif images and clipboard.has_image():
+            value = clipboard.get_image()
+        else:
+            return None
+        return None if value is None else self.store(value)
+
+    def attach(self, clipboard, images=True):
+        """
+        Archives every text, and optionally every image, placed on a clipboard
+        from now on.
+
+        :param clipboard: `Clipboard` to watch
+        :param images: If false, only text is archived (default: True)
+        :returns: `ClipboardWatcher`; close it to stop archiving
+        :raises NotImplementedError: If the backend can't report changes
+        """
+        def record(change):
+            value = read_change(clipboard, change, images)
+            if value is not None:
+                self.store(value, change.time)
+
+        return clipboard.watch(record)
@@ -0,0 +1,856 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# broker.py -- clipboard broker daemon and its client backend
+#
+# Usage:
+#   python -m crossclip.broker [--socket PATH] [--backend NAME]
+
+import os
+import sys
+import mmap
+import stat
+import struct
+import socket
+import argparse
+import tempfile
+import threading
+import selectors
+from collections import deque
+
+from PIL import Image as PilImage
+from PIL.Image import Image as PilImageType
+
+from .absbackend import AbstractBackend, AbstractImageConverter, ClipboardChange
+from .converters import PilImageConverter, default_graph
+from .targets import render
+
+SOCKET_VARIABLE = 'CROSSCLIP_BROKER'
+""" Environment variable overriding the path of the broker socket
+"""
+
+# Requests
+GET_TEXT = 1
+GET_IMAGE = 2
+GET_CONTENTS = 3
+TARGETS = 4
+OWNS = 5
+SET_TEXT = 6
+SET_IMAGE = 7
+SET_DATA = 8
+WATCH = 9
+# Replies and notifications
+OK = 64
+NONE = 65
+ERROR = 66
+UNSUPPORTED = 67
+CHANGE = 68
+
+FLAG_FD = 1
+""" The payload is in a memory file passed along with the header
+"""
+
+HEADER = struct.Struct('!BB2xQ')
+""" Frame header: opcode, flags, payload length
+"""
+IMAGE_HEADER = struct.Struct('!II8s')
+""" Raw image header: width, height, Pillow mode
+"""
+ENTRY_LENGTHS = struct.Struct('!IQ')
+""" Lengths of a target name and its payload in a SET_DATA request
+"""
+CHANGE_PAYLOAD = struct.Struct('!Qd')
+""" Change count and toolkit timestamp (NaN if unknown)
+"""
+
+ZERO_COPY_THRESHOLD = 64 * 1024
+""" Payloads of at least this many bytes are passed in a memory file
+"""
+
+HAVE_MEMFD = hasattr(os, 'memfd_create') and hasattr(socket, 'send_fds')
+
+
+def default_socket_path():
+    """
+    Returns the path of the broker socket: $CROSSCLIP_BROKER, else
+    crossclip.sock in $XDG_RUNTIME_DIR, else a per-user file in the temp directory.
+
+    :returns str: Socket path
+    """
+    path = os.environ.get(SOCKET_VARIABLE)
+    if path:
+        return path
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'crossclip.sock')
+    return os.path.join(tempfile.gettempdir(), 'crossclip-{}.sock'.format(os.getuid()))
+
+
+def encode_frame(op, *parts):
+    """
+    Lays out one frame. Large payloads are written once into a memory file
+    whose descriptor is passed along with the header, so the receiver maps it
+    instead of copying it out of the socket.
+
+    :param op: Opcode
+    :param parts: bytes-like pieces of the payload
+    :returns: (list of bytes-like chunks to send, starting with the header;
+              descriptor to send with the header, or None). The caller closes
+              the descriptor
+    """
+    parts = [memoryview(part).cast('B') for part in parts]
+    length = sum(len(part) for part in parts)
+    if HAVE_MEMFD and length >= ZERO_COPY_THRESHOLD:
+        fd = os.memfd_create('crossclip', os.MFD_CLOEXEC)
+        try:
+            os.ftruncate(fd, length)
+            with mmap.mmap(fd, length) as mapped:
+                offset = 0
+                for part in parts:
+                    mapped[offset:offset + len(part)] = part
+                    offset += len(part)
+        except BaseException:
+            os.close(fd)
+            raise
+        return [HEADER.pack(op, FLAG_FD, length)], fd
+    return [HEADER.pack(op, 0, length)] + parts, None
+
+
+def send_frame(sock, op, *parts):
+    """
+    Sends one frame, see `encode_frame`.
+
+    :param sock: Connected Unix socket
+    :param op: Opcode
+    :param parts: bytes-like pieces of the payload
+    """
+    chunks, fd = encode_frame(op, *parts)
+    if fd is not None:
+        try:
+            socket.send_fds(sock, chunks, [fd])
+        finally:
+            os.close(fd)
+        return
+    for chunk in chunks:
+        sock.sendall(chunk)
+
+
+def recv_frame(sock):
+    """
+    Receives one frame.
+
+    :param sock: Connected Unix socket
+    :returns: (opcode, payload memoryview), or (None, None) if the peer hung up
+    """
+    header = bytearray()
+    fds = []
+    while len(header) < HEADER.size:
+        if HAVE_MEMFD:
+            data, received, _, _ = socket.recv_fds(sock, HEADER.size - len(header), 1)
+            fds += received
+        else:
+            data = sock.recv(HEADER.size - len(header))
+        if not data:
+            for fd in fds:
+                os.close(fd)
+            return None, None
+        header += data
+
+    op, flags, length = HEADER.unpack(header)
+    if flags & FLAG_FD:
+        return op, map_payload(fds, length)
+
+    payload = bytearray(length)
+    view = memoryview(payload)
+    received = 0
+    while received < length:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None, None
+        received += count
+    return op, view
+
+
+def map_payload(fds, length):
+    """
+    Maps the payload of a frame passed in a memory file, and closes the
+    descriptors received with the frame.
+
+    :param fds: Descriptors received with the header
+    :param length: Payload length
+    :returns memoryview: Payload
+    :raises OSError: If the memory file is missing or too short
+    """
+    try:
+        if not fds:
+            raise OSError('Frame is missing its memory file')
+        if length == 0:
+            return memoryview(b'')
+        try:
+            return memoryview(mmap.mmap(fds[0], length, access=mmap.ACCESS_READ))
+        except ValueError as err:
+            raise OSError('Memory file of frame is too short') from err
+    finally:
+        for fd in fds:
+            os.close(fd)
+        del fds[:]
+
+
+class FrameReader:
+    """ Assembles frames from a non-blocking socket
+
+    A client that stops halfway through a frame only holds its own
+    connection: `read` returns what it has so far and is called again when
+    the socket is readable.
+    """
+
+    def __init__(self, sock):
+        """
+        :param sock: Connected Unix socket, in non-blocking mode
+        """
+        self.sock = sock
+        self._header = bytearray()
+        self._fds = []
+        self._op = None
+        self._payload = None
+        self._received = 0
+
+    def read(self):
+        """
+        Reads whatever the socket holds.
+
+        :returns: (opcode, payload memoryview) once a frame is complete, else None
+        :raises EOFError: If the peer hung up
+        :raises OSError: If a memory file frame is invalid
+        """
+        try:
+            if self._payload is None:
+                while len(self._header) < HEADER.size:
+                    wanted = HEADER.size - len(self._header)
+                    if HAVE_MEMFD:
+                        data, fds, _, _ = socket.recv_fds(self.sock, wanted, 1)
+                        self._fds += fds
+                    else:
+                        data = self.sock.recv(wanted)
+                    if not data:
+                        raise EOFError('Peer hung up')
+                    self._header += data
+
+                self._op, flags, length = HEADER.unpack(self._header)
+                if flags & FLAG_FD:
+                    return self._complete(map_payload(self._fds, length))
+                self._payload = memoryview(bytearray(length))
+                self._received = 0
+
+            while self._received < len(self._payload):
+                count = self.sock.recv_into(self._payload[self._received:])
+                if count == 0:
+                    raise EOFError('Peer hung up')
+                self._received += count
+        except BlockingIOError:
+            return None
+        return self._complete(self._payload)
+
+    def _complete(self, payload):
+        frame = (self._op, payload)
+        self._header = bytearray()
+        self._op = None
+        self._payload = None
+        return frame
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+        del self._fds[:]
+
+
+class Outbox:
+    """ Frames waiting to be written to a non-blocking socket
+
+    A client that doesn't read its replies only fills its own outbox;
+    `flush` writes what the socket takes and is called again when the socket
+    is writable.
+    """
+
+    def __init__(self, sock):
+        """
+        :param sock: Connected Unix socket, in non-blocking mode
+        """
+        self.sock = sock
+        self.size = 0
+        """ Bytes waiting, including those of memory files not sent yet
+        """
+        self._chunks = deque()
+
+    def __bool__(self):
+        return bool(self._chunks)
+
+    def push(self, op, *parts):
+        """
+        Queues a frame.
+
+        :param op: Opcode
+        :param parts: bytes-like pieces of the payload
+        """
+        chunks, fd = encode_frame(op, *parts)
+        hidden = os.fstat(fd).st_size if fd is not None else 0
+        self._chunks.append((chunks[0], fd, hidden))
+        self._chunks.extend((chunk, None, 0) for chunk in chunks[1:])
+        self.size += sum(len(chunk) for chunk in chunks) + hidden
+
+    def flush(self):
+        """
+        Writes as much as the socket takes without blocking.
+
+        :returns bool: True once everything is written
+        :raises OSError: If the peer is gone
+        """
+        while self._chunks:
+            chunk, fd, hidden = self._chunks[0]
+            try:
+                if fd is None:
+                    sent = self.sock.send(chunk)
+                else:
+                    sent = socket.send_fds(self.sock, [chunk], [fd])
+            except BlockingIOError:
+                return False
+            if fd is not None:
+                # The descriptor went along with the first byte
+                os.close(fd)
+                self.size -= hidden
+            self.size -= sent
+            if sent < len(chunk):
+                self._chunks[0] = (memoryview(chunk)[sent:], None, 0)
+            else:
+                self._chunks.popleft()
+        return True
+
+    def close(self):
+        for _, fd, _ in self._chunks:
+            if fd is not None:
+                os.close(fd)
+        self._chunks.clear()
+        self.size = 0
+
+
+class _Client:
+    __slots__ = ('reader', 'outbox', 'closing')
+
+    def __init__(self, conn):
+        self.reader = FrameReader(conn)
+        self.outbox = Outbox(conn)
+        self.closing = False
+        """ Drop the client once its outbox is written
+        """
+
+
+def pack_image(image):
+    """
+    :param image: `PIL.Image`
+    :returns: Payload parts of a raw image
+    """
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    header = IMAGE_HEADER.pack(image.width, image.height, image.mode.encode('ascii'))
+    return [header, image.tobytes()]
+
+
+def unpack_image(payload):
+    """
+    :param payload: Raw image payload
+    :returns PIL.Image: Image, mapping the payload where Pillow can
+    """
+    w, h, mode = IMAGE_HEADER.unpack_from(payload)
+    mode = mode.rstrip(b'\0').decode('ascii')
+    pixels = payload[IMAGE_HEADER.size:]
+    if mode not in ('RGB', 'RGBA', 'L') or len(pixels) != w * h * len(mode):
+        raise ValueError('Malformed raw image')
+    if mode in ('RGBA', 'L'):
+        return PilImage.frombuffer(mode, (w, h), pixels, 'raw', mode, 0, 1)
+    return PilImage.frombytes(mode, (w, h), pixels)
+
+
+def pack_data(data):
+    """
+    :param data: dict of target to a value `targets.render` accepts
+    :returns: Payload parts of a SET_DATA request
+    """
+    parts = []
+    for target, value in data.items():
+        name = target.encode('utf-8')
+        payload = render(target, value) or b''
+        parts += [ENTRY_LENGTHS.pack(len(name), len(payload)), name, payload]
+    return parts
+
+
+def unpack_data(payload):
+    """
+    :param payload: SET_DATA payload
+    :returns dict: Target to bytes
+    """
+    data = {}
+    offset = 0
+    while offset < len(payload):
+        name_length, length = ENTRY_LENGTHS.unpack_from(payload, offset)
+        offset += ENTRY_LENGTHS.size
+        name = bytes(payload[offset:offset + name_length]).decode('utf-8')
+        offset += name_length
+        data[name] = bytes(payload[offset:offset + length])
+        offset += length
+    return data
+
+
+class BrokerServer:
+    """ Daemon sharing one clipboard backend over a Unix socket
+
+    The server owns the only toolkit connection; any number of processes use
+    it through `BrokerBackend`. Requests are served one at a time from the
+    thread running `serve_forever`, which also dispatches the toolkit's
+    events, so it must be the thread the backend was created on.
+    """
+
+    poll_interval = 0.02
+    """ Longest time between two toolkit event dispatches, in seconds
+    """
+    max_backlog = 128 * 1024 * 1024
+    """ Most bytes of replies and notifications a client may leave unread.
+    Clients falling further behind are dropped
+    """
+
+    def __init__(self, path=None, backend=None):
+        """
+        :param path: Socket path (default: `default_socket_path()`)
+        :param backend: Backend name or class to serve. If None, the backend
+                        matching the platform is used (default: None)
+        :raises RuntimeError: If no usable backend is found
+        """
+        from .registry import default_registry
+
+        self.path = path or default_socket_path()
+        if isinstance(backend, str):
+            backend = default_registry.load(backend)
+        elif backend is None:
+            backend = default_registry.select()
+        self.backend = backend()
+        self._native = self.backend.image_converter.image_str
+        self._graph = default_graph.layered(self.backend.image_converter)
+        self._watchers = set()
+        self._selector = None
+        self._listener = None
+        self._inode = None
+        self._stopped = threading.Event()
+        try:
+            self.backend.add_change_listener(self._on_change)
+        except NotImplementedError:
+            pass
+
+    def bind(self):
+        """
+        Creates the socket, replacing a stale one. Only the current user can
+        connect to it.
+
+        :raises RuntimeError: If a broker is listening on the path already, or
+                              something other than a socket is there
+        """
+        self._remove_stale()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket is 0600 from the start; a chmod after bind would leave a
+        # window in which other users can connect
+        umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        except OSError:
+            listener.close()
+            raise
+        finally:
+            os.umask(umask)
+        self._inode = os.stat(self.path).st_ino
+        self._listener = listener
+        self._listener.listen()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+
+    def _remove_stale(self):
+        """
+        Unlinks a socket left behind by a broker that is gone.
+        """
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise RuntimeError('{} exists and is not a socket'.format(self.path))
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+            return
+        except FileNotFoundError:
+            return
+        finally:
+            probe.close()
+        raise RuntimeError('A broker is already listening on {}'.format(self.path))
+
+    def serve_forever(self):
+        """
+        Serves requests until `shutdown` is called.
+        """
+        if self._listener is None:
+            self.bind()
+        try:
+            while not self._stopped.is_set():
+                for key, events in self._selector.select(self.poll_interval):
+                    conn = key.fileobj
+                    if conn is self._listener:
+                        conn, _ = self._listener.accept()
+                        conn.setblocking(False)
+                        self._selector.register(conn, selectors.EVENT_READ, _Client(conn))
+                    elif conn.fileno() < 0:
+                        # Dropped while serving another client
+                        continue
+                    elif events & selectors.EVENT_WRITE:
+                        self._flush(conn, key.data)
+                    else:
+                        self._serve(conn, key.data)
+                self.backend.process_events()
+        finally:
+            self._close()
+
+    def shutdown(self):
+        """
+        Stops `serve_forever`, from any thread.
+        """
+        self._stopped.set()
+
+    def _close(self):
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                key.data.reader.close()
+                key.data.outbox.close()
+            key.fileobj.close()
+        self._selector.close()
+        self._watchers.clear()
+        try:
+            # Don't remove a socket another broker has bound since
+            if os.stat(self.path).st_ino == self._inode:
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _drop(self, conn):
+        if conn.fileno() < 0:
+            return
+        client = self._selector.get_key(conn).data
+        client.reader.close()
+        client.outbox.close()
+        self._selector.unregister(conn)
+        self._watchers.discard(conn)
+        conn.close()
+
+    def _send(self, conn, *frame):
+        """
+        Queues a frame for a client and writes what the socket takes now.
+        The client is dropped if too much is left unread.
+        """
+        client = self._selector.get_key(conn).data
+        try:
+            client.outbox.push(*frame)
+        except OSError:
+            self._drop(conn)
+            return
+        self._flush(conn, client)
+        if conn.fileno() >= 0 and client.outbox.size > self.max_backlog:
+            self._drop(conn)
+
+    def _flush(self, conn, client):
+        """
+        Writes a client's outbox. Requests aren't read from a client while
+        its replies wait, so that it can't queue up work without reading.
+        """
+        try:
+            done = client.outbox.flush()
+        except OSError:
+            self._drop(conn)
+            return
+        if done and client.closing:
+            self._drop(conn)
+            return
+        events = selectors.EVENT_READ if done else selectors.EVENT_WRITE
+        if self._selector.get_key(conn).events != events:
+            self._selector.modify(conn, events, client)
+
+    def _on_change(self, change):
+        timestamp = float('nan') if change.timestamp is None else float(change.timestamp)
+        payload = CHANGE_PAYLOAD.pack(change.count, timestamp)
+        for conn in list(self._watchers):
+            self._send(conn, CHANGE, payload)
+
+    def _serve(self, conn, client):
+        try:
+            frame = client.reader.read()
+        except (EOFError, OSError):
+            self._drop(conn)
+            return
+        if frame is None:
+            # Only part of the frame has arrived
+            return
+        op, payload = frame
+        try:
+            reply = self._dispatch(conn, op, payload)
+        except NotImplementedError as err:
+            reply = (UNSUPPORTED, str(err).encode('utf-8'))
+        except (RuntimeError, RuntimeWarning, OSError) as err:
+            reply = (ERROR, str(err).encode('utf-8'))
+        except Exception as err:
+            # Malformed requests and unexpected failures; the client's state
+            # can't be trusted any more
+            reply = (ERROR, '{}: {}'.format(type(err).__name__, err).encode('utf-8'))
+            client.closing = True
+        self._send(conn, *reply)
+
+    def _dispatch(self, conn, op, payload):
+        backend = self.backend
+        if op == GET_TEXT:
+            text = backend.get_text()
+            return (NONE,) if text is None else (OK, text.encode('utf-8'))
+        elif op == GET_IMAGE:
+            image = backend.get_image(self._native)
+            if image is None:
+                return (NONE,)
+            return (OK,) + tuple(pack_image(self._graph.convert(image, 'pil', self._native)))
+        elif op == GET_CONTENTS:
+            data = backend.get_contents(str(payload, 'utf-8'))
+            return (NONE,) if data is None else (OK, data)
+        elif op == TARGETS:
+            return (OK, '\n'.join(backend.available_targets()).encode('utf-8'))
+        elif op == OWNS:
+            owns = backend.owns_clipboard()
+            return (NONE,) if owns is None else (OK, b'\1' if owns else b'\0')
+        elif op == SET_TEXT:
+            backend.set_text(str(payload, 'utf-8'))
+        elif op == SET_IMAGE:
+            image = self._graph.convert(unpack_image(payload), self._native, 'pil')
+            backend.set_image(image)
+        elif op == SET_DATA:
+            backend.set_data(unpack_data(payload))
+        elif op == WATCH:
+            self._watchers.add(conn)
+        else:
+            return (ERROR, 'Unknown request {}'.format(op).encode('utf-8'))
+        return (OK,)
+
+
+class BrokerBackend(AbstractBackend):
+    """ Backend talking to a `BrokerServer`
+
+    Any number of processes can use the clipboard through one broker
+    without loading a toolkit themselves. Images travel as raw pixels; large
+    payloads are handed over in shared memory where the platform allows it.
+    """
+
+    image_converter = PilImageConverter()
+    notifies_in_background = True
+
+    def __init__(self, path=None):
+        """
+        :param path: Socket path (default: `default_socket_path()`)
+        :raises RuntimeError: If no broker is listening
+        """
+        super().__init__()
+        self.path = path or default_socket_path()
+        self._sock = self._connect()
+        self._lock = threading.Lock()
+        self._watch = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError as err:
+            sock.close()
+            raise RuntimeError('No crossclip broker at {}: {}'.format(self.path, err)) from err
+        return sock
+
+    def close(self):
+        """
+        Disconnects from the broker.
+        """
+        self._sock.close()
+        if self._watch is not None:
+            # Wakes up the thread reading changes
+            self._watch.shutdown(socket.SHUT_RDWR)
+            self._watch.close()
+
+    def _request(self, op, *parts):
+        """
+        Sends a request and waits for its reply.
+
+        :returns: Reply payload, or None for a NONE reply
+        :raises NotImplementedError: If the served backend doesn't support the request
+        :raises RuntimeError: If the request failed
+        """
+        with self._lock:
+            send_frame(self._sock, op, *parts)
+            reply, payload = recv_frame(self._sock)
+        if reply is None:
+            raise RuntimeError('The crossclip broker hung up')
+        elif reply == NONE:
+            return None
+        elif reply == UNSUPPORTED:
+            raise NotImplementedError(str(payload, 'utf-8'))
+        elif reply == ERROR:
+            raise RuntimeError(str(payload, 'utf-8'))
+        return payload
+
+    def get_text(self):
+        """
+        Gets text from the clipboard.
+
+        :return str: Text from clipboard, or None
+        """
+        payload = self._request(GET_TEXT)
+        return None if payload is None else str(payload, 'utf-8')
+
+    def get_image(self, format='pil', converter=None):
+        """
+        Gets the image from the clipboard.
+
+        :param format: 'pil' for a pillow image, or the `image_str` of `converter` (default: 'pil')
+        :param converter: Converter used for any other format
+        :returns: Image in chosen format, or None
+        :raises RuntimeWarning: If format is invalid and no converter is provided
+        """
+        payload = self._request(GET_IMAGE)
+        if payload is None:
+            return None
+        image = unpack_image(payload)
+
+        if format == self.image_converter.image_str:
+            return image
+        elif converter is not None and isinstance(converter, AbstractImageConverter):
+            return converter.from_pillow(image)
+        else:
+            raise RuntimeWarning("Invalid format, and converter is not provided")
+
+    def get_contents(self, target):
+        """
+        Gets the raw bytes of a target.
+
+        :param target: Target name
+        :returns memoryview: Payload, or None if target isn't offered
+        """
+        return self._request(GET_CONTENTS, target.encode('utf-8'))
+
+    def available_targets(self):
+        """
+        Lists the offered targets.
+
+        :returns list: Target names
+        """
+        payload = self._request(TARGETS)
+        return [target for target in str(payload, 'utf-8').split('\n') if target]
+
+    def owns_clipboard(self):
+        """
+        Tells if the broker owns the clipboard.
+
+        :returns bool: True if it does, or None if its backend can't tell
+        """
+        payload = self._request(OWNS)
+        return None if payload is None else payload[0] == 1
+
+    def set_text(self, text):
+        """
+        Sets text to the clipboard.
+
+        :param text: text to set to clipboard
+        """
+        self._request(SET_TEXT, text.encode('utf-8'))
+
+    def set_image(self, image, converter=None):
+        """
+        Sets an image to the clipboard.
+
+        :param image: Pillow image, or an image `converter` can convert
+        :param converter: Converter for non-pillow images
+        :raises RuntimeWarning: If image is of invalid type and has no converter
+        """
+        if not isinstance(image, PilImageType):
+            if converter is not None and isinstance(converter, AbstractImageConverter):
+                image = converter.to_pillow(image)
+            else:
+                raise RuntimeWarning("Image is of invalid type and has no converter")
+        self._request(SET_IMAGE, *pack_image(image))
+
+    def set_data(self, data):
+        """
+        Offers several targets at once. Values can't be rendered lazily across
+        processes, so callables are invoked here, before the request is sent.
+
+        :param data: dict of target to str, bytes, `PIL.Image`, or a callable
+                     returning one of those
+        """
+        self._request(SET_DATA, *pack_data(data))
+
+    def _connect_changes(self):
+        """
+        Opens a second connection on which the broker pushes changes.
+        """
+        sock = self._connect()
+        send_frame(sock, WATCH)
+        reply, payload = recv_frame(sock)
+        if reply == UNSUPPORTED:
+            sock.close()
+            raise NotImplementedError(str(payload, 'utf-8'))
+        self._watch = sock
+        thread = threading.Thread(target=self._read_changes, args=(sock,), daemon=True)
+        thread.start()
+
+    def _read_changes(self, sock):
+        while True:
+            try:
+                op, payload = recv_frame(sock)
+            except OSError:
+                return
+            if op is None:
+                return
+            if op == CHANGE:
+                _, timestamp = CHANGE_PAYLOAD.unpack(payload)
+                timestamp = None if timestamp != timestamp else timestamp
+                self._notify_change(ClipboardChange(self.available_targets, timestamp))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Share one clipboard backend over a Unix socket')
+    parser.add_argument('--socket', help='socket path (default: $CROSSCLIP_BROKER or $XDG_RUNTIME_DIR/crossclip.sock)')
+    parser.add_argument('--backend', help='backend to serve (default: the one matching the platform)')
+    args = parser.parse_args(argv)
+
+    server = BrokerServer(args.socket, args.backend)
+    server.bind()
+    print('crossclip broker serving {} at {}'.format(type(server.backend).__name__, server.path),
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
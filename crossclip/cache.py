@@ -0,0 +1,153 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# cache.py -- change-aware cache of clipboard reads
+
+import sys
+import threading
+from collections import OrderedDict
+
+from PIL.Image import Image as PilImageType
+
+MISS = object()
+""" Returned by `ReadCache.get` when nothing is cached
+"""
+
+
+def payload_size(value):
+    """
+    Estimates the memory held by a clipboard value.
+
+    :param value: Text, bytes, or an image of any supported type
+    :returns int: Size in bytes
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, PilImageType):
+        return value.width * value.height * len(value.getbands())
+    if hasattr(value, 'nbytes'):
+        # numpy arrays
+        return value.nbytes
+    if hasattr(value, 'props') and hasattr(value.props, 'rowstride'):
+        # GdkPixbuf.Pixbuf
+        return value.props.rowstride * value.props.height
+    if hasattr(value, 'bytesPerLine'):
+        # QImage
+        return value.bytesPerLine() * value.height()
+    return sys.getsizeof(value)
+
+
+def detach(value):
+    """
+    Copies a cached value that callers could change in place, so that no
+    caller sees another's changes. Text, bytes and toolkit images, which Qt
+    copies on write and Gtk never changes, are returned as is.
+
+    :param value: Cached value
+    :returns: value, or a copy of it
+    """
+    if isinstance(value, PilImageType):
+        return value.copy()
+    if getattr(getattr(value, 'flags', None), 'writeable', False):
+        # numpy arrays
+        return value.copy()
+    return value
+
+
+class ReadCache:
+    """ LRU cache of clipboard reads bounded by a byte budget
+
+    Entries are tagged with the backend's `change_count` at the time they were
+    read. Looking up an entry with a different count drops the whole cache,
+    so a value is never served after the clipboard changed.
+
+    Values are kept as read; callers that hand them out should `detach` them.
+    """
+
+    def __init__(self, budget=64 * 1024 * 1024):
+        """
+        :param budget: Most bytes kept in the cache (default: 64 MiB)
+        """
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, generation):
+        """
+        Looks up a cached read.
+
+        :param key: Hashable description of the read, e.g ('image', 'pil')
+        :param generation: Current change count of the backend
+        :returns: Cached value, or `MISS`
+        """
+        with self._lock:
+            if generation != self._generation:
+                self._clear()
+                self._generation = generation
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, generation):
+        """
+        Stores a read. Values larger than the whole budget are not kept.
+
+        :param key: Hashable description of the read
+        :param value: Value read from the clipboard
+        :param generation: Change count of the backend when the value was read
+        """
+        size = payload_size(value)
+        with self._lock:
+            if generation != self._generation:
+                self._clear()
+                self._generation = generation
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            if size > self.budget:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+
+    def invalidate(self):
+        """
+        Drops every entry.
+        """
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self.size = 0
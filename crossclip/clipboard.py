@@ -18,10 +18,42 @@
 # clipboard.py -- frontend clipboard class
 
 import sys
-from . import platform_backend, backends
+import time
+import atexit
+import asyncio
+import weakref
+import threading
+from . import select_backend
 from .absbackend import AbstractBackend
+from .converters import ConversionGraph, default_graph, array_mode
+from .cache import ReadCache, MISS, detach
+from .encoding import ImageEncoding, decode_image
+from .hashing import content_digest
+from .scaling import DRAFT_TARGETS, decode_reduced
+from .snapshot import ClipboardSnapshot, TIMESTAMP_TARGET, parse_timestamp, read_batch
+from .instrument import Instrument, instrumented, phase, note_cache
+from .targets import is_text_target, is_image_target
+from .timeouts import ReadRequest, TIMED_OUT, CANCELLED, deadline_after
+from .watch import ClipboardWatcher
 import PIL
 
+_coalescing = weakref.WeakSet()
+""" Clipboards holding back a coalesced write
+"""
+
+
+def _flush_coalesced():
+    """
+    Commits the writes still held back by coalescing when the interpreter
+    exits, so the last write of a burst isn't lost with its timer.
+    """
+    for clipboard in list(_coalescing):
+        clipboard.flush()
+
+
+atexit.register(_flush_coalesced)
+
+
 class Clipboard:
     """ Frontend to various clipboard backends
 
@@ -38,52 +70,620 @@ class Clipboard:
     image_converter = None
     """ Image converter instance
     """
+    converters = None
+    """ `ConversionGraph` used to convert images between forms. Each clipboard
+    has its own, layered over `crossclip.converters.default_graph`, so
+    converters passed to one clipboard don't leak into others
+    """
+    cache = None
+    """ `ReadCache` of recent reads, or None if caching is disabled
+    """
+    instrument = None
+    """ `Instrument` receiving the timings of every operation, or None
+    """
+    image_encoding = None
+    """ `ImageEncoding` policy of image reads and writes, or None to leave it to the toolkit
+    """
 
-    def __init__(self, clip_backend_type=backends[platform_backend]):
+    def __init__(self, clip_backend_type=None, cache=False, cache_budget=64 * 1024 * 1024,
+                 deduplicate=True, coalesce=0, backend=None, instrument=None, image_encoding=None):
         """
         Creates a new clipboard that interfaces one of the platform-specific
         backends. The backend is implicitly deduced, but a specific backend
         can be choosen instead.
 
-        :param clip_backend: Which backend to use. Defaults to implicitly-selected backend
-        :type clip_backend: instance of `AbstractBackend`
-        :raises RuntimeError: If clip_backend is invalid
+        :param clip_backend_type: Which backend to use. Defaults to the backend chosen by
+                                  `crossclip.select_backend`
+        :type clip_backend_type: subclass of `AbstractBackend`
+        :param cache: If true, reads are memoized until the clipboard changes. Each
+                      read still returns its own copy of a PIL image (default: False)
+        :type cache: bool
+        :param cache_budget: Most bytes the read cache may hold (default: 64 MiB)
+        :type cache_budget: int
+        :param deduplicate: If true, a write is skipped when the content is identical to
+                            the last write and this process still owns the clipboard.
+                            Writes made by other code in the same process are not
+                            detected (default: True)
+        :type deduplicate: bool
+        :param coalesce: Window in seconds during which a burst of writes is collapsed into
+                         its last write. 0 commits every write immediately. The held back
+                         write is committed by the backend's `call_later`, which needs a
+                         running toolkit main loop on Gtk and Qt and runs on a timer
+                         thread on other backends; without a loop, call `flush()`. Writes
+                         still held back at interpreter exit are committed then (default: 0)
+        :type coalesce: float
+        :param backend: Existing backend instance to use instead of creating one, e.g
+                        `BackendExecutor.proxy()` (default: None)
+        :type backend: instance of `AbstractBackend`
+        :param instrument: Receives an `OperationRecord` per operation, with its
+                           timings by phase, payload size and cache hits. Costs
+                           next to nothing while None (default: None)
+        :type instrument: `Instrument` or a callable taking an `OperationRecord`
+        :param image_encoding: How images are encoded when written, e.g 'bmp' or
+                               ['bmp', 'png'], and which offered image target is
+                               read. None leaves both to the toolkit (default: None)
+        :type image_encoding: `ImageEncoding`, or encoding names
+        :raises RuntimeError: If clip_backend_type is invalid or no backend is available,
+                              if caching is requested but the backend can't report changes,
+                              or if image_encoding is invalid
         """
-        # Choose the backend to use
-        #if clip_backend not in backends:
-        #    raise RuntimeError('Invalid backend selected')
+        if backend is not None:
+            if not isinstance(backend, AbstractBackend):
+                raise RuntimeError("Clipboard backend is of invalid type")
+            clip_backend_type = type(backend)
+
+        # Choose the backend to use. The platform is only probed here, on
+        # first use, rather than when crossclip is imported.
+        if clip_backend_type is None:
+            clip_backend_type = select_backend()
 
         # Verify validity of backend type
-        if not issubclass(clip_backend_type, AbstractBackend):
+        if not isinstance(clip_backend_type, type) or not issubclass(clip_backend_type, AbstractBackend):
             raise RuntimeError("Clipboard backend is of invalid type")
 
-        self.backend = clip_backend_type()
+        self._owns_backend = backend is None
+        self.backend = backend if backend is not None else clip_backend_type()
         self.backend_type = clip_backend_type
 
         # Based off of backend, get the native image type (e.g QImage)
         self.image_converter = self.backend.image_converter
+        self.converters = ConversionGraph(default_graph)
+        self.converters.register(self.image_converter)
+
+        self.deduplicate = deduplicate
+        self.coalesce = coalesce
+        self._owned_digest = None
+        self._owned_count = None
+        self._pending = None
+        self._pending_timer = None
+        self._write_lock = threading.Lock()
+        self._change_handle = None
+        if instrument is not None and not isinstance(instrument, Instrument):
+            instrument = Instrument(instrument)
+        self.instrument = instrument
+        if image_encoding is not None and not isinstance(image_encoding, ImageEncoding):
+            image_encoding = ImageEncoding(image_encoding)
+        self.image_encoding = image_encoding
+
+        if cache:
+            # The cache is only safe if every change of the clipboard is seen
+            try:
+                self.backend.add_change_listener(self._invalidate_cache)
+            except NotImplementedError:
+                raise RuntimeError("Clipboard backend can't report changes, so reads can't be cached")
+            self.cache = ReadCache(cache_budget)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        Commits a write held back by coalescing and stops listening for
+        changes. The backend is closed too, unless it was passed in as `backend`.
+        """
+        self.flush()
+        if self.cache is not None:
+            self.backend.remove_change_listener(self._invalidate_cache)
+        if self._change_handle:
+            self.backend.remove_change_listener(self._change_handle)
+            self._change_handle = None
+        if self._owns_backend:
+            self.backend.close()
+
+    def _invalidate_cache(self, change=None):
+        if self.cache is not None:
+            self.cache.invalidate()
 
-    def get_text(self):
+    def _cached(self, key, read, phase_name='backend'):
+        """
+        Returns a cached read, or performs and caches it.
+
+        :param key: Hashable description of the read
+        :param read: Callable performing the read
+        :param phase_name: Instrumentation phase of the read, or None if it
+                           reports its own phases (default: 'backend')
+        """
+        if self._pending is not None:
+            # Reads must see writes that are still being coalesced
+            self.flush()
+        if self.cache is None:
+            if self.instrument is None:
+                return read()
+            return self._timed(phase_name, read)
+
+        # Deliver change notifications the toolkit may still be holding
+        self.backend.process_events()
+        generation = self.backend.change_count
+        value = self.cache.get(key, generation)
+        note_cache(value is not MISS)
+        if value is MISS:
+            value = self._timed(phase_name, read)
+            if value is not TIMED_OUT:
+                self.cache.put(key, value, generation)
+        return detach(value)
+
+    @staticmethod
+    def _timed(phase_name, read):
+        if phase_name is None:
+            return read()
+        with phase(phase_name):
+            return read()
+
+    def _fetch(self, request, read, deadline):
+        """
+        Performs a backend read. Without a deadline, the blocking call is used;
+        with one, the read goes through the backend's asynchronous request
+        call and is abandoned once the deadline passes.
+
+        :param request: `request_*` call taking the callback
+        :param read: Blocking call taking no arguments
+        :param deadline: `time.monotonic()` deadline, or None
+        :returns: Value read, or `TIMED_OUT`
+        """
+        if deadline is None:
+            return read()
+        pending = ReadRequest(self.backend, request)
+        value = pending.wait_until(deadline)
+        if value is TIMED_OUT:
+            pending.cancel()
+        return value
+
+    @instrumented('get_text')
+    def get_text(self, timeout=None):
         """
         Gets text from the clipboard.
 
-        :returns: Text from clipboard or None if no text is available
+        :param timeout: Longest time to wait for the clipboard owner, in seconds,
+                        or None to wait for as long as it takes (default: None)
+        :type timeout: float
+        :returns: Text from clipboard, None if no text is available, or
+                  `crossclip.timeouts.TIMED_OUT`
         :rtype: str
         """
-        return self.backend.get_text()
+        deadline = deadline_after(timeout)
+        return self._cached(('text',), lambda: self._fetch(self.backend.request_text,
+                                                           self.backend.get_text, deadline))
 
-    def get_image(self, form='pil', converter=None):
+    @instrumented('get_image')
+    def get_image(self, form='pil', converter=None, max_size=None, reduce=None, timeout=None):
         """
-        Gets an image from the clipboard.
+        Gets an image from the clipboard. The backend always hands over its
+        native image, which is then converted along the cheapest path in
+        `self.converters`.
 
-        :param native: If true, then the returned image will be of type `self.image_converter.image_type`.
-                        If False, then object will be of type `PIL.Image`.
-        :type native: boolean
-        :returns: Initialized image object or None if no image is available
+        For previews, pass `max_size` or `reduce`. The image is then scaled
+        down at the cheapest point: JPEG payloads are decoded at reduced
+        scale, and native images are scaled by their toolkit before they are
+        converted.
+
+        :param form: `image_str` of the wanted image type, e.g 'pil', 'numpy'
+                     or `self.image_converter.image_str` (default: 'pil').
+                     'numpy' arrays view the native pixel buffer where the
+                     toolkit allows it; they are read-only
+        :type form: str
+        :param converter: Converter for a form the clipboard doesn't know yet.
+                          If given, the image is returned as `converter.image_type`
+        :type converter: instance of `AbstractImageConverter`
+        :param max_size: (width, height) box the image must fit in. The aspect
+                         ratio is kept and images are never enlarged (default: None)
+        :type max_size: tuple
+        :param reduce: Factor to divide both sides of the image by (default: None)
+        :type reduce: int or float
+        :param timeout: Longest time to wait for the clipboard owner, in seconds.
+                        Conversion isn't counted (default: None)
+        :type timeout: float
+        :returns: Initialized image object, None if no image is available, or
+                  `crossclip.timeouts.TIMED_OUT`
         :rtype: `PIL.Image` or `self.image_converter.image_type`
+        :raises RuntimeWarning: If the image can't be converted to form
+        """
+        if converter is not None:
+            self.converters.register(converter)
+            form = converter.image_str
+        deadline = deadline_after(timeout)
+
+        if max_size is not None or reduce is not None:
+            key = ('image', form, tuple(max_size) if max_size is not None else None, reduce)
+            return self._cached(key, lambda: self._get_reduced_image(form, max_size, reduce, deadline), None)
+
+        if self.image_encoding is not None:
+            target = self._choose_image_target(deadline)
+            if target is TIMED_OUT:
+                return TIMED_OUT
+            if target is not None:
+                image = self._cached(('image', 'pil'), lambda: self._get_encoded_image(target, deadline))
+                if image is TIMED_OUT or (image is not None and form == 'pil'):
+                    return image
+                if image is not None:
+                    return self._cached(('image', form), lambda: self._convert(image, form, 'pil'), None)
+                # The target vanished or didn't decode: let the toolkit read the image
+
+        native_form = self.image_converter.image_str
+        image = self._cached(('image', native_form), lambda: self._fetch(
+            self.backend.request_image, lambda: self.backend.get_image(native_form), deadline))
+        if form == native_form or image is TIMED_OUT:
+            return image
+        return self._cached(('image', form), lambda: self._convert_native(image, form, None), None)
+
+    def _get_reduced_image(self, form, max_size, reduce, deadline=None):
+        """
+        Reads a scaled down image, decoding it at reduced scale if the owner
+        offers an encoding that allows it.
+        """
+        try:
+            with phase('backend'):
+                targets = self._fetch(self.backend.request_targets, self.backend.available_targets, deadline)
+        except NotImplementedError:
+            targets = []
+        if targets is TIMED_OUT:
+            return TIMED_OUT
+        for target in DRAFT_TARGETS:
+            if target not in (targets or []):
+                continue
+            try:
+                with phase('backend'):
+                    data = self._fetch(lambda callback: self.backend.request_contents(target, callback),
+                                       lambda: self.backend.get_contents(target), deadline)
+            except NotImplementedError:
+                break
+            if data is TIMED_OUT:
+                return TIMED_OUT
+            if data:
+                with phase('decode'):
+                    image = decode_reduced(data, max_size, reduce)
+                with phase('convert'):
+                    return self.converters.convert(image, form, 'pil')
+
+        native_form = self.image_converter.image_str
+        with phase('backend'):
+            image = self._fetch(self.backend.request_image, lambda: self.backend.get_image(native_form), deadline)
+        if image is None or image is TIMED_OUT:
+            return image
+        with phase('scale'):
+            image = self.image_converter.scale(image, max_size, reduce)
+        return self._convert_native(image, form, None)
+
+    def _choose_image_target(self, deadline):
+        """
+        Picks the offered image target to read, see `ImageEncoding.choose`.
+
+        :returns: Target name, None if the toolkit should pick, or `TIMED_OUT`
+        """
+        try:
+            offered = self._cached(('targets',), lambda: self._fetch(
+                self.backend.request_targets, self.backend.available_targets, deadline))
+        except NotImplementedError:
+            return None
+        if offered is TIMED_OUT:
+            return TIMED_OUT
+        return self.image_encoding.choose(offered or [])
+
+    def _get_encoded_image(self, target, deadline):
+        """
+        Reads an encoded image target and decodes it with Pillow.
+        """
+        try:
+            with phase('backend'):
+                data = self._fetch(lambda callback: self.backend.request_contents(target, callback),
+                                   lambda: self.backend.get_contents(target), deadline)
+        except NotImplementedError:
+            data = None
+        if not data:
+            # Also covers TIMED_OUT, which is falsy
+            return data if data is TIMED_OUT else None
+        with phase('decode'):
+            try:
+                return decode_image(data)
+            except OSError:
+                return None
+
+    def _convert(self, image, form, source):
+        with phase('convert'):
+            return self.converters.convert(image, form, source)
+
+    def _convert_native(self, image, form, converter):
+        """
+        Converts an image handed over by the backend to the requested form.
+        """
+        if converter is not None:
+            self.converters.register(converter)
+            form = converter.image_str
+
+        native_form = self.image_converter.image_str
+        if image is None or form == native_form:
+            return image
+        with phase('convert'):
+            return self.converters.convert(image, form, native_form)
+
+    @instrumented('available_targets', None)
+    def available_targets(self, timeout=None):
+        """
+        Lists the targets the clipboard owner offers, without transferring
+        any of them. This is the cheap way to decide what to read.
+
+        :param timeout: Longest time to wait for the clipboard owner, in seconds (default: None)
+        :type timeout: float
+        :returns: Target names, e.g 'text/plain' or 'image/png', or `crossclip.timeouts.TIMED_OUT`
+        :rtype: list
+        :raises NotImplementedError: If the backend can't list targets
+        """
+        deadline = deadline_after(timeout)
+        targets = self._cached(('targets',), lambda: self._fetch(
+            self.backend.request_targets, self.backend.available_targets, deadline))
+        return targets if targets is TIMED_OUT else list(targets or [])
+
+    @instrumented('has_text', None)
+    def has_text(self, timeout=None):
+        """
+        Tells if text can be read, without reading it when the backend can avoid it.
+
+        :param timeout: Longest time to wait for the clipboard owner, in seconds.
+                        With a timeout, the answer is based on the offered targets
+                        only (default: None)
+        :type timeout: float
+        :returns: bool, or `crossclip.timeouts.TIMED_OUT`
+        """
+        if timeout is None:
+            return self._cached(('has', 'text'), self.backend.has_text)
+        targets = self.available_targets(timeout)
+        return targets if targets is TIMED_OUT else any(is_text_target(target) for target in targets)
+
+    @instrumented('has_image', None)
+    def has_image(self, timeout=None):
+        """
+        Tells if an image can be read, without reading it when the backend can avoid it.
+
+        :param timeout: See `has_text`
+        :type timeout: float
+        :returns: bool, or `crossclip.timeouts.TIMED_OUT`
+        """
+        if timeout is None:
+            return self._cached(('has', 'image'), self.backend.has_image)
+        targets = self.available_targets(timeout)
+        return targets if targets is TIMED_OUT else any(is_image_target(target) for target in targets)
+
+    @instrumented('size_hint', None)
+    def size_hint(self, target):
+        """
+        Estimates how many bytes reading a target would transfer.
+
+        :param target: Target name
+        :type target: str
+        :returns: Size in bytes, or None if the backend can't tell without fetching
+        :rtype: int
+        """
+        return self._cached(('size', target), lambda: self.backend.size_hint(target))
+
+    @instrumented('get_bytes')
+    def get_bytes(self, target, timeout=None):
+        """
+        Reads the raw bytes of any target, e.g 'text/html' or 'image/png'.
+
+        :param target: Target name
+        :type target: str
+        :param timeout: Longest time to wait for the clipboard owner, in seconds (default: None)
+        :type timeout: float
+        :returns: Payload, None if target isn't offered, or `crossclip.timeouts.TIMED_OUT`
+        :rtype: memoryview
+        :raises NotImplementedError: If the backend can't read arbitrary targets
+        """
+        deadline = deadline_after(timeout)
+        data = self._cached(('bytes', target), lambda: self._fetch(
+            lambda callback: self.backend.request_contents(target, callback),
+            lambda: self.backend.get_contents(target), deadline))
+        return data if data is None or data is TIMED_OUT else memoryview(data)
+
+    def request_text(self):
+        """
+        Starts reading text without waiting for it. The returned handle can be
+        waited on with a timeout, and cancelled:
+
+            request = clipboard.request_text()
+            text = request.wait(timeout=0.5)
+            if text is TIMED_OUT:
+                request.cancel()
+
+        Requests bypass the read cache.
+
+        :returns: `crossclip.timeouts.ReadRequest`
+        """
+        if self._pending is not None:
+            self.flush()
+        return ReadRequest(self.backend, self.backend.request_text)
+
+    def request_image(self, form='pil', converter=None):
+        """
+        Starts reading an image without waiting for it. See `request_text`.
+
+        :param form: See `get_image`
+        :param converter: See `get_image`
+        :returns: `crossclip.timeouts.ReadRequest`; waiting on it converts the
+                  image on the waiting thread
+        """
+        if self._pending is not None:
+            self.flush()
+        return ReadRequest(self.backend, self.backend.request_image,
+                           lambda image: self._convert_native(image, form, converter))
+
+    def request_bytes(self, target):
+        """
+        Starts reading the raw bytes of a target without waiting for them. See `request_text`.
+
+        :param target: Target name
+        :returns: `crossclip.timeouts.ReadRequest`
+        """
+        if self._pending is not None:
+            self.flush()
+        return ReadRequest(self.backend, lambda callback: self.backend.request_contents(target, callback),
+                           memoryview)
+
+    def request_targets(self):
+        """
+        Starts listing the offered targets without waiting for them. See `request_text`.
+
+        :returns: `crossclip.timeouts.ReadRequest`
+        :raises NotImplementedError: If the backend can't list targets
+        """
+        if self._pending is not None:
+            self.flush()
+        return ReadRequest(self.backend, self.backend.request_targets)
+
+    def iter_bytes(self, target, chunk_size=64 * 1024):
         """
-        return self.backend.get_image(form, converter)
+        Reads the raw bytes of a target in chunks, so that a large paste can be
+        written to a file or a socket as it arrives:
 
+            with open('paste.bin', 'wb') as out:
+                for chunk in clipboard.iter_bytes('image/png'):
+                    out.write(chunk)
+
+        Chunks are never cached. Only the command line backend streams,
+        holding about one chunk at a time. Gtk and Qt hand the payload over
+        once the whole transfer is done, so there the peak memory is the full
+        payload and chunking only bounds what the caller works on at once.
+
+        :param target: Target name
+        :type target: str
+        :param chunk_size: Largest chunk yielded, in bytes (default: 64 KiB)
+        :type chunk_size: int
+        :returns: Iterator of bytes-like chunks, empty if target isn't offered
+        :raises NotImplementedError: If the backend can't read arbitrary targets
+        """
+        if chunk_size <= 0:
+            raise RuntimeError('chunk_size must be positive')
+        if self._pending is not None:
+            self.flush()
+        return self.backend.iter_contents(target, chunk_size)
+
+    @instrumented('snapshot')
+    def snapshot(self, targets, retries=3, timeout=None):
+        """
+        Reads several targets at once, e.g text, HTML and an image, and
+        guarantees that they all come from the same clipboard owner:
+
+            snap = clipboard.snapshot(['text/plain', 'text/html', 'image/png'])
+            html = snap['text/html']
+
+        Every target is requested before any reply is awaited, so the
+        transfers overlap instead of taking one round trip each. If the
+        clipboard changes meanwhile, the whole batch is read again. The
+        owner is identified by the backend's change notifications and, where
+        the owner offers it, by its TIMESTAMP target, read at both ends of the
+        batch. Backends with neither can't detect a change within the batch.
+
+        Snapshots are never cached.
+
+        :param targets: Target names to read
+        :type targets: list
+        :param retries: Times the batch is read again after a change (default: 3)
+        :type retries: int
+        :param timeout: Longest time for the whole snapshot, retries included,
+                        in seconds (default: None)
+        :type timeout: float
+        :returns: Target names mapped to their bytes, or to None if not offered,
+                  or `crossclip.timeouts.TIMED_OUT`
+        :rtype: `ClipboardSnapshot`
+        :raises RuntimeError: If the clipboard changed during every attempt
+        :raises NotImplementedError: If the backend can't read arbitrary targets
+        """
+        targets = list(targets)
+        deadline = deadline_after(timeout)
+        if self._pending is not None:
+            self.flush()
+        tracked = self._track_changes()
+
+        for _ in range(retries + 1):
+            self.backend.process_events()
+            count = self.backend.change_count
+            try:
+                with phase('backend'):
+                    offered = self._fetch(self.backend.request_targets, self.backend.available_targets, deadline)
+            except NotImplementedError:
+                offered = None
+            if offered is TIMED_OUT:
+                return TIMED_OUT
+            wanted = [target for target in targets if offered is None or target in offered]
+            stamped = offered is not None and TIMESTAMP_TARGET in offered
+            batch = [TIMESTAMP_TARGET] + wanted + [TIMESTAMP_TARGET] if stamped else wanted
+
+            with phase('backend'):
+                results = read_batch(self.backend, batch, deadline=deadline)
+            if results is TIMED_OUT:
+                return TIMED_OUT
+            self.backend.process_events()
+            if tracked and self.backend.change_count != count:
+                continue
+            timestamp = None
+            if stamped:
+                first, last = results.pop(0), results.pop()
+                if first is None or first != last:
+                    continue
+                timestamp = parse_timestamp(first)
+
+            data = dict.fromkeys(targets)
+            data.update(zip(wanted, results))
+            return ClipboardSnapshot(data, offered, timestamp, count, time.time())
+
+        raise RuntimeError('The clipboard kept changing while taking a snapshot')
+
+    def _track_changes(self):
+        """
+        Subscribes to change notifications, so that `backend.change_count`
+        moves with the clipboard.
+
+        :returns bool: False if the backend can't report changes
+        """
+        if self._change_handle is None:
+            try:
+                self._change_handle = self.backend.add_change_listener(lambda change: None)
+            except NotImplementedError:
+                self._change_handle = False
+        return self._change_handle is not False
+
+    def watch(self, callback=None):
+        """
+        Watches the clipboard for changes without fetching its contents.
+
+        With a callback, each `ClipboardChange` is handed to it as the toolkit
+        reports it; the toolkit's main loop (or `backend.process_events`) must
+        be running for that to happen. Without one, the returned watcher is
+        an iterator and an async iterator over the changes:
+
+            with clipboard.watch() as changes:
+                for change in changes:
+                    print(change.targets)
+
+        :param callback: Called with each `ClipboardChange` (default: None)
+        :returns: `ClipboardWatcher`, which stops watching when closed
+        :raises NotImplementedError: If the backend can't report changes
+        """
+        return ClipboardWatcher(self.backend, callback)
+
+    @instrumented('set_text', 'argument')
     def set_text(self, text: str):
         """
         Places text on the clipboard.
@@ -91,15 +691,285 @@ class Clipboard:
         :param text: Text to add
         :type text: str
         """
-        self.backend.set_text(text)
+        self._submit(self._commit_text, text)
+
+    @instrumented('set_image', 'argument')
+    def set_image(self, image, converter=None):
+        """
+        Sets an image on the clipboard. Image can be of type `PIL.Image`,
+        `self.image_converter.image_type`, a HxWx3 or HxWx4 uint8 numpy array,
+        or any type known to `self.converters`.
+
+        :param image: image to be placed.
+        :type image: instance of `PIL.Image`, `numpy.ndarray` or `self.image_converter.image_type`
+        :param converter: Converter for an image type the clipboard doesn't know yet
+        :type converter: instance of `AbstractImageConverter`
+        :raises RuntimeWarning: If the image type is unknown
+        """
+        if converter is not None:
+            self.converters.register(converter)
+        form = self.converters.identify(image)
+        if form is None:
+            raise RuntimeWarning("Image is of invalid type and has no converter")
+        if form == 'numpy':
+            # Reject arrays that aren't images now rather than when committing
+            array_mode(image)
+        self._submit(self._commit_image, image)
+
+    @instrumented('set_data', 'argument')
+    def set_data(self, data):
+        """
+        Offers several targets at once, e.g text/plain, text/html and image/png,
+        in a single clipboard ownership. A value can be given directly or as a
+        callable; a callable is only invoked if an application actually asks
+        for its target, so formats nobody pastes cost nothing.
+
+            clipboard.set_data({
+                'text/plain': 'Hello World',
+                'text/html': '<b>Hello World</b>',
+                'image/png': lambda: render_preview(),
+            })
+
+        :param data: dict of target to str, bytes, `PIL.Image`, or a callable
+                     returning one of those
+        :type data: dict
+        :raises NotImplementedError: If the backend can't offer arbitrary targets
+        """
+        if not data:
+            raise RuntimeError('At least one target must be offered')
+        self._submit(self._commit_data, dict(data))
+
+    @instrumented('flush', None)
+    def flush(self):
+        """
+        Commits a write that is being held back by coalescing, if any.
+        """
+        with self._write_lock:
+            pending = self._pending
+            self._pending = None
+            _coalescing.discard(self)
+            if self._pending_timer is not None:
+                self._pending_timer.cancel()
+                self._pending_timer = None
+        if pending is not None:
+            commit, value = pending
+            commit(value)
+
+    def _submit(self, commit, value):
+        """
+        Commits a write now, or holds it back until the coalescing window
+        passes without another write.
+        """
+        if self.coalesce <= 0:
+            commit(value)
+            return
+
+        with self._write_lock:
+            self._pending = (commit, value)
+            _coalescing.add(self)
+            if self._pending_timer is not None:
+                self._pending_timer.cancel()
+            self._pending_timer = self.backend.call_later(self.coalesce, self.flush)
+
+    def _is_duplicate(self, value):
+        """
+        Checks if value is what this frontend last wrote, and if it is still
+        on the clipboard.
+
+        Other frontends sharing the backend (pooled connections, executor
+        proxies) write under the same ownership, so `owns_clipboard` can't tell
+        their writes apart from ours. The backend's change count can: only the
+        notification of our own write may have arrived since it was made.
+
+        :returns: (is duplicate, digest of value)
+        """
+        if not self.deduplicate:
+            return False, None
+        with phase('hash'):
+            digest = content_digest(value)
+        if digest is None or digest != self._owned_digest:
+            self._owned_count = self._change_mark()
+            return False, digest
+        # Notifications still held by the toolkit may be of another frontend's write
+        self.backend.process_events()
+        count = self._change_mark()
+        if count is not None and self._owned_count is not None and count - self._owned_count > 1:
+            self._owned_count = count
+            return False, digest
+        with phase('backend'):
+            duplicate = self.backend.owns_clipboard() is True
+        if not duplicate:
+            self._owned_count = count
+        return duplicate, digest
+
+    def _change_mark(self):
+        """
+        :returns int: The backend's change count, or None if the backend can't
+                      report changes
+        """
+        if not self._track_changes():
+            return None
+        return self.backend.change_count
+
+    def _commit_text(self, text):
+        duplicate, digest = self._is_duplicate(text)
+        if duplicate:
+            return
+        self._invalidate_cache()
+        with phase('backend'):
+            self.backend.set_text(text)
+        self._owned_digest = digest
+
+    def _commit_data(self, data):
+        # Offers are never deduplicated: callables can't be hashed by content
+        self._invalidate_cache()
+        with phase('backend'):
+            self.backend.set_data(data)
+        self._owned_digest = None
+
+    def _commit_image(self, image):
+        duplicate, digest = self._is_duplicate(image)
+        if duplicate:
+            return
+        if self.image_encoding is not None and not self.image_encoding.raw:
+            with phase('convert'):
+                image = self.converters.convert(image, 'pil')
+            self._invalidate_cache()
+            with phase('backend'):
+                self._offer_encoded(image)
+            self._owned_digest = digest
+            return
+        with phase('convert'):
+            native = self.converters.convert(image, self.image_converter.image_str)
+        self._invalidate_cache()
+        with phase('backend'):
+            self.backend.set_image(native)
+        self._owned_digest = digest
+
+    def _offer_encoded(self, image):
+        """
+        Offers a Pillow image in the encodings of `self.image_encoding`. Backends
+        that hold a single target get the preferred encoding only, and backends
+        that can't offer targets at all get the pixels.
+        """
+        offer = self.image_encoding.offer(image)
+        first = next(iter(offer))
+        for data in (offer, {first: offer[first]}):
+            try:
+                self.backend.set_data(data)
+                return
+            except NotImplementedError:
+                if len(data) == 1:
+                    break
+        self.backend.set_image(self.converters.convert(image, self.image_converter.image_str, 'pil'))
+
+
+class AsyncClipboard:
+    """ asyncio frontend to the clipboard backends
+
+    Reads are issued through the backends' non-blocking `request_*` calls, so
+    any number of them can be in flight without blocking the event loop or
+    using threads. Answers that come from the toolkit's events need them
+    dispatched: unless the backend notifies in the background, a task on the
+    running loop then calls `AbstractBackend.process_events` while requests
+    are outstanding, less and less often while no answer arrives.
+    """
+    poll_interval = 0.001
+    """ Seconds before the first toolkit event dispatch for a new request. The
+    interval doubles while requests stay pending, up to `max_poll_interval`
+    """
+    max_poll_interval = 0.05
+    """ Longest time between two toolkit event dispatches while requests are pending
+    """
+
+    def __init__(self, clip_backend_type=None, clipboard=None):
+        """
+        Creates a new asynchronous clipboard.
+
+        :param clip_backend_type: Which backend to use. Defaults to the backend chosen by
+                                  `crossclip.select_backend`
+        :type clip_backend_type: subclass of `AbstractBackend`
+        :param clipboard: Existing `Clipboard` to share the backend with (default: None)
+        :type clipboard: `Clipboard`
+        """
+        if clipboard is None:
+            clipboard = Clipboard(clip_backend_type)
+        self.clipboard = clipboard
+        self.backend = clipboard.backend
+        self._pending = 0
+        self._pump = None
+        self._delay = self.poll_interval
+
+    async def get_text(self):
+        """
+        Gets text from the clipboard.
+
+        :returns: Text from clipboard or None if no text is available
+        :rtype: str
+        """
+        return await self._request(self.backend.request_text)
+
+    async def get_image(self, form='pil', converter=None):
+        """
+        Gets an image from the clipboard. See `Clipboard.get_image`.
+
+        :returns: Initialized image object or None if no image is available
+        """
+        image = await self._request(self.backend.request_image)
+        return self.clipboard._convert_native(image, form, converter)
+
+    async def set_text(self, text):
+        """
+        Places text on the clipboard. Setting never waits on another
+        application, so this completes without suspending.
+
+        :param text: Text to add
+        :type text: str
+        """
+        self.clipboard.set_text(text)
 
-    def set_image(self, image):
+    async def set_image(self, image, converter=None):
         """
-        Sets an image on the clipboard. Image can either be of type `PIL.Image` or
-        `self.image_converter.image_type`.
+        Sets an image on the clipboard. See `Clipboard.set_image`.
 
         :param image: image to be placed.
-        :type image: instance of `PIL.Image` or `self.image_converter.image_type`
-        :raises RuntimeError: If image is neither of type `PIL.Image` nor `self.image_converter.image_type`
         """
-        self.backend.set_image(image)
+        self.clipboard.set_image(image, converter)
+
+    async def _request(self, request):
+        """
+        Issues a backend request and waits for its callback.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(value):
+            if not future.done():
+                future.set_result(value)
+
+        def callback(value):
+            # Backends may answer synchronously, from the pump, or from another thread
+            loop.call_soon_threadsafe(resolve, value)
+
+        self._pending += 1
+        try:
+            request(callback)
+            if self.backend.has_events and not self.backend.notifies_in_background:
+                self._start_pump(loop)
+            return await future
+        finally:
+            self._pending -= 1
+
+    def _start_pump(self, loop):
+        # A new request is likely answered soon: dispatch early again
+        self._delay = self.poll_interval
+        if self._pump is None or self._pump.done():
+            self._pump = loop.create_task(self._run_pump())
+
+    async def _run_pump(self):
+        # Yield first so that requests answered synchronously resolve without a dispatch
+        await asyncio.sleep(0)
+        while self._pending > 0:
+            self.backend.process_events()
+            await asyncio.sleep(self._delay)
+            self._delay = min(self._delay * 2, self.max_poll_interval)
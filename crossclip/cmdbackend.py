@@ -0,0 +1,481 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# cmdbackend.py -- backend driving command line clipboard tools
+
+import os
+import shutil
+import threading
+import subprocess
+import weakref
+from io import BytesIO
+
+from PIL import Image as PilImage
+from PIL.Image import Image as PilImageType
+
+from .absbackend import AbstractBackend, AbstractImageConverter
+from .converters import PilImageConverter
+from .targets import encode_image, is_text_target
+
+
+class CommandTool:
+    """ Description of a command line clipboard tool
+
+    The copy command must take the target as its last argument, if it takes
+    one at all, so that a writer can be started before the target is known.
+    """
+
+    def __init__(self, name, executables, display, paste, copy, targets=None,
+                 text_target='text/plain', takes_target=True):
+        """
+        :param name: Name reported by `CommandBackend.tool`
+        :param executables: Executables that must be on PATH
+        :param display: Environment variable naming the display the tool talks to
+        :param paste: Arguments printing the clipboard, without the target
+        :param copy: Arguments reading the clipboard from stdin, without the target
+        :param targets: Arguments listing the offered targets, or None if unsupported
+        :param text_target: Target used for plain text
+        :param takes_target: False if the tool only handles text
+        """
+        self.name = name
+        self.executables = executables
+        self.display = display
+        self.paste = paste
+        self.copy = copy
+        self.targets = targets
+        self.text_target = text_target
+        self.takes_target = takes_target
+
+    def available(self, environ=None):
+        """
+        :returns bool: True if the tool is installed and its display is set
+        """
+        environ = os.environ if environ is None else environ
+        if not environ.get(self.display):
+            return False
+        path = environ.get('PATH')
+        return all(shutil.which(executable, path=path) is not None for executable in self.executables)
+
+    def paste_args(self, target):
+        """
+        :returns list: Command printing target
+        """
+        return self.paste + [target] if self.takes_target else list(self.paste)
+
+    def __repr__(self):
+        return 'CommandTool({})'.format(self.name)
+
+
+TOOLS = [
+    CommandTool('wl-clipboard', ['wl-copy', 'wl-paste'], 'WAYLAND_DISPLAY',
+                paste=['wl-paste', '--no-newline', '--type'],
+                copy=['wl-copy', '--type'],
+                targets=['wl-paste', '--list-types'],
+                text_target='text/plain;charset=utf-8'),
+    CommandTool('xclip', ['xclip'], 'DISPLAY',
+                paste=['xclip', '-selection', 'clipboard', '-out', '-target'],
+                copy=['xclip', '-selection', 'clipboard', '-in', '-target'],
+                targets=['xclip', '-selection', 'clipboard', '-out', '-target', 'TARGETS'],
+                text_target='UTF8_STRING'),
+    CommandTool('xsel', ['xsel'], 'DISPLAY',
+                paste=['xsel', '--clipboard', '--output'],
+                copy=['xsel', '--clipboard', '--input'],
+                text_target='UTF8_STRING',
+                takes_target=False),
+]
+""" Supported tools, in order of preference
+"""
+
+# The pre-spawned writer reads the target from its first line and only then
+# execs the tool. If crossclip exits without using it, the shell sees EOF and
+# quits without touching the clipboard.
+_WRITER_SCRIPT = 'IFS= read -r target || exit 0; exec "$@" "$target"'
+_TEXT_WRITER_SCRIPT = 'IFS= read -r target || exit 0; exec "$@"'
+
+
+class _HelperRead:
+    """ Processes started by one read running on a helper thread
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs = []
+        self.aborted = False
+
+    def track(self, proc):
+        with self._lock:
+            if not self.aborted:
+                self._procs.append(proc)
+                return
+        _kill(proc)
+
+    def abort(self):
+        """
+        Kills the tool the read waits on, so neither it nor the thread is
+        left behind by a caller that gave up.
+        """
+        with self._lock:
+            self.aborted = True
+            procs, self._procs = self._procs, []
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+
+
+_helper = threading.local()
+
+
+def _start_tool(args, bufsize=-1):
+    """
+    Starts a tool writing to a pipe. On a helper thread, the process is
+    killed if the read is aborted.
+    """
+    proc = subprocess.Popen(args, bufsize=bufsize, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    read = getattr(_helper, 'read', None)
+    if read is not None:
+        read.track(proc)
+    return proc
+
+
+def _answer_in_thread(read, callback):
+    """
+    Runs a blocking read on a daemon thread, so that the caller can give up
+    on a tool that hangs waiting for the clipboard owner.
+
+    :returns: Callable aborting the read
+    """
+    helper = _HelperRead()
+
+    def run():
+        _helper.read = helper
+        try:
+            value = read()
+        except (OSError, RuntimeError, RuntimeWarning):
+            value = None
+        if not helper.aborted:
+            callback(value)
+
+    threading.Thread(target=run, daemon=True).start()
+    return helper.abort
+
+
+def find_tool(name=None, environ=None):
+    """
+    Finds a usable command line clipboard tool.
+
+    :param name: Name of the tool to look for, or None for the first usable one
+    :param environ: Environment to look in (default: os.environ)
+    :returns: `CommandTool`, or None if none is usable
+    """
+    for tool in TOOLS:
+        if (name is None or tool.name == name) and tool.available(environ):
+            return tool
+    return None
+
+
+def _kill(proc):
+    if proc.stdin is not None:
+        proc.stdin.close()
+    if proc.poll() is None:
+        proc.kill()
+    proc.wait()
+
+
+class CommandBackend(AbstractBackend):
+    """ Clipboard backend driving command line tools
+
+    This backend needs neither PyGObject nor PyQt5: it runs wl-clipboard,
+    xclip or xsel, whichever is found first. Payloads go through pipes and
+    are never staged in temporary files. To take process creation off the
+    write path, a writer process is started ahead of time and handed the
+    next payload; the tool itself then keeps serving the clipboard in the
+    background, as it does when used from a shell.
+
+    These tools can't report changes, and they can only offer one target at
+    a time.
+    """
+
+    image_converter = PilImageConverter()
+
+    prespawn = True
+    """ If true, the next writer process is started ahead of each write
+    """
+
+    def __init__(self, tool=None):
+        """
+        :param tool: Name of the tool to use, e.g 'xclip'. If None, the first
+                     usable one is picked (default: None)
+        :raises RuntimeError: If no usable tool is found
+        """
+        super().__init__()
+        found = find_tool(tool)
+        if found is None:
+            raise RuntimeError('No usable clipboard command found' if tool is None else
+                               'Clipboard command {} is not usable'.format(tool))
+        self._tool = found
+        self._lock = threading.Lock()
+        self._spare = None
+        if self.prespawn:
+            self._spawn_spare()
+
+    @property
+    def tool(self):
+        """
+        Name of the tool in use, e.g 'xclip'.
+        """
+        return self._tool.name
+
+    def close(self):
+        """
+        Stops the pre-spawned writer. The clipboard contents are kept.
+        """
+        with self._lock:
+            spare, self._spare = self._spare, None
+        if spare is not None:
+            spare[0]()
+
+    def _start_writer(self):
+        script = _WRITER_SCRIPT if self._tool.takes_target else _TEXT_WRITER_SCRIPT
+        proc = subprocess.Popen(['/bin/sh', '-c', script, 'crossclip'] + self._tool.copy,
+                                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        # Don't leave a writer behind if the backend is dropped without close()
+        return weakref.finalize(self, _kill, proc), proc
+
+    def _spawn_spare(self):
+        spare = self._start_writer()
+        with self._lock:
+            old, self._spare = self._spare, spare
+        if old is not None:
+            old[0]()
+
+    def _take_writer(self):
+        with self._lock:
+            spare, self._spare = self._spare, None
+        if spare is None or spare[1].poll() is not None:
+            if spare is not None:
+                spare[0]()
+            spare = self._start_writer()
+        return spare
+
+    def _read(self, target, bufsize=-1):
+        return _start_tool(self._tool.paste_args(target), bufsize)
+
+    def _can_read(self, target):
+        return self._tool.takes_target or is_text_target(target)
+
+    def available_targets(self):
+        """
+        Lists the offered targets.
+
+        :returns list: Target names
+        :raises NotImplementedError: If the tool can't list targets
+        """
+        if self._tool.targets is None:
+            raise NotImplementedError('{} cannot list targets'.format(self.tool))
+        proc = _start_tool(self._tool.targets)
+        with proc.stdout:
+            data = proc.stdout.read()
+        if proc.wait() != 0:
+            return []
+        return [line for line in data.decode('utf-8', 'replace').splitlines() if line]
+
+    def get_contents(self, target):
+        """
+        Reads the raw bytes of a target.
+
+        :param target: Target name
+        :returns bytes: Payload, or None if target isn't offered
+        """
+        if not self._can_read(target):
+            return None
+        proc = self._read(target)
+        with proc.stdout:
+            data = proc.stdout.read()
+        return data if proc.wait() == 0 else None
+
+    def request_contents(self, target, callback):
+        """
+        Reads the raw bytes of a target on a helper thread, which runs the callback.
+
+        :param target: Target name
+        :param callback: Called with the payload, or None
+        :returns: Callable killing the tool and abandoning the read
+        """
+        return _answer_in_thread(lambda: self.get_contents(target), callback)
+
+    def request_text(self, callback):
+        """
+        Gets text on a helper thread, which runs the callback.
+
+        :param callback: Called with the text, or None
+        :returns: Callable killing the tool and abandoning the read
+        """
+        return _answer_in_thread(self.get_text, callback)
+
+    def request_image(self, callback):
+        """
+        Gets the image on a helper thread, which runs the callback.
+
+        :param callback: Called with the `PIL.Image`, or None
+        :returns: Callable killing the tool and abandoning the read
+        """
+        return _answer_in_thread(self.get_image, callback)
+
+    def request_targets(self, callback):
+        """
+        Lists the offered targets on a helper thread, which runs the callback.
+
+        :param callback: Called with the list of target names
+        :returns: Callable killing the tool and abandoning the read
+        :raises NotImplementedError: If the tool can't list targets
+        """
+        if self._tool.targets is None:
+            raise NotImplementedError('{} cannot list targets'.format(self.tool))
+        return _answer_in_thread(self.available_targets, callback)
+
+    def iter_contents(self, target, chunk_size):
+        """
+        Reads the raw bytes of a target straight from the tool's pipe, so at
+        most one chunk is held at a time. Stopping the iteration early stops
+        the tool.
+
+        :param target: Target name
+        :param chunk_size: Largest chunk yielded, in bytes
+        :returns: Iterator of bytes chunks
+        """
+        if not self._can_read(target):
+            return
+        proc = self._read(target, bufsize=0)
+        try:
+            while True:
+                chunk = proc.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            proc.stdout.close()
+            _kill(proc)
+
+    def set_contents(self, target, data):
+        """
+        Places the raw bytes of one target on the clipboard.
+
+        :param target: Target name
+        :param data: bytes-like payload, or an iterable of bytes-like chunks
+        :raises RuntimeError: If the tool fails
+        """
+        if '\n' in target:
+            raise RuntimeError('Invalid target name {!r}'.format(target))
+        finalizer, proc = self._take_writer()
+        try:
+            proc.stdin.write(target.encode('utf-8') + b'\n')
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                proc.stdin.write(data)
+            else:
+                for chunk in data:
+                    proc.stdin.write(chunk)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        code = proc.wait()
+        finalizer.detach()
+        if self.prespawn:
+            self._spawn_spare()
+        if code != 0:
+            raise RuntimeError('{} failed with exit code {}'.format(self.tool, code))
+
+    def get_text(self):
+        """
+        Gets text from the clipboard.
+
+        :return str: Text from clipboard, or None
+        """
+        data = self.get_contents(self._tool.text_target)
+        return None if data is None else data.decode('utf-8', 'replace')
+
+    def get_image(self, format='pil', converter=None):
+        """
+        Gets the image from the clipboard, transferred as image/png.
+
+        :param format: 'pil' for a pillow image, or the `image_str` of `converter` (default: 'pil')
+        :param converter: Converter used for any other format
+        :returns: Image in chosen format, or None
+        :raises RuntimeWarning: If format is invalid and no converter is provided
+        """
+        data = self.get_contents('image/png')
+        if not data:
+            return None
+        image = PilImage.open(BytesIO(data))
+        image.load()
+
+        if format == self.image_converter.image_str:
+            return image
+        elif converter is not None and isinstance(converter, AbstractImageConverter):
+            return converter.from_pillow(image)
+        else:
+            raise RuntimeWarning("Invalid format, and converter is not provided")
+
+    def set_text(self, text):
+        """
+        Sets text to the clipboard.
+
+        :param text: text to set to clipboard
+        """
+        self.set_contents(self._tool.text_target, text.encode('utf-8'))
+
+    def set_image(self, image, converter=None):
+        """
+        Sets an image to the clipboard as image/png.
+
+        :param image: Pillow image, or an image `converter` can convert
+        :param converter: Converter for non-pillow images
+        :raises RuntimeWarning: If image is of invalid type and has no converter
+        :raises NotImplementedError: If the tool only handles text
+        """
+        if not self._tool.takes_target:
+            raise NotImplementedError('{} can only hold text'.format(self.tool))
+        if not isinstance(image, PilImageType):
+            if converter is not None and isinstance(converter, AbstractImageConverter):
+                image = converter.to_pillow(image)
+            else:
+                raise RuntimeWarning("Image is of invalid type and has no converter")
+        self.set_contents('image/png', encode_image(image, 'image/png'))
+
+    def set_data(self, data):
+        """
+        Offers a single target. Command line tools own the clipboard with one
+        target only, so offering several raises.
+
+        :param data: dict of one target to str, bytes, `PIL.Image`, or a callable
+                     returning one of those
+        :raises NotImplementedError: If more than one target is given, or a
+                                     non-text one to a tool only handling text
+        """
+        if len(data) != 1:
+            raise NotImplementedError('{} can only offer one target at a time'.format(self.tool))
+        (target, value), = data.items()
+        if not self._can_read(target):
+            raise NotImplementedError('{} can only hold text'.format(self.tool))
+        if callable(value):
+            value = value()
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        elif isinstance(value, PilImageType):
+            value = encode_image(value, target)
+        self.set_contents(target, value)
@@ -0,0 +1,223 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# connections.py -- backends shared per display
+
+import time
+import threading
+
+from .clipboard import Clipboard
+
+
+class SharedConnection:
+    """ One backend shared by every handle on the same display
+    """
+    __slots__ = ('backend', 'key', 'refs', 'idle_since')
+
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.key = key
+        """ (backend class, display) the backend was created for
+        """
+        self.refs = 0
+        """ Number of handles using the backend
+        """
+        self.idle_since = None
+        """ `time.monotonic()` at which the last handle was released, or None while in use
+        """
+
+    def __repr__(self):
+        return 'SharedConnection({}, display={!r}, refs={})'.format(
+            self.key[0].__name__, self.key[1], self.refs)
+
+
+class PooledClipboard(Clipboard):
+    """ `Clipboard` handle on a backend owned by a `ConnectionPool`
+
+    Closing the handle gives the backend back to the pool instead of
+    closing it.
+    """
+
+    def __init__(self, pool, backend, **kwargs):
+        self._pool = pool
+        super().__init__(backend=backend, **kwargs)
+
+    def close(self):
+        super().close()
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.release(self.backend)
+
+
+class ConnectionPool:
+    """ Shares one backend, and so one toolkit connection, per display
+
+    Creating a backend connects to the display and sets up the toolkit,
+    which is too slow to do per request. The pool keeps one backend for each
+    (backend class, display) pair and hands out cheap `Clipboard` handles on
+    it, counting them. Several displays, e.g a set of Xvfb servers, can be
+    used side by side.
+
+    A backend nobody has used for `idle_timeout` seconds is closed the next
+    time the pool is used, or when `reap` is called. Toolkit objects must be
+    closed on the thread they belong to, so the pool never does this from a
+    timer thread of its own.
+    """
+
+    def __init__(self, idle_timeout=60.0):
+        """
+        :param idle_timeout: Seconds an unused backend is kept, or None to keep
+                             it until `close` (default: 60)
+        """
+        self.idle_timeout = idle_timeout
+        self._connections = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._connections)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def connections(self):
+        """
+        :returns list: `SharedConnection` of every open backend
+        """
+        with self._lock:
+            return list(self._connections.values())
+
+    def acquire(self, backend_type=None, display=None):
+        """
+        Returns the shared backend of a display, creating it on first use.
+        Give it back with `release`.
+
+        :param backend_type: Backend class or name. Defaults to the backend
+                             chosen by `crossclip.select_backend`
+        :param display: Display to connect to, e.g ':1', or None for the default
+        :returns: Backend instance
+        :raises RuntimeError: If the backend can't be created, or can't choose its display
+        """
+        backend_type = _resolve(backend_type)
+        key = (backend_type, display)
+        with self._lock:
+            self.reap()
+            connection = self._connections.get(key)
+            if connection is None:
+                if display is None:
+                    backend = backend_type()
+                else:
+                    try:
+                        backend = backend_type(display=display)
+                    except TypeError as err:
+                        raise RuntimeError('The {} backend cannot choose its display'.format(
+                            backend_type.__name__)) from err
+                connection = self._connections[key] = SharedConnection(backend, key)
+            connection.refs += 1
+            connection.idle_since = None
+            return connection.backend
+
+    def release(self, backend):
+        """
+        Gives back a backend obtained from `acquire`.
+
+        :param backend: Backend instance
+        :raises RuntimeError: If backend isn't in use from this pool
+        """
+        with self._lock:
+            for connection in self._connections.values():
+                if connection.backend is backend and connection.refs > 0:
+                    break
+            else:
+                raise RuntimeError('Backend was not acquired from this pool')
+            connection.refs -= 1
+            if connection.refs == 0:
+                connection.idle_since = time.monotonic()
+            self.reap()
+
+    def clipboard(self, backend_type=None, display=None, **kwargs):
+        """
+        Returns a `Clipboard` on the shared backend of a display. Close it
+        when done, or use it as a context manager:
+
+            with pool.clipboard(display=':1') as clipboard:
+                clipboard.set_text('Hello World')
+
+        :param backend_type: See `acquire`
+        :param display: See `acquire`
+        :param kwargs: Further arguments of `Clipboard`, e.g cache=True
+        :returns: `PooledClipboard`
+        """
+        backend = self.acquire(backend_type, display)
+        try:
+            return PooledClipboard(self, backend, **kwargs)
+        except BaseException:
+            self.release(backend)
+            raise
+
+    def reap(self, now=None):
+        """
+        Closes the backends that have been unused for `idle_timeout` seconds.
+
+        :param now: Current `time.monotonic()` (default: now)
+        :returns int: Number of backends closed
+        """
+        if self.idle_timeout is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [connection for connection in self._connections.values()
+                    if connection.refs == 0 and now - connection.idle_since >= self.idle_timeout]
+            for connection in idle:
+                del self._connections[connection.key]
+                connection.backend.close()
+            return len(idle)
+
+    def close(self):
+        """
+        Closes every backend, including those still in use.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, {}
+        for connection in connections.values():
+            connection.backend.close()
+
+
+def _resolve(backend_type):
+    if backend_type is None:
+        from . import select_backend
+        return select_backend()
+    if isinstance(backend_type, str):
+        from .registry import default_registry
+        return default_registry.load(backend_type)
+    return backend_type
+
+
+default_pool = ConnectionPool()
+""" Pool used by `shared_clipboard`
+"""
+
+
+def shared_clipboard(backend_type=None, display=None, **kwargs):
+    """
+    Returns a `Clipboard` handle sharing its backend with every other handle
+    on the same display. See `ConnectionPool.clipboard`.
+    """
+    return default_pool.clipboard(backend_type, display, **kwargs)
@@ -0,0 +1,399 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# converters.py -- toolkit independent image converters
+
+import sys
+import heapq
+import threading
+import importlib.util
+
+from PIL import Image as PilImage
+from PIL.Image import Image as PilImageType
+
+HAVE_NUMPY = importlib.util.find_spec('numpy') is not None
+""" True if the optional numpy extra is installed. numpy itself is only
+imported once an array is converted
+"""
+
+from .absbackend import AbstractImageConverter, Conversion
+from .scaling import fit_size, scale_pillow
+
+
+class PilImageConverter(AbstractImageConverter):
+    """ Converter for backends whose native image type is a Pillow image
+
+    Both conversions are the identity.
+    """
+    pillow_cost = 0
+
+    @property
+    def image_type(self):
+        """
+        Returns the type of image that this converter uses.
+
+        :returns: PIL.Image.Image type (not object!)
+        """
+        return PilImageType
+
+    @property
+    def image_str(self):
+        """
+        Returns a string representation of what the object is.
+
+        :returns str: 'pil'
+        """
+        return 'pil'
+
+    def to_pillow(self, image):
+        """
+        Returns the image unchanged.
+
+        :param image: `PIL.Image`
+        :returns PIL.Image: The same image
+        """
+        return image
+
+    def from_pillow(self, image):
+        """
+        Returns the image unchanged.
+
+        :param image: `PIL.Image`
+        :returns PIL.Image: The same image
+        """
+        return image
+
+    def conversions(self):
+        """
+        Pillow is the hub form itself, so there is nothing to convert.
+
+        :returns: Empty list
+        """
+        return []
+
+    def scale(self, image, max_size=None, reduce=None):
+        """
+        Scales the image down with `Image.reduce` and `Image.resize`.
+
+        :param image: `PIL.Image`
+        :param max_size: (width, height) box to fit in, or None
+        :param reduce: Factor to divide both sides by, or None
+        :returns PIL.Image: Scaled image
+        """
+        return scale_pillow(image, fit_size(image.size, max_size, reduce))
+
+
+ARRAY_MODES = {1: 'L', 3: 'RGB', 4: 'RGBA'}
+""" Pillow mode of uint8 arrays by number of channels
+"""
+
+
+def array_mode(array):
+    """
+    Finds the Pillow mode matching an image array.
+
+    :param array: HxW, HxWx3 or HxWx4 uint8 array
+    :returns str: 'L', 'RGB' or 'RGBA'
+    :raises RuntimeWarning: If the array isn't an image of a supported layout
+    """
+    import numpy
+
+    if array.dtype != numpy.uint8 or array.ndim not in (2, 3):
+        raise RuntimeWarning('Image arrays must be HxW, HxWx3 or HxWx4 uint8')
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    if channels not in ARRAY_MODES:
+        raise RuntimeWarning('Image arrays must be HxW, HxWx3 or HxWx4 uint8')
+    return ARRAY_MODES[channels]
+
+
+class NumpyImageConverter(AbstractImageConverter):
+    """ Converter for images given as numpy arrays
+
+    Arrays are HxWx3 (RGB), HxWx4 (RGBA) or HxW (grayscale) uint8. Backends
+    add direct conversions from their native image to 'numpy' that view the
+    native pixel buffer instead of copying it.
+    """
+    pillow_cost = 5
+    type_module = 'numpy'
+    """ Module defining `image_type`. `ConversionGraph` doesn't import it to
+    identify images: no array can exist before it's loaded
+    """
+
+    @property
+    def image_type(self):
+        """
+        Returns the type of image that this converter uses.
+
+        :returns: numpy.ndarray type (not object!)
+        """
+        import numpy
+        return numpy.ndarray
+
+    @property
+    def image_str(self):
+        """
+        Returns a string representation of what the object is.
+
+        :returns str: 'numpy'
+        """
+        return 'numpy'
+
+    def to_pillow(self, array):
+        """
+        Converts an array to a `PIL.Image`. Contiguous RGBA and grayscale arrays
+        are mapped without copying.
+
+        :param array: Image array
+        :returns PIL.Image: Converted Pillow Image
+        """
+        array_mode(array)
+        return PilImage.fromarray(array)
+
+    def from_pillow(self, image):
+        """
+        Converts a `PIL.Image` to an array.
+
+        :param image: `PIL.Image` to be converted
+        :returns numpy.ndarray: Converted image
+        """
+        if image.mode not in ARRAY_MODES.values():
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        import numpy
+        return numpy.asarray(image)
+
+
+class ConversionGraph:
+    """ Graph of image forms connected by conversions
+
+    Every registered converter adds its `Conversion` edges. Converting picks the
+    path with the lowest total cost, so a direct edge (e.g 'qt' to
+    'gdk-pixbuf') wins over going through Pillow, which is used as a hub only
+    when no cheaper path exists.
+
+    A graph can be layered over a parent graph: it sees everything registered
+    with the parent, before or after it was made, while its own registrations
+    stay private to it.
+    """
+
+    def __init__(self, parent=None):
+        """
+        :param parent: `ConversionGraph` to inherit forms and conversions from.
+                       A graph without parent knows Pillow and numpy (default: None)
+        """
+        self.parent = parent
+        self._conversions = []
+        self._types = {}
+        self._converters = {}
+        self._changes = 0
+        self._edges = {}
+        self._paths = {}
+        self._version = None
+        self._lock = threading.RLock()
+        if parent is None:
+            self.register(PilImageConverter())
+            if HAVE_NUMPY:
+                self.register(NumpyImageConverter())
+
+    @property
+    def version(self):
+        """ Changes whenever a conversion is added to this graph or a parent
+        """
+        if self.parent is None:
+            return self._changes
+        return (self._changes, self.parent.version)
+
+    def converter(self, form):
+        """
+        :param form: image_str of a form
+        :returns: The converter registered for form, or None
+        """
+        converter = self._converters.get(form)
+        if converter is None and self.parent is not None:
+            return self.parent.converter(form)
+        return converter
+
+    def layered(self, *converters):
+        """
+        Makes a graph over this one that also knows some converters, e.g one
+        passed along with a single call, without registering them here.
+
+        :param converters: instances of `AbstractImageConverter`
+        :returns: `ConversionGraph`
+        """
+        graph = ConversionGraph(self)
+        for converter in converters:
+            graph.register(converter)
+        return graph
+
+    def register(self, converter):
+        """
+        Adds a converter's image type and conversions to the graph. Registering
+        another instance of an already registered converter class is a no-op;
+        a converter of another class replaces the form's converter along with
+        its conversions.
+
+        :param converter: instance of `AbstractImageConverter`
+        :raises RuntimeError: If converter is of invalid type
+        """
+        if not isinstance(converter, AbstractImageConverter):
+            raise RuntimeError("Image converter is of invalid type")
+
+        form = converter.image_str
+        with self._lock:
+            if type(self.converter(form)) is type(converter):
+                return
+            self._converters[form] = converter
+            module = getattr(converter, 'type_module', None)
+            # None until the module is loaded, see `identify`
+            self._types[form] = converter.image_type if module is None or module in sys.modules else None
+            self._conversions = [(owner, conversion) for owner, conversion in self._conversions
+                                 if owner != form]
+            self._conversions += [(form, conversion) for conversion in converter.conversions()]
+            self._changes += 1
+
+    def add_conversion(self, conversion):
+        """
+        Adds a single direct conversion to the graph.
+
+        :param conversion: `Conversion` to add
+        """
+        with self._lock:
+            self._conversions.append((None, conversion))
+            self._changes += 1
+
+    def _all_conversions(self):
+        """
+        :returns list: (form of the owning converter or None, `Conversion`),
+                       inherited ones first
+        """
+        with self._lock:
+            own = list(self._conversions)
+            replaced = set(self._converters)
+        if self.parent is None:
+            return own
+        inherited = [(owner, conversion) for owner, conversion in self.parent._all_conversions()
+                     if owner is None or owner not in replaced]
+        return inherited + own
+
+    @staticmethod
+    def _add(edges, conversion):
+        if conversion.source == conversion.target:
+            return
+        targets = edges.setdefault(conversion.source, {})
+        current = targets.get(conversion.target)
+        if current is None or conversion.cost <= current.cost:
+            targets[conversion.target] = conversion
+
+    def forms(self):
+        """
+        Returns every form that has a registered image type.
+
+        :returns list: image_str values
+        """
+        forms = list(self._types)
+        if self.parent is not None:
+            forms += [form for form in self.parent.forms() if form not in self._types]
+        return forms
+
+    def identify(self, image):
+        """
+        Finds the form of an image object.
+
+        :param image: Image of any registered type
+        :returns str: image_str of the image, or None if it is unknown
+        """
+        if isinstance(image, PilImageType):
+            return 'pil'
+        for form, image_type in list(self._types.items()):
+            if image_type is None:
+                converter = self._converters[form]
+                if converter.type_module not in sys.modules:
+                    continue
+                image_type = self._types[form] = converter.image_type
+            if isinstance(image, image_type):
+                return form
+        if self.parent is not None:
+            return self.parent.identify(image)
+        return None
+
+    def path(self, source, target):
+        """
+        Finds the cheapest chain of conversions from source to target.
+
+        :param source: Source form
+        :param target: Target form
+        :returns list: `Conversion` steps, or None if target is unreachable
+        """
+        key = (source, target)
+        with self._lock:
+            version = self.version
+            if version != self._version:
+                self._edges = {}
+                for _, conversion in self._all_conversions():
+                    self._add(self._edges, conversion)
+                self._paths.clear()
+                self._version = version
+            if key not in self._paths:
+                self._paths[key] = self._search(source, target)
+            return self._paths[key]
+
+    def _search(self, source, target):
+        # Dijkstra over a graph that rarely has more than a handful of nodes
+        queue = [(0, 0, source, [])]
+        done = set()
+        counter = 0
+        while queue:
+            cost, _, form, steps = heapq.heappop(queue)
+            if form == target:
+                return steps
+            if form in done:
+                continue
+            done.add(form)
+            for conversion in self._edges.get(form, {}).values():
+                if conversion.target not in done:
+                    counter += 1
+                    heapq.heappush(queue, (cost + conversion.cost, counter,
+                                           conversion.target, steps + [conversion]))
+        return None
+
+    def convert(self, image, target, source=None):
+        """
+        Converts an image to the target form along the cheapest path.
+
+        :param image: Image to convert
+        :param target: Form to convert to
+        :param source: Form of `image`. Deduced from its type if None (default: None)
+        :returns: Converted image
+        :raises RuntimeWarning: If the image type is unknown or there is no path
+        """
+        if source is None:
+            source = self.identify(image)
+            if source is None:
+                raise RuntimeWarning("Image is of invalid type and has no converter")
+
+        steps = self.path(source, target)
+        if steps is None:
+            raise RuntimeWarning("Invalid format, and converter is not provided")
+        for conversion in steps:
+            image = conversion.function(image)
+        return image
+
+
+default_graph = ConversionGraph()
+""" Conversion graph every `Clipboard`'s own graph is layered over
+"""
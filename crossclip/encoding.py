@@ -0,0 +1,183 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# encoding.py -- image wire encodings and target negotiation
+
+from io import BytesIO
+
+from PIL import Image as PilImage
+
+from .instrument import phase
+from .targets import encode_image
+
+RAW = 'raw'
+""" Encoding name for images handed to the toolkit as pixels, which then
+encodes whatever target a consumer asks for
+"""
+
+ENCODING_TARGETS = {
+    'bmp': 'image/bmp',
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+""" Encoding names mapped to the target they are offered as
+"""
+
+LOSSY_TARGETS = ('image/jpeg', 'image/webp')
+
+FAST_DECODE_ORDER = ['image/bmp', 'image/x-bmp', 'image/tiff', 'image/png', 'image/jpeg', 'image/webp']
+""" Image targets from cheapest to costliest to decode with Pillow. Uncompressed
+formats decode at memory speed; PNG has to inflate and unfilter every row,
+and WebP is the slowest of all. See benchmarks/encoding_bench.py
+
+crossclip writes images with alpha as 32-bit BMPs, but the toolkits' BMP
+writers drop alpha, so only read in this order from owners known to be
+crossclip or to copy opaque images.
+"""
+
+DECODE_ORDER = ['image/png', 'image/bmp', 'image/x-bmp', 'image/tiff', 'image/jpeg', 'image/webp']
+""" Image targets read by default: PNG first, since it keeps alpha whoever
+wrote it, then the others from cheapest to costliest to decode
+"""
+
+
+class ImageEncoding:
+    """ Policy choosing how images are encoded on the clipboard, and which
+    encoded target is read back
+
+    Writing, every encoding in `formats` is offered as its own target and
+    is only encoded if a consumer asks for it:
+
+        clipboard = Clipboard(image_encoding=ImageEncoding(['bmp', 'png'], compress_level=1))
+
+    Reading, the first target of `read_order` among those the owner offers
+    is transferred and decoded by Pillow, instead of letting the toolkit
+    pick. When all owners are crossclip processes, or copy opaque images,
+    `FAST_DECODE_ORDER` reads the target that is cheapest to decode.
+    """
+
+    def __init__(self, formats=(RAW,), compress_level=6, quality=90, read_order=DECODE_ORDER,
+                 prefer_lossless=True):
+        """
+        :param formats: Encoding names to offer, most preferred first: 'raw',
+                        'bmp', 'png', 'jpeg' or 'webp'. 'raw' can't be combined
+                        with the others (default: ('raw',))
+        :param compress_level: zlib level of PNG, 0 (fastest) to 9 (smallest) (default: 6)
+        :param quality: Quality of JPEG and WebP, 1 to 100 (default: 90)
+        :param read_order: Image targets to read, most preferred first, or None
+                           to let the toolkit pick (default: `DECODE_ORDER`)
+        :param prefer_lossless: If true, lossy targets are only read when no
+                                lossless one is offered (default: True)
+        :raises RuntimeError: If an encoding or a setting is invalid
+        """
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        if not formats:
+            raise RuntimeError('At least one image encoding must be given')
+        for name in formats:
+            if name != RAW and name not in ENCODING_TARGETS:
+                raise RuntimeError('Unknown image encoding {}'.format(name))
+        if RAW in formats and len(formats) > 1:
+            raise RuntimeError('Raw images can\'t be offered along with encoded ones')
+        if not 0 <= compress_level <= 9:
+            raise RuntimeError('PNG compression level must be between 0 and 9')
+        if not 1 <= quality <= 100:
+            raise RuntimeError('Quality must be between 1 and 100')
+
+        self.formats = formats
+        self.compress_level = compress_level
+        self.quality = quality
+        self.read_order = None if read_order is None else list(read_order)
+        self.prefer_lossless = prefer_lossless
+
+    def __repr__(self):
+        return 'ImageEncoding({!r}, compress_level={}, quality={})'.format(
+            self.formats, self.compress_level, self.quality)
+
+    @property
+    def raw(self):
+        """
+        :returns bool: True if images are handed to the toolkit as pixels
+        """
+        return self.formats == [RAW]
+
+    @property
+    def targets(self):
+        """
+        :returns list: Targets offered when writing, most preferred first
+        """
+        return [] if self.raw else [ENCODING_TARGETS[name] for name in self.formats]
+
+    def encode(self, image, target):
+        """
+        Encodes an image with the settings of this policy.
+
+        :param image: `PIL.Image` to encode
+        :param target: Image target, e.g 'image/png'
+        :returns bytes: Encoded image
+        :raises RuntimeWarning: If no encoder is known for target
+        """
+        if target == 'image/png':
+            return encode_image(image, target, compress_level=self.compress_level)
+        if target in LOSSY_TARGETS:
+            return encode_image(image, target, quality=self.quality)
+        return encode_image(image, target)
+
+    def offer(self, image):
+        """
+        Builds the offer of an image for `AbstractBackend.set_data`. Each target
+        is encoded when it's first asked for, from a copy of the image taken
+        now, so changing the image afterwards doesn't change what is pasted.
+
+        :param image: `PIL.Image` to offer
+        :returns dict: Target to callable returning the encoded bytes
+        """
+        image = image.copy()
+
+        def render(target):
+            with phase('encode'):
+                return self.encode(image, target)
+
+        return {target: (lambda target=target: render(target)) for target in self.targets}
+
+    def choose(self, offered):
+        """
+        Picks the target to read among those the owner offers.
+
+        :param offered: Offered target names
+        :returns str: Target name, or None if no known image target is offered
+        """
+        if self.read_order is None:
+            return None
+        candidates = [target for target in self.read_order if target in offered]
+        if self.prefer_lossless:
+            lossless = [target for target in candidates if target not in LOSSY_TARGETS]
+            candidates = lossless or candidates
+        return candidates[0] if candidates else None
+
+
+def decode_image(data):
+    """
+    Decodes an encoded image fully.
+
+    :param data: bytes-like payload
+    :returns PIL.Image: Decoded image
+    :raises OSError: If Pillow can't decode it
+    """
+    image = PilImage.open(BytesIO(data))
+    image.load()
+    return image
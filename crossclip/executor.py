@@ -0,0 +1,369 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# executor.py -- runs a backend on its own toolkit thread
+
+import queue
+import threading
+import weakref
+from concurrent.futures import Future
+
+from .absbackend import AbstractBackend
+
+_STOP = object()
+
+
+class BackendExecutor:
+    """ Owns a backend on a dedicated toolkit thread
+
+    Gtk and Qt objects may only be used from the thread that created them.
+    The executor creates the backend on its own thread, runs the toolkit's
+    events there, and executes every call submitted from other threads in
+    order, handing back a `concurrent.futures.Future`. Any number of worker
+    threads can share the one backend without locking.
+
+    Calls wait in a queue of at most `max_pending` entries; submitting to a
+    full queue blocks, which keeps a burst of workers from piling up work.
+    Asynchronous `request_*` reads don't hold the thread while the owner
+    answers; at most `max_in_flight` of them are outstanding at once.
+
+        executor = BackendExecutor(GtkBackend)
+        clipboard = Clipboard(backend=executor.proxy())
+    """
+
+    idle_timeout = 1.0
+    """ Longest wait for a call while idle, in seconds, on backends without
+    `AbstractBackend.has_events`. Backends with toolkit events block in the
+    toolkit instead, and submitting a call wakes them
+    """
+    poll_interval = 0.005
+    """ Longest time between event dispatches while `max_in_flight` reads are
+    outstanding on a backend without `AbstractBackend.has_events`, in seconds
+    """
+
+    def __init__(self, backend_type=None, max_pending=1024, max_in_flight=16, name='crossclip'):
+        """
+        Starts the toolkit thread and creates the backend on it.
+
+        :param backend_type: Backend class. Defaults to the backend chosen by
+                             `crossclip.select_backend`
+        :param max_pending: Most calls waiting to run (default: 1024)
+        :param max_in_flight: Most `request_*` reads awaiting their answer (default: 16)
+        :param name: Name of the thread (default: 'crossclip')
+        :raises RuntimeError: If the backend can't be created
+        """
+        if backend_type is None:
+            from . import select_backend
+            backend_type = select_backend()
+        self.max_in_flight = max(1, max_in_flight)
+        self.backend = None
+        """ The backend itself. Only use it from the toolkit thread
+        """
+        self._queue = queue.Queue(max_pending)
+        self._in_flight = 0
+        self._proxies = weakref.WeakSet()
+        self._stopped = False
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(backend_type,), name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise RuntimeError('Could not create the {} backend: {}'.format(
+                backend_type.__name__, self._error)) from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+    @property
+    def image_converter(self):
+        """
+        Image converter of the backend.
+        """
+        return self.backend.image_converter
+
+    def in_toolkit_thread(self):
+        """
+        :returns bool: True if called from the thread owning the backend
+        """
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, timeout=None):
+        """
+        Queues a call on the toolkit thread.
+
+        :param fn: Name of a backend method, or a callable taking the backend
+                   as its first argument
+        :param args: Arguments of the call
+        :param timeout: Longest time to wait for room in the queue, in seconds (default: None)
+        :returns: `Future` of the call's result
+        :raises RuntimeError: If the executor is shut down, or the queue stayed full
+        """
+        return self._put(fn, args, False, timeout)
+
+    def request(self, method, *args, timeout=None):
+        """
+        Issues an asynchronous backend read, e.g 'request_text' or
+        'request_contents', on the toolkit thread.
+
+        :param method: Name of the `request_*` method
+        :param args: Arguments preceding its callback
+        :param timeout: See `submit`
+        :returns: `Future` resolved with the value handed to the callback
+        """
+        return self._put(method, args, True, timeout)
+
+    def call(self, fn, *args):
+        """
+        Runs a call on the toolkit thread and waits for its result. From the
+        toolkit thread itself, e.g in a change listener, it runs right away.
+
+        :returns: Result of the call
+        """
+        if self.in_toolkit_thread():
+            return self._resolve(fn)(*args)
+        return self.submit(fn, *args).result()
+
+    def shutdown(self, wait=True):
+        """
+        Stops the toolkit thread once the calls queued so far have run.
+        Calls submitted afterwards fail.
+
+        :param wait: If true, wait for the thread to end (default: True)
+        """
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(_STOP)
+        self._wake()
+        if wait and not self.in_toolkit_thread():
+            self._thread.join()
+
+    def proxy(self):
+        """
+        :returns: `DispatchedBackend` forwarding every call to this executor,
+                  to be passed to `Clipboard(backend=...)`
+        """
+        proxy = DispatchedBackend(self)
+        self._proxies.add(proxy)
+        return proxy
+
+    def _resolve(self, fn):
+        if isinstance(fn, str):
+            return getattr(self.backend, fn)
+        return lambda *args: fn(self.backend, *args)
+
+    def _put(self, fn, args, is_request, timeout):
+        if self._stopped:
+            raise RuntimeError('The clipboard executor is shut down')
+        future = Future()
+        try:
+            self._queue.put((future, fn, args, is_request), timeout=timeout)
+        except queue.Full:
+            raise RuntimeError('The clipboard executor queue is full') from None
+        self._wake()
+        return future
+
+    def _wake(self):
+        if self.backend is not None and not self.in_toolkit_thread():
+            self.backend.wakeup()
+
+    def _run(self, backend_type):
+        try:
+            self.backend = backend_type()
+        except Exception as err:
+            self._error = err
+            return
+        finally:
+            self._ready.set()
+
+        events = self.backend.has_events
+        while True:
+            task = None
+            if self._in_flight < self.max_in_flight:
+                try:
+                    task = self._queue.get(block=not events, timeout=self.idle_timeout)
+                except queue.Empty:
+                    pass
+            if task is _STOP:
+                break
+            if task is not None:
+                self._execute(*task)
+                self.backend.process_events()
+            elif events:
+                # Sleeps in the toolkit until it has an event, or _put wakes it
+                self.backend.process_events(None)
+            elif self._in_flight >= self.max_in_flight:
+                self.backend.process_events(self.poll_interval)
+
+        # Nothing queued after the stop request will run
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if task is not _STOP:
+                task[0].cancel()
+        for proxy in list(self._proxies):
+            proxy._disconnect_changes()
+        self.backend.close()
+
+    def _execute(self, future, fn, args, is_request):
+        if not future.set_running_or_notify_cancel():
+            return
+        if not is_request:
+            try:
+                future.set_result(self._resolve(fn)(*args))
+            except BaseException as err:
+                future.set_exception(err)
+            return
+
+        answered = []
+
+        def callback(value):
+            # The answer runs on this thread, from process_events
+            if not answered:
+                answered.append(True)
+                self._in_flight -= 1
+                future.set_result(value)
+
+        self._in_flight += 1
+        try:
+            self._resolve(fn)(*args, callback)
+        except BaseException as err:
+            if not answered:
+                answered.append(True)
+                self._in_flight -= 1
+                future.set_exception(err)
+
+
+def _forward(name):
+    def method(self, *args):
+        return self._executor.call(name, *args)
+    method.__name__ = name
+    method.__doc__ = getattr(AbstractBackend, name, None).__doc__
+    return method
+
+
+class DispatchedBackend(AbstractBackend):
+    """ Backend forwarding every call to a `BackendExecutor`
+
+    Blocking calls run on the toolkit thread while the calling thread waits
+    for their future. `request_*` callbacks run on the toolkit thread.
+    """
+
+    notifies_in_background = True
+
+    def __init__(self, executor):
+        """
+        :param executor: `BackendExecutor` owning the real backend
+        """
+        super().__init__()
+        self._executor = executor
+        self._upstream = None
+        self.image_converter = executor.image_converter
+
+    get_text = _forward('get_text')
+    get_image = _forward('get_image')
+    set_text = _forward('set_text')
+    set_image = _forward('set_image')
+    set_data = _forward('set_data')
+    get_contents = _forward('get_contents')
+    available_targets = _forward('available_targets')
+    has_text = _forward('has_text')
+    has_image = _forward('has_image')
+    size_hint = _forward('size_hint')
+    owns_clipboard = _forward('owns_clipboard')
+
+    def request_text(self, callback):
+        """
+        Asynchronously gets the text on the toolkit thread.
+        """
+        self._executor.request('request_text').add_done_callback(_deliver(callback))
+
+    def request_image(self, callback):
+        """
+        Asynchronously gets the native image on the toolkit thread.
+        """
+        self._executor.request('request_image').add_done_callback(_deliver(callback))
+
+    def request_contents(self, target, callback):
+        """
+        Asynchronously gets the raw bytes of a target on the toolkit thread.
+        """
+        self._executor.request('request_contents', target).add_done_callback(_deliver(callback))
+
+    def request_targets(self, callback):
+        """
+        Asynchronously lists the offered targets on the toolkit thread.
+        """
+        self._executor.request('request_targets').add_done_callback(_deliver(callback))
+
+    def call_later(self, delay, callback):
+        """
+        Runs a callback on the toolkit thread after a delay.
+        """
+        return self._executor.call('call_later', delay, callback)
+
+    def close(self):
+        """
+        Stops forwarding changes. The executor and its backend keep running.
+        """
+        self._disconnect_changes()
+
+    def remove_change_listener(self, handle):
+        """
+        Unregisters a listener. Once none is left, the real backend stops
+        notifying this proxy.
+
+        :param handle: Handle returned by `add_change_listener`
+        """
+        super().remove_change_listener(handle)
+        if not self.__dict__.get('_change_listeners'):
+            self._disconnect_changes()
+
+    def _connect_changes(self):
+        """
+        Forwards the changes seen on the toolkit thread to this backend's listeners.
+        """
+        self._upstream = self._executor.call(lambda backend: backend.add_change_listener(self._notify_change))
+
+    def _disconnect_changes(self):
+        upstream, self._upstream = self._upstream, None
+        if upstream is None:
+            return
+        # The next listener connects again
+        self.__dict__.pop('_change_listeners', None)
+        try:
+            self._executor.call(lambda backend: backend.remove_change_listener(upstream))
+        except RuntimeError:
+            # Shut down: the executor disconnects every proxy itself
+            pass
+
+
+def _deliver(callback):
+    """
+    Adapts a request callback to a future's done callback. A failed request
+    is delivered as None, like a missing value.
+    """
+    def done(future):
+        callback(None if future.cancelled() or future.exception() is not None else future.result())
+    return done
@@ -31,7 +31,13 @@ from PIL import Image as PilImage
 from PIL.Image import Image as PilImageType
 from io import BytesIO
 
-from .absbackend import AbstractBackend, AbstractImageConverter
+from .absbackend import AbstractBackend, AbstractImageConverter, Conversion, ClipboardChange
+from .converters import default_graph, array_mode, HAVE_NUMPY
+from .scaling import fit_size
+from .targets import TargetOffer, expand_text_targets
+
+# Modes Pillow can wrap around an existing buffer instead of copying it
+PIL_MAPPABLE_MODES = ('RGBA',)
 
 class GtkImageConverter(AbstractImageConverter):
 
@@ -53,6 +59,37 @@ class GtkImageConverter(AbstractImageConverter):
         """
         return 'gdk-pixbuf'
 
+    def conversions(self):
+        """
+        Returns the Pillow conversions plus direct conversions to and from
+        Qt's QImage, which copy the pixel rows once instead of building an
+        intermediate Pillow image.
+
+        :returns: list of `Conversion`
+        """
+        return super().conversions() + [
+            Conversion('gdk-pixbuf', 'qt', 6, pixbuf_to_qimage),
+            Conversion('qt', 'gdk-pixbuf', 6, qimage_to_pixbuf),
+        ] + ([
+            Conversion('gdk-pixbuf', 'numpy', 2, pixbuf_to_array),
+            Conversion('numpy', 'gdk-pixbuf', 6, array_to_pixbuf),
+        ] if HAVE_NUMPY else [])
+
+    def scale(self, pixbuf, max_size=None, reduce=None):
+        """
+        Scales a pixbuf down with gdk-pixbuf, before it is converted.
+
+        :param pixbuf: GdkPixbuf.Pixbuf image
+        :param max_size: (width, height) box to fit in, or None
+        :param reduce: Factor to divide both sides by, or None
+        :returns GdkPixbuf.Pixbuf: Scaled pixbuf
+        """
+        size = (pixbuf.props.width, pixbuf.props.height)
+        w, h = fit_size(size, max_size, reduce)
+        if (w, h) == size:
+            return pixbuf
+        return pixbuf.scale_simple(w, h, GdkPixbuf.InterpType.BILINEAR)
+
     def to_pillow(self, pixbuf):
         """
         Converts and image of `self.image_type` to a `PIL.Image`.
@@ -64,13 +101,26 @@ class GtkImageConverter(AbstractImageConverter):
         if isinstance(pixbuf, PilImageType):
             return pixbuf
 
-        data = pixbuf.get_pixels()
         w = pixbuf.props.width
         h = pixbuf.props.height
         stride = pixbuf.props.rowstride
         mode = "RGB"
         if pixbuf.props.has_alpha == True:
             mode = "RGBA"
+
+        # PyGObject returns the pixels of read_pixel_bytes() as a bytes copy, the one
+        # copy this conversion makes; get_pixels() would first make the pixbuf copy
+        # itself into mutable memory as well.
+        try:
+            data = pixbuf.read_pixel_bytes().get_data()
+        except AttributeError:
+            data = pixbuf.get_pixels()
+
+        # The last row of a pixbuf is not padded to the rowstride. If the buffer
+        # covers every full row, Pillow can map it without copying; otherwise the
+        # raw decoder copies it once, skipping the padding.
+        if mode in PIL_MAPPABLE_MODES and len(data) >= stride * h:
+            return PilImage.frombuffer(mode, (w, h), data, "raw", mode, stride, 1)
         return PilImage.frombytes(mode, (w, h), data, "raw", mode, stride)
 
     def from_pillow(self, image):
@@ -81,26 +131,139 @@ class GtkImageConverter(AbstractImageConverter):
         :returns GdkPixbuf.Pixbuf: Converted pixbuf
         """
 
-        # data = image.tobytes()
-        # w, h = image.size
-        # data = GLib.Bytes.new(data)
-        # pix = GdkPixbuf.Pixbuf.new_from_bytes(data, GdkPixbuf.Colorspace.RGB, False, 8, w, h, w * 3)
-        # return pix
         # Sanity check to verify that image isn't already native type
         if isinstance(image, self.image_type):
             return image
 
+        try:
+            return self._from_pillow_raw(image)
+        except (AttributeError, TypeError, ValueError, GLib.Error):
+            # Old gdk-pixbuf releases lack new_from_bytes
+            return self._from_pillow_png(image)
+
+    def _from_pillow_raw(self, image):
+        """
+        Builds a pixbuf straight from the image's pixel bytes.
+        """
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        has_alpha = image.mode == 'RGBA'
+        w, h = image.size
+        data = GLib.Bytes.new(image.tobytes())
+        return GdkPixbuf.Pixbuf.new_from_bytes(data, GdkPixbuf.Colorspace.RGB, has_alpha, 8,
+                                               w, h, w * len(image.mode))
+
+    def _from_pillow_png(self, image):
+        """
+        Builds a pixbuf by round tripping the image through PNG. The PNG is
+        decoded straight away, so it's written at the fastest compression level.
+        """
         ibuf = BytesIO()
-        image.save(ibuf, format='png')
+        image.save(ibuf, format='png', compress_level=1)
         loader = GdkPixbuf.PixbufLoader.new_with_mime_type('image/png')
         status = loader.write(ibuf.getvalue())
         if status:
-            pixbuf = loader.get_pixbuf()
             loader.close()
-            return pixbuf
+            return loader.get_pixbuf()
         else:
             return None
 
+def pixbuf_to_qimage(pixbuf):
+    """
+    Converts a `GdkPixbuf.Pixbuf` to a `QImage` without going through Pillow.
+
+    :param pixbuf: Pixbuf to convert
+    :returns QImage: Converted image
+    """
+    from PyQt5.QtGui import QImage
+    from .qtbackend import qimage_from_buffer
+
+    fmt = QImage.Format_RGBA8888 if pixbuf.props.has_alpha else QImage.Format_RGB888
+    data = pixbuf.read_pixel_bytes().get_data()
+    return qimage_from_buffer(data, pixbuf.props.width, pixbuf.props.height,
+                              pixbuf.props.rowstride, fmt)
+
+
+def qimage_to_pixbuf(qimage):
+    """
+    Converts a `QImage` to a `GdkPixbuf.Pixbuf` without going through Pillow.
+
+    :param qimage: QImage to convert
+    :returns GdkPixbuf.Pixbuf: Converted pixbuf
+    """
+    from PyQt5.QtGui import QImage
+
+    has_alpha = qimage.hasAlphaChannel()
+    # Both of these formats store bytes in pixbuf order regardless of endianness
+    target = QImage.Format_RGBA8888 if has_alpha else QImage.Format_RGB888
+    if qimage.format() != target:
+        qimage = qimage.convertToFormat(target)
+
+    ptr = qimage.constBits()
+    ptr.setsize(qimage.bytesPerLine() * qimage.height())
+    data = GLib.Bytes.new(ptr.asstring())
+    return GdkPixbuf.Pixbuf.new_from_bytes(data, GdkPixbuf.Colorspace.RGB, has_alpha, 8,
+                                           qimage.width(), qimage.height(), qimage.bytesPerLine())
+
+
+def pixbuf_to_array(pixbuf):
+    """
+    Exposes the pixels of a `GdkPixbuf.Pixbuf` as a read-only HxWxC numpy
+    array. PyGObject hands the pixels over as a `bytes` copy; the array views
+    that copy, rowstride included, rather than copying it again.
+
+    :param pixbuf: Pixbuf to expose
+    :returns numpy.ndarray: uint8 array of 3 or 4 channels
+    """
+    import numpy
+
+    w = pixbuf.props.width
+    h = pixbuf.props.height
+    channels = pixbuf.props.n_channels
+    data = pixbuf.read_pixel_bytes().get_data()
+    return numpy.ndarray((h, w, channels), dtype=numpy.uint8, buffer=data,
+                         strides=(pixbuf.props.rowstride, channels, 1))
+
+
+def array_to_pixbuf(array):
+    """
+    Converts a numpy array to a `GdkPixbuf.Pixbuf` without going through Pillow.
+
+    :param array: HxW, HxWx3 or HxWx4 uint8 array
+    :returns GdkPixbuf.Pixbuf: Converted pixbuf
+    """
+    import numpy
+
+    if array_mode(array) == 'L':
+        # Pixbufs have no grayscale format
+        array = numpy.repeat(array[:, :, numpy.newaxis], 3, axis=2)
+    h, w, channels = array.shape
+    data = GLib.Bytes.new(numpy.ascontiguousarray(array).tobytes())
+    return GdkPixbuf.Pixbuf.new_from_bytes(data, GdkPixbuf.Colorspace.RGB, channels == 4, 8,
+                                           w, h, w * channels)
+
+
+class GLibTimeout:
+    """ Handle of a callback scheduled on the GLib main loop
+    """
+
+    def __init__(self, delay, callback):
+        self._callback = callback
+        self._source = GLib.timeout_add(int(delay * 1000), self._fire)
+
+    def _fire(self, *args):
+        self._source = None
+        self._callback()
+        return False
+
+    def cancel(self):
+        if self._source is not None:
+            GLib.source_remove(self._source)
+            self._source = None
+
+
 class GtkBackend(AbstractBackend):
     """ Gtk Clipboard backend
 
@@ -110,14 +273,45 @@ class GtkBackend(AbstractBackend):
     """
 
     image_converter = GtkImageConverter()
+    has_events = True
     raw_clipboard = None
+    offer = None
+    """ `TargetOffer` served while this backend owns the clipboard through `set_data`
+    """
 
     def __init__(self, display=None):
-        if display is None:
-            display = Gdk.Display.get_default()
+        """
+        :param display: Gdk.Display, name of a display to open (e.g ':1'), or
+                        None for the default display (default: None)
+        :raises RuntimeError: If the display can't be opened
+        """
         super().__init__()
+        # Once per backend; converters passed to single calls stay private to them
+        default_graph.register(self.image_converter)
+        self._opened_display = False
+        if isinstance(display, str):
+            name = display
+            display = Gdk.Display.open(name)
+            if display is None:
+                raise RuntimeError('Cannot open display {}'.format(name))
+            self._opened_display = True
+        elif display is None:
+            display = Gdk.Display.get_default()
+        self.display = display
         self.clipboard = Gtk.Clipboard.get_default(display)
         self.raw_clipboard = self.clipboard
+        self._owner_change_handler = None
+
+    def close(self):
+        """
+        Stops listening for changes, and closes the display if this backend opened it.
+        """
+        if self._owner_change_handler is not None:
+            self.clipboard.disconnect(self._owner_change_handler)
+            self._owner_change_handler = None
+        if self._opened_display:
+            self._opened_display = False
+            self.display.close()
 
     def get_text(self):
         """
@@ -128,6 +322,154 @@ class GtkBackend(AbstractBackend):
         text = self.clipboard.wait_for_text()
         return text
 
+    def request_text(self, callback):
+        """
+        Asynchronously gets text from clipboard. The callback runs from the
+        GLib main loop, see `process_events`.
+
+        :param callback: Called with the text, or None
+        """
+        self.clipboard.request_text(lambda clipboard, text, *data: callback(text))
+
+    def request_image(self, callback):
+        """
+        Asynchronously gets a GdkPixbuf.Pixbuf from clipboard. The callback
+        runs from the GLib main loop, see `process_events`.
+
+        :param callback: Called with the pixbuf, or None
+        """
+        self.clipboard.request_image(lambda clipboard, pixbuf, *data: callback(pixbuf))
+
+    def process_events(self, timeout=0):
+        """
+        Dispatches pending events of the default GLib main context.
+
+        :param timeout: Longest time to wait for an event, in seconds, or None
+                        to wait until one arrives or `wakeup` is called (default: 0)
+        """
+        context = GLib.MainContext.default()
+        if timeout is None:
+            context.iteration(True)
+        elif timeout > 0 and not context.pending():
+            # A one-shot timer bounds the blocking iteration
+            fired = []
+            source = GLib.timeout_add(int(timeout * 1000), lambda *args: fired.append(True))
+            context.iteration(True)
+            if not fired:
+                GLib.source_remove(source)
+        while context.pending():
+            context.iteration(False)
+
+    @property
+    def notifies_in_background(self):
+        """
+        True while `Gtk.main` runs, which then dispatches change notifications.
+        """
+        return Gtk.main_level() > 0
+
+    def wakeup(self):
+        """
+        Makes a waiting `process_events` return, through the main context's
+        own wakeup fd.
+        """
+        GLib.MainContext.default().wakeup()
+
+    def owns_clipboard(self):
+        """
+        Tells if a window of this process owns the clipboard selection.
+
+        :returns bool: True if this process is the owner
+        """
+        owner = Gdk.selection_owner_get_for_display(self.display, Gdk.SELECTION_CLIPBOARD)
+        return owner is not None
+
+    def call_later(self, delay, callback):
+        """
+        Runs a callback from the GLib main loop after a delay.
+
+        :param delay: Delay in seconds
+        :param callback: Callable taking no arguments
+        :returns GLibTimeout: Handle with a `cancel()` method
+        """
+        return GLibTimeout(delay, callback)
+
+    def _connect_changes(self):
+        """
+        Listens to the clipboard's owner-change signal.
+        """
+        self._owner_change_handler = self.clipboard.connect('owner-change', self._on_owner_change)
+
+    def _on_owner_change(self, clipboard, event):
+        self._notify_change(ClipboardChange(self.available_targets, event.selection_time))
+
+    def available_targets(self):
+        """
+        Synchronously gets the names of the targets the owner offers. This is
+        a single TARGETS request; no payload is transferred.
+
+        :returns list: Target names
+        """
+        ok, atoms = self.clipboard.wait_for_targets()
+        if not ok or atoms is None:
+            return []
+        return [atom.name() for atom in atoms]
+
+    def request_targets(self, callback):
+        """
+        Asynchronously gets the names of the offered targets. The callback runs
+        from the GLib main loop, see `process_events`.
+
+        :param callback: Called with the list of target names
+        """
+        self.clipboard.request_targets(
+            lambda clipboard, atoms, *data: callback([atom.name() for atom in atoms or []]))
+
+    def has_text(self):
+        """
+        Tells if the owner offers a target Gtk can convert to text.
+
+        :returns bool: True if text is available
+        """
+        return self.clipboard.wait_is_text_available()
+
+    def has_image(self):
+        """
+        Tells if the owner offers a target Gtk can load as an image.
+
+        :returns bool: True if an image is available
+        """
+        return self.clipboard.wait_is_image_available()
+
+    def get_contents(self, target):
+        """
+        Synchronously gets the raw bytes of a target. Gtk reassembles INCR
+        transfers of large payloads before handing them over, so the whole
+        payload is buffered; `iter_contents` only slices it afterwards.
+
+        :param target: Target name
+        :returns bytes: Payload, or None if target isn't offered
+        """
+        selection = self.clipboard.wait_for_contents(Gdk.Atom.intern(target, False))
+        return self._selection_bytes(selection)
+
+    def request_contents(self, target, callback):
+        """
+        Asynchronously gets the raw bytes of a target. The callback runs from
+        the GLib main loop, see `process_events`.
+
+        :param target: Target name
+        :param callback: Called with the payload, or None
+        """
+        self.clipboard.request_contents(
+            Gdk.Atom.intern(target, False),
+            lambda clipboard, selection, *data: callback(self._selection_bytes(selection)))
+
+    @staticmethod
+    def _selection_bytes(selection):
+        if selection is None or selection.get_length() < 0:
+            return None
+        return selection.get_data()
+
     def get_image(self, format='pil', converter=None):
         """
         Synchronously gets image from clipboard. The image is either
@@ -147,8 +489,8 @@ class GtkBackend(AbstractBackend):
             return self.image_converter.to_pillow(pixbuf)
         else:
             if converter is not None and isinstance(converter, AbstractImageConverter):
-                pil = self.image_converter.to_pillow(pixbuf)
-                return converter.from_pillow(pil)
+                graph = default_graph.layered(converter)
+                return graph.convert(pixbuf, converter.image_str, self.image_converter.image_str)
             else:
                 raise RuntimeWarning("Invalid format, and converter is not provided")
 
@@ -163,6 +505,57 @@ class GtkBackend(AbstractBackend):
         self.clipboard.set_text(text, num)
         self.clipboard.store()
 
+    def set_data(self, data):
+        """
+        Offers several targets in a single clipboard ownership. Values are
+        rendered only when another application requests their target. Plain
+        text is also offered under the legacy X11 text targets.
+
+        Gtk.Clipboard.set_with_data is not usable from PyGObject, so the
+        selection is owned through an invisible widget instead. As a result,
+        the contents are not handed to a clipboard manager and disappear
+        when the process exits.
+
+        :param data: dict of target to str, bytes, `PIL.Image`, or a callable
+                     returning one of those
+        """
+        offer = TargetOffer(expand_text_targets(data))
+        owner = self._selection_widget()
+        owner.selection_clear_targets(Gdk.SELECTION_CLIPBOARD)
+        for info, target in enumerate(offer.targets):
+            owner.selection_add_target(Gdk.SELECTION_CLIPBOARD, Gdk.Atom.intern(target, False), info)
+        self.offer = offer
+        if not Gtk.selection_owner_set_for_display(self.display, owner, Gdk.SELECTION_CLIPBOARD,
+                                                   Gdk.CURRENT_TIME):
+            self.offer = None
+            raise RuntimeError('Could not take ownership of the clipboard')
+
+    def _selection_widget(self):
+        """
+        Creates the widget owning the selection for `set_data` on first use.
+        """
+        widget = self.__dict__.get('_selection_owner')
+        if widget is None:
+            widget = Gtk.Invisible.new_for_screen(self.display.get_default_screen())
+            widget.connect('selection-get', self._on_selection_get)
+            widget.connect('selection-clear-event', self._on_selection_clear)
+            self._selection_owner = widget
+        return widget
+
+    def _on_selection_get(self, widget, selection_data, info, time):
+        offer = self.offer
+        if offer is None:
+            return
+        target = selection_data.get_target()
+        payload = offer.get(target.name())
+        if payload is not None:
+            selection_data.set(target, 8, payload)
+
+    def _on_selection_clear(self, widget, event):
+        # Another application took the clipboard; let go of the values
+        self.offer = None
+        return False
+
     def set_image(self, image, converter=None):
         """
         Synchronously sets image to clipboard.
@@ -188,13 +581,14 @@ class GtkBackend(AbstractBackend):
             self.clipboard.store()
         elif isinstance(image, self.image_converter.image_type):
             # Image is already native type, good to go
-            self.clipboard.set_image(pixbuf)
+            self.clipboard.set_image(image)
             self.clipboard.store()
         else:
-            # If a converter is provided, then use it to convert the image to a
-            # Pillow object and recursively run the method.
+            # If a converter is provided, then convert the image along the
+            # cheapest path and recursively run the method.
             if converter is not None and isinstance(converter, AbstractImageConverter):
-                pillow_img = converter.to_pillow(image)
-                self.set_image(pillow_img)
+                graph = default_graph.layered(converter)
+                pixbuf = graph.convert(image, self.image_converter.image_str, converter.image_str)
+                self.set_image(pixbuf)
             else:
                 raise RuntimeWarning("Image is of invalid type and has no converter")
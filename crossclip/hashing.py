@@ -0,0 +1,52 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# hashing.py -- content digests of clipboard values
+
+import hashlib
+
+from PIL.Image import Image as PilImageType
+
+DIGEST_SIZE = 16
+
+
+def content_digest(value):
+    """
+    Computes a digest identifying the content of a clipboard value. Text and
+    images never share a digest, and images with equal pixels but different
+    modes or sizes differ.
+
+    :param value: str, bytes-like, `PIL.Image` or numpy array
+    :returns bytes: Digest, or None if the value's type isn't supported
+    """
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    if isinstance(value, str):
+        digest.update(b'text\0')
+        digest.update(value.encode('utf-8', 'surrogatepass'))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(b'bytes\0')
+        digest.update(value)
+    elif isinstance(value, PilImageType):
+        digest.update('image\0{}\0{}x{}\0'.format(value.mode, *value.size).encode('ascii'))
+        digest.update(value.tobytes())
+    elif hasattr(value, 'shape') and hasattr(value, 'tobytes'):
+        # numpy arrays
+        digest.update('array\0{}\0{}\0'.format(value.dtype, value.shape).encode('ascii'))
+        digest.update(value.tobytes())
+    else:
+        return None
+    return digest.digest()
@@ -0,0 +1,216 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# history.py -- bounded in-memory clipboard history
+
+import time
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+from .cache import payload_size
+from .hashing import content_digest
+from .watch import read_change
+
+
+class HistoryEntry:
+    """ One distinct value seen on the clipboard
+    """
+    __slots__ = ('value', 'kind', 'digest', 'size', 'time', 'seen')
+
+    def __init__(self, value, kind, digest, size, time):
+        self.value = value
+        """ The text or image itself
+        """
+        self.kind = kind
+        """ 'text' or 'image'
+        """
+        self.digest = digest
+        """ Content digest, see `crossclip.hashing.content_digest`
+        """
+        self.size = size
+        """ Estimated memory held by value, in bytes
+        """
+        self.time = time
+        """ Last time the value was seen, in seconds since the epoch
+        """
+        self.seen = 1
+        """ Number of times the value was seen
+        """
+
+    def __repr__(self):
+        return 'HistoryEntry(kind={!r}, size={}, seen={})'.format(self.kind, self.size, self.seen)
+
+
+class ClipboardHistory:
+    """ Bounded history of clipboard values, most recent first
+
+    Values are keyed by their content digest, so copying the same text twice
+    keeps one entry and moves it to the front. When the byte budget or the
+    entry limit is exceeded, entries are evicted from the old end: among the
+    `eviction_window` oldest entries the largest goes first, so one big
+    screenshot is dropped before many small snippets.
+
+    Adding a value, looking one up by digest and reading the most recent
+    entries are O(1). Reading entry i by index walks i entries.
+    """
+
+    def __init__(self, budget=64 * 1024 * 1024, max_entries=None, eviction_window=8):
+        """
+        :param budget: Most bytes held by the values (default: 64 MiB)
+        :param max_entries: Most entries kept, or None for no limit (default: None)
+        :param eviction_window: Number of oldest entries considered when evicting.
+                                1 makes eviction plain LRU (default: 8)
+        """
+        self.budget = budget
+        self.max_entries = max_entries
+        self.eviction_window = max(1, eviction_window)
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        """
+        Iterates over the entries, most recent first.
+        """
+        with self._lock:
+            entries = list(reversed(self._entries.values()))
+        return iter(entries)
+
+    def __getitem__(self, index):
+        """
+        :param index: 0 for the most recent entry, 1 for the one before...
+        :returns: `HistoryEntry`
+        :raises IndexError: If there are not that many entries
+        """
+        with self._lock:
+            if not 0 <= index < len(self._entries):
+                raise IndexError('history index out of range')
+            return next(islice(reversed(self._entries.values()), index, None))
+
+    def __contains__(self, digest):
+        return digest in self._entries
+
+    def latest(self):
+        """
+        :returns: Most recent `HistoryEntry`, or None if the history is empty
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            return next(reversed(self._entries.values()))
+
+    def recent(self, count):
+        """
+        :param count: Most entries to return
+        :returns list: Up to count entries, most recent first
+        """
+        with self._lock:
+            return list(islice(reversed(self._entries.values()), count))
+
+    def get(self, digest):
+        """
+        :param digest: Content digest of a value
+        :returns: `HistoryEntry`, or None if it isn't in the history
+        """
+        return self._entries.get(digest)
+
+    def add(self, value, when=None):
+        """
+        Records a value. A value already in the history becomes the most recent
+        entry instead of being stored twice. Values larger than the whole
+        budget are not kept.
+
+        :param value: Text, or an image of any type supported by `content_digest`
+        :param when: Time the value was seen, in seconds since the epoch (default: now)
+        :returns: The `HistoryEntry`, or None if value wasn't kept
+        :raises RuntimeError: If value can't be digested
+        """
+        digest = content_digest(value)
+        if digest is None:
+            raise RuntimeError('Cannot record {} in the history'.format(type(value).__name__))
+        when = time.time() if when is None else when
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                entry.time = when
+                entry.seen += 1
+                self._entries.move_to_end(digest)
+                return entry
+
+            size = payload_size(value)
+            if size > self.budget:
+                return None
+            kind = 'text' if isinstance(value, str) else 'image'
+            entry = HistoryEntry(value, kind, digest, size, when)
+            self._entries[digest] = entry
+            self.size += size
+            self._evict()
+            return entry if digest in self._entries else None
+
+    def remove(self, digest):
+        """
+        Drops an entry.
+
+        :param digest: Content digest of the value
+        :returns bool: True if there was such an entry
+        """
+        with self._lock:
+            entry = self._entries.pop(digest, None)
+            if entry is None:
+                return False
+            self.size -= entry.size
+            return True
+
+    def clear(self):
+        """
+        Drops every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _evict(self):
+        while self.size > self.budget or (self.max_entries is not None and
+                                          len(self._entries) > self.max_entries):
+            # The entry just added is only the victim if it's the only one left
+            window = min(self.eviction_window, len(self._entries) - 1) or 1
+            victim = max(islice(self._entries.values(), window), key=lambda entry: entry.size)
+            del self._entries[victim.digest]
+            self.size -= victim.size
+
+    def attach(self, clipboard, images=True):
+        """
+        Records every text, and optionally every image, placed on a clipboard
+        from now on. Only the list of targets is fetched for changes that
+        carry neither.
+
+        :param clipboard: `Clipboard` to watch
+        :param images: If false, only text is recorded (default: True)
+        :returns: `ClipboardWatcher`; close it to stop recording
+        :raises NotImplementedError: If the backend can't report changes
+        """
+        def record(change):
+            value = read_change(clipboard, change, images)
+            if value is not None:
+                self.add(value, change.time)
+
+        return clipboard.watch(record)
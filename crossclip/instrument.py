@@ -0,0 +1,332 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# instrument.py -- latency and payload instrumentation
+
+import time
+import math
+import functools
+import threading
+from collections.abc import Mapping
+
+from .cache import payload_size
+from .timeouts import TIMED_OUT, CANCELLED
+
+
+class _State(threading.local):
+    record = None
+    """ `OperationRecord` of the operation running on this thread
+    """
+
+
+_local = _State()
+
+
+class OperationRecord:
+    """ Timings of one clipboard operation, handed to `Instrument` callbacks
+    """
+    __slots__ = ('operation', 'source', 'time', 'duration', 'phases', 'bytes',
+                 'cache_hits', 'cache_misses', 'error')
+
+    def __init__(self, operation, source):
+        self.operation = operation
+        """ Name of the operation, e.g 'get_text' or 'set_image'
+        """
+        self.source = source
+        """ Class name of the backend (or of the object) that served it, e.g 'GtkBackend'
+        """
+        self.time = time.time()
+        """ Time the operation started, in seconds since the epoch
+        """
+        self.duration = None
+        """ Wall time of the whole operation, in seconds
+        """
+        self.phases = {}
+        """ Seconds spent per phase: 'backend' (the toolkit round trip),
+        'convert', 'hash', 'decode', 'scale', 'encode', 'write'
+        """
+        self.bytes = 0
+        """ Size of the value read or written, in bytes
+        """
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.error = None
+        """ Class name of the exception the operation raised, or None
+        """
+
+    def __repr__(self):
+        return 'OperationRecord({!r}, source={!r}, duration={})'.format(
+            self.operation, self.source, self.duration)
+
+
+class _Phase:
+    __slots__ = ('record', 'name', 'start')
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.record.phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+def phase(name):
+    """
+    Times a block as one phase of the operation running on this thread:
+
+        with phase('convert'):
+            image = convert(image)
+
+    Outside of an instrumented operation this does nothing.
+
+    :param name: Phase name
+    :returns: Context manager
+    """
+    record = _local.record
+    if record is None:
+        return _NULL_PHASE
+    return _Phase(record, name)
+
+
+def note_cache(hit):
+    """
+    Counts a cache lookup of the operation running on this thread.
+
+    :param hit: True for a hit, False for a miss
+    """
+    record = _local.record
+    if record is not None:
+        if hit:
+            record.cache_hits += 1
+        else:
+            record.cache_misses += 1
+
+
+def transferred_size(value):
+    """
+    :returns int: Bytes a value takes on the clipboard, approximately for text
+    """
+    if isinstance(value, str):
+        return len(value)
+    if value is TIMED_OUT or value is CANCELLED:
+        return 0
+    if isinstance(value, Mapping):
+        # Snapshots and set_data offers; lazily rendered values aren't counted
+        return sum(transferred_size(item) for item in value.values() if not callable(item))
+    return payload_size(value)
+
+
+def instrumented(operation, measure='result'):
+    """
+    Decorates a method of an object with an `instrument` attribute. While
+    the attribute is None, the method runs as is. Operations started by
+    another instrumented operation are folded into it.
+
+    :param operation: Name reported in `OperationRecord.operation`
+    :param measure: 'result' to report the size of the returned value,
+                    'argument' for the first argument, or None
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            instrument = self.instrument
+            if instrument is None or _local.record is not None:
+                return method(self, *args, **kwargs)
+
+            backend = getattr(self, 'backend', None)
+            record = OperationRecord(operation, type(backend if backend is not None else self).__name__)
+            _local.record = record
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except BaseException as err:
+                record.error = type(err).__name__
+                raise
+            else:
+                if measure == 'result':
+                    record.bytes = transferred_size(result)
+                elif measure == 'argument' and args:
+                    record.bytes = transferred_size(args[0])
+                return result
+            finally:
+                record.duration = time.perf_counter() - start
+                _local.record = None
+                instrument.record(record)
+        return wrapper
+    return decorate
+
+
+class Instrument:
+    """ Hands the `OperationRecord` of every instrumented operation to callbacks
+
+        collector = HistogramCollector()
+        clipboard = Clipboard(instrument=Instrument(collector))
+    """
+
+    def __init__(self, *callbacks):
+        """
+        :param callbacks: Callables taking an `OperationRecord`
+        """
+        self._callbacks = list(callbacks)
+
+    def add_callback(self, callback):
+        """
+        :param callback: Callable taking an `OperationRecord`
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def record(self, record):
+        """
+        Reports a finished operation.
+
+        :param record: `OperationRecord`
+        """
+        for callback in list(self._callbacks):
+            callback(record)
+
+
+class Histogram:
+    """ Log-scale latency histogram
+
+    Bucket i counts durations up to `base * 2 ** i` seconds, so quantiles are
+    known to within a factor of two whatever the range.
+    """
+    base = 1e-6
+    buckets = 28
+    """ Covers 1 microsecond to about 2 minutes; longer durations go in the last bucket
+    """
+
+    def __init__(self):
+        self.counts = [0] * self.buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        index = 0 if seconds <= self.base else math.ceil(math.log2(seconds / self.base))
+        self.counts[min(index, self.buckets - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        :param q: Quantile between 0 and 1, e.g 0.99
+        :returns float: Upper bound of the bucket holding it, in seconds, or None if empty
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.base * 2 ** i, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class HistogramCollector:
+    """ Instrument callback keeping latency histograms per operation and phase
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            stats = self._stats.get((record.source, record.operation))
+            if stats is None:
+                stats = self._stats[(record.source, record.operation)] = {
+                    'total': Histogram(), 'phases': {}, 'bytes': 0,
+                    'cache_hits': 0, 'cache_misses': 0, 'errors': 0}
+            stats['total'].add(record.duration)
+            for name, seconds in record.phases.items():
+                histogram = stats['phases'].get(name)
+                if histogram is None:
+                    histogram = stats['phases'][name] = Histogram()
+                histogram.add(seconds)
+            stats['bytes'] += record.bytes
+            stats['cache_hits'] += record.cache_hits
+            stats['cache_misses'] += record.cache_misses
+            stats['errors'] += record.error is not None
+
+    def histogram(self, operation, phase=None, source=None):
+        """
+        :param operation: Operation name
+        :param phase: Phase name, or None for the whole operation (default: None)
+        :param source: Backend class name, or None for the first one seen (default: None)
+        :returns: `Histogram`, or None if nothing was recorded
+        """
+        with self._lock:
+            for (seen_source, seen_operation), stats in self._stats.items():
+                if seen_operation == operation and (source is None or seen_source == source):
+                    return stats['total'] if phase is None else stats['phases'].get(phase)
+        return None
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """
+        :param quantiles: Quantiles to report (default: median, p90, p99)
+        :returns list: One dict per (source, operation), suitable for JSON
+        """
+        def describe(histogram):
+            entry = {'count': histogram.count, 'mean_s': histogram.mean, 'max_s': histogram.max}
+            for q in quantiles:
+                entry['p{:g}_s'.format(q * 100)] = histogram.quantile(q)
+            return entry
+
+        with self._lock:
+            summary = []
+            for (source, operation), stats in sorted(self._stats.items()):
+                entry = dict(source=source, operation=operation, bytes=stats['bytes'],
+                             cache_hits=stats['cache_hits'], cache_misses=stats['cache_misses'],
+                             errors=stats['errors'], **describe(stats['total']))
+                entry['phases'] = {name: describe(histogram)
+                                   for name, histogram in sorted(stats['phases'].items())}
+                summary.append(entry)
+            return summary
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,236 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# memorybackend.py -- in-memory reference backend
+
+import threading
+from io import BytesIO
+
+from PIL import Image as PilImage
+from PIL.Image import Image as PilImageType
+
+from .absbackend import AbstractBackend, AbstractImageConverter, ClipboardChange
+from .converters import PilImageConverter
+from .targets import TargetOffer, TEXT_TARGETS, encode_image, is_image_target
+
+
+class MemoryBackend(AbstractBackend):
+    """ In-memory clipboard backend
+
+    This backend keeps the clipboard contents in the process. It needs no
+    desktop, which makes it useful for tests and as a baseline when
+    benchmarking the real backends. Values are stored by reference, so the
+    only costs measured are the ones of crossclip itself.
+    """
+
+    image_converter = PilImageConverter()
+    has_events = True
+    notifies_in_background = True
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._text = None
+        self._image = None
+        self._offer = None
+        self._changed = threading.Event()
+
+    def process_events(self, timeout=0):
+        """
+        Waits up to `timeout` seconds for a change made by another thread.
+        Change listeners are called right away by the setter, so there is
+        nothing to dispatch.
+
+        :param timeout: Longest time to wait, in seconds, or None to wait
+                        until a change or `wakeup` (default: 0)
+        """
+        if timeout is None or timeout > 0:
+            self._changed.wait(timeout)
+        self._changed.clear()
+
+    def wakeup(self):
+        """
+        Makes a waiting `process_events` return.
+        """
+        self._changed.set()
+
+    def owns_clipboard(self):
+        """
+        The process owns the clipboard as soon as anything was set.
+
+        :returns bool: True if the clipboard holds anything
+        """
+        with self._lock:
+            return self._text is not None or self._image is not None or self._offer is not None
+
+    def _connect_changes(self):
+        """
+        Changes are reported by the setters themselves.
+        """
+        pass
+
+    def available_targets(self):
+        """
+        Lists the offered targets.
+
+        :returns list: Target names
+        """
+        with self._lock:
+            if self._text is not None:
+                return ['UTF8_STRING', 'text/plain;charset=utf-8', 'text/plain']
+            elif self._image is not None:
+                return ['image/png']
+            elif self._offer is not None:
+                return self._offer.targets
+            return []
+
+    def _changed_by_set(self):
+        self._changed.set()
+        self._notify_change(ClipboardChange(self.available_targets()))
+
+    def get_text(self):
+        """
+        Gets text from the clipboard.
+
+        :return str: Text from clipboard, or None
+        """
+        with self._lock:
+            offer = self._offer
+            if offer is None:
+                return self._text
+
+        target = next((target for target in TEXT_TARGETS if target in offer), None)
+        if target is None:
+            return None
+        payload = offer.get(target)
+        return None if payload is None else payload.decode('utf-8')
+
+    def get_image(self, format='pil', converter=None):
+        """
+        Gets the image from the clipboard.
+
+        :param format: 'pil' for a pillow image, or the `image_str` of `converter` (default: 'pil')
+        :param converter: Converter used for any other format
+        :returns: Image in chosen format, or None
+        :raises RuntimeWarning: If format is invalid and no converter is provided
+        """
+        with self._lock:
+            image = self._image
+            offer = self._offer
+        if offer is not None:
+            image = self._decode_offered_image(offer)
+        if image is None:
+            return None
+
+        if format == self.image_converter.image_str:
+            return image
+        elif converter is not None and isinstance(converter, AbstractImageConverter):
+            return converter.from_pillow(image)
+        else:
+            raise RuntimeWarning("Invalid format, and converter is not provided")
+
+    def size_hint(self, target):
+        """
+        Returns the payload size of a target when it is known without
+        rendering it.
+
+        :param target: Target name
+        :returns int: Size in bytes, or None
+        """
+        with self._lock:
+            if self._text is not None and target in TEXT_TARGETS:
+                return len(self._text.encode('utf-8'))
+            if self._offer is not None:
+                return self._offer.rendered_size(target)
+        return None
+
+    def get_contents(self, target):
+        """
+        Gets the raw bytes of a target.
+
+        :param target: Target name
+        :returns bytes: Payload, or None if target isn't offered
+        """
+        with self._lock:
+            text = self._text
+            image = self._image
+            offer = self._offer
+        if offer is not None:
+            return offer.get(target)
+        if text is not None and target in self.available_targets():
+            return text.encode('utf-8')
+        if image is not None and target == 'image/png':
+            return encode_image(image, target)
+        return None
+
+    def _decode_offered_image(self, offer):
+        target = next((target for target in offer.targets if is_image_target(target)), None)
+        if target is None:
+            return None
+        payload = offer.get(target)
+        if payload is None:
+            return None
+        image = PilImage.open(BytesIO(payload))
+        image.load()
+        return image
+
+    def set_data(self, data):
+        """
+        Offers several targets at once. Callables are only invoked when their
+        target is read.
+
+        :param data: dict of target to str, bytes, `PIL.Image`, or a callable
+                     returning one of those
+        """
+        offer = TargetOffer(data)
+        with self._lock:
+            self._offer = offer
+            self._text = None
+            self._image = None
+        self._changed_by_set()
+
+    def set_text(self, text):
+        """
+        Sets text to the clipboard.
+
+        :param text: text to set to clipboard
+        """
+        with self._lock:
+            self._text = text
+            self._image = None
+            self._offer = None
+        self._changed_by_set()
+
+    def set_image(self, image, converter=None):
+        """
+        Sets an image to the clipboard.
+
+        :param image: Pillow image, or an image `converter` can convert
+        :param converter: Converter for non-pillow images
+        :raises RuntimeWarning: If image is of invalid type and has no converter
+        """
+        if not isinstance(image, PilImageType):
+            if converter is not None and isinstance(converter, AbstractImageConverter):
+                image = converter.to_pillow(image)
+            else:
+                raise RuntimeWarning("Image is of invalid type and has no converter")
+
+        with self._lock:
+            self._image = image
+            self._text = None
+            self._offer = None
+        self._changed_by_set()
@@ -17,67 +17,407 @@
 
 # qtbackend.py -- qt backend class
 
-from PyQt5.Qt import QApplication, QClipboard, QBuffer
+import sys
+
+from PyQt5.Qt import QApplication, QClipboard
+from PyQt5.QtCore import Qt, QCoreApplication, QEvent, QEventLoop, QTimer, QMimeData, QByteArray
 from PyQt5.QtGui import QImage, QPixmap
 import PyQt5
 from PIL import Image as PilImage
+from PIL.Image import Image as PilImageType
+
+from .absbackend import AbstractBackend, AbstractImageConverter, ClipboardChange, Conversion
+from .converters import default_graph, array_mode, HAVE_NUMPY
+from .scaling import fit_size
+from .targets import TargetOffer
+
+# QImage formats that Pillow can unpack directly, mapped to (mode, rawmode).
+# The 32 bit formats are stored as native-endian 0xAARRGGBB words.
+if sys.byteorder == 'little':
+    QT_TO_PIL = {
+        QImage.Format_RGB32: ('RGB', 'BGRX'),
+        QImage.Format_ARGB32: ('RGBA', 'BGRA'),
+    }
+else:
+    QT_TO_PIL = {
+        QImage.Format_RGB32: ('RGB', 'XRGB'),
+        QImage.Format_ARGB32: ('RGBA', 'ARGB'),
+    }
+QT_TO_PIL.update({
+    QImage.Format_RGB888: ('RGB', 'RGB'),
+    QImage.Format_RGBA8888: ('RGBA', 'RGBA'),
+    QImage.Format_Grayscale8: ('L', 'L'),
+})
 
-from .absbackend import AbstractBackend, AbstractImageConverter
+# Pillow modes mapped to (QImage format, rawmode, bytes per pixel)
+PIL_TO_QT = {
+    'RGB': (QImage.Format_RGB888, 'RGB', 3),
+    'RGBA': ((QImage.Format_ARGB32, 'BGRA', 4) if sys.byteorder == 'little'
+             else (QImage.Format_RGBA8888, 'RGBA', 4)),
+    'L': (QImage.Format_Grayscale8, 'L', 1),
+}
+
+
+def _image_buffer(qimage, writable=False):
+    """
+    Exposes the pixel memory of a QImage as a memoryview.
+
+    :param qimage: QImage to expose
+    :param writable: If true, use bits() which detaches shared data (default: False)
+    :returns memoryview: View over bytesPerLine() * height() bytes
+    """
+    ptr = qimage.bits() if writable else qimage.constBits()
+    ptr.setsize(qimage.bytesPerLine() * qimage.height())
+    return memoryview(ptr)
+
+
+def qimage_from_buffer(data, width, height, stride, fmt):
+    """
+    Builds a QImage that owns a copy of raw pixel rows.
+
+    :param data: Bytes-like pixel data. The last row need not be padded
+    :param width: Width in pixels
+    :param height: Height in pixels
+    :param stride: Distance between rows in `data`, in bytes
+    :param fmt: QImage format describing one pixel of `data`
+    :returns QImage: New image
+    """
+    data = memoryview(data)
+    qimage = QImage(width, height, fmt)
+    buf = _image_buffer(qimage, writable=True)
+    row = width * qimage.depth() // 8
+    if stride == row == qimage.bytesPerLine():
+        buf[:] = data[:row * height]
+    else:
+        # QImage rows are 32 bit aligned
+        step = qimage.bytesPerLine()
+        for y in range(height):
+            buf[y * step:y * step + row] = data[y * stride:y * stride + row]
+    return qimage
+
+
+# QImage formats a numpy array can view, mapped to the number of channels
+QT_ARRAY_CHANNELS = {
+    QImage.Format_Grayscale8: 1,
+    QImage.Format_RGB888: 3,
+    QImage.Format_RGBA8888: 4,
+}
+
+
+class _QImageArrayInterface:
+    """ Exposes a QImage's pixels through the numpy array interface
+
+    The array keeps this object, and so the QImage, alive.
+    """
+
+    def __init__(self, qimage, channels):
+        self._qimage = qimage
+        shape = (qimage.height(), qimage.width())
+        strides = (qimage.bytesPerLine(), channels)
+        if channels > 1:
+            shape += (channels,)
+            strides += (1,)
+        self.__array_interface__ = {
+            'version': 3,
+            'shape': shape,
+            'strides': strides,
+            'typestr': '|u1',
+            'data': (int(qimage.constBits()), True),
+        }
+
+
+def qimage_to_array(qimage):
+    """
+    Exposes the pixels of a `QImage` as a read-only numpy array. Images in a
+    byte-ordered format are viewed in place; others are converted by Qt first.
+
+    :param qimage: QImage to expose
+    :returns numpy.ndarray: uint8 array, HxWx3, HxWx4 or HxW
+    """
+    import numpy
+
+    if qimage.format() not in QT_ARRAY_CHANNELS:
+        if qimage.isGrayscale() and not qimage.hasAlphaChannel():
+            target = QImage.Format_Grayscale8
+        else:
+            target = QImage.Format_RGBA8888 if qimage.hasAlphaChannel() else QImage.Format_RGB888
+        qimage = qimage.convertToFormat(target)
+    return numpy.asarray(_QImageArrayInterface(qimage, QT_ARRAY_CHANNELS[qimage.format()]))
+
+
+def array_to_qimage(array):
+    """
+    Converts a numpy array to a `QImage` without going through Pillow.
+
+    :param array: HxW, HxWx3 or HxWx4 uint8 array
+    :returns QImage: Converted image
+    """
+    import numpy
+
+    fmt = {
+        'L': QImage.Format_Grayscale8,
+        'RGB': QImage.Format_RGB888,
+        'RGBA': QImage.Format_RGBA8888,
+    }[array_mode(array)]
+    array = numpy.ascontiguousarray(array)
+    h, w = array.shape[:2]
+    return qimage_from_buffer(array.reshape(-1), w, h, array.strides[0], fmt)
 
 
 class QtImageConverter(AbstractImageConverter):
 
-    native_image = QImage
-    native_image_str = 'qt'
+    @property
+    def image_type(self):
+        """
+        Returns the type of image that this converter uses.
+
+        :returns: QImage type (not object!)
+        """
+        return QImage
+
+    @property
+    def image_str(self):
+        """
+        Returns a string representation of what the object is.
+
+        :returns str: 'qt'
+        """
+        return 'qt'
+
+    def conversions(self):
+        """
+        Returns the Pillow conversions plus direct conversions to and from
+        numpy arrays, if numpy is installed.
+
+        :returns: list of `Conversion`
+        """
+        if not HAVE_NUMPY:
+            return super().conversions()
+        return super().conversions() + [
+            Conversion('qt', 'numpy', 2, qimage_to_array),
+            Conversion('numpy', 'qt', 6, array_to_qimage),
+        ]
+
+    def scale(self, qimage, max_size=None, reduce=None):
+        """
+        Scales a `QImage` down with Qt, before it is converted.
+
+        :param qimage: QImage to scale
+        :param max_size: (width, height) box to fit in, or None
+        :param reduce: Factor to divide both sides by, or None
+        :returns QImage: Scaled image
+        """
+        size = (qimage.width(), qimage.height())
+        w, h = fit_size(size, max_size, reduce)
+        if (w, h) == size:
+            return qimage
+        return qimage.scaled(w, h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def to_pillow(self, qimage):
+        """
+        Converts a `QImage` to a `PIL.Image`. The pixel memory is read in place,
+        so the only copy is the one into the Pillow image.
 
-    def to_pillow(qimage):
-        buf = QBuffer()
-        buf.open(QBuffer.ReadWrite)
-        qimage.save(buf, 'PNG') # TODO: make this dynamic
-        pimage = PilImage.open(io.BytesIO(buf.data()))
-        return pimage
+        :param qimage: QImage to convert
+        :returns PIL.Image: Converted Pillow Image
+        """
+        if isinstance(qimage, PilImageType):
+            return qimage
+
+        if qimage.format() not in QT_TO_PIL:
+            # Premultiplied, indexed and other exotic formats
+            target = QImage.Format_ARGB32 if qimage.hasAlphaChannel() else QImage.Format_RGB32
+            qimage = qimage.convertToFormat(target)
+
+        mode, rawmode = QT_TO_PIL[qimage.format()]
+        size = (qimage.width(), qimage.height())
+        data = _image_buffer(qimage)
+        return PilImage.frombytes(mode, size, data, 'raw', rawmode, qimage.bytesPerLine())
+
+    def from_pillow(self, image):
+        """
+        Converts a `PIL.Image` to a `QImage`. The pixels are copied straight into
+        the QImage's own memory, honouring its row alignment.
+
+        :param image: `PIL.Image` to be converted
+        :returns QImage: Converted image
+        """
+        if isinstance(image, QImage):
+            return image
+
+        if image.mode not in PIL_TO_QT:
+            has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        fmt, rawmode, depth = PIL_TO_QT[image.mode]
+        w, h = image.size
+        return qimage_from_buffer(image.tobytes('raw', rawmode), w, h, w * depth, fmt)
+
+class LazyMimeData(QMimeData):
+    """ QMimeData whose formats are rendered when they are first retrieved
+    """
+
+    def __init__(self, offer):
+        super().__init__()
+        self.offer = offer
+
+    def formats(self):
+        return self.offer.targets
+
+    def hasFormat(self, mimetype):
+        return mimetype in self.offer
+
+    def retrieveData(self, mimetype, preferred_type):
+        payload = self.offer.get(mimetype)
+        if payload is None:
+            return super().retrieveData(mimetype, preferred_type)
+        return QByteArray(payload)
+
+
+class QtTimeout:
+    """ Handle of a callback scheduled on the Qt event loop
+    """
+
+    def __init__(self, delay, callback):
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(callback)
+        self._timer.start(int(delay * 1000))
+
+    def cancel(self):
+        self._timer.stop()
 
-    def from_pillow(image):
-        qimg = PilImageQt(image)
-        return qimg
 
 class QtBackend(AbstractBackend):
     """ Backend for Qt clipboard
 
     This class backends the default Qt Clipboard
     """
-    image_converter = QtImageConverter
+    image_converter = QtImageConverter()
+    has_events = True
 
     def __init__(self):
         # Get the default application. I am ignoring any sort
         # of signal/slot setup. This will all be based off of user
         # actions
         super().__init__()
-        self.app = QApplication([])
+        # Once per backend; converters passed to single calls stay private to them
+        default_graph.register(self.image_converter)
+        # Qt allows one application object per process, so an existing one is reused
+        self.app = QApplication.instance() or QApplication([])
         self.clipboard = self.app.clipboard()
+        self._listening = False
+
+    def close(self):
+        """
+        Stops listening for changes. The application object is left running,
+        as other backends in the process may use it.
+        """
+        if self._listening:
+            self._listening = False
+            self.clipboard.dataChanged.disconnect(self._on_data_changed)
 
     def get_text(self):
         return self.clipboard.text()
 
-    def get_image(self, format='pil'):
+    def process_events(self, timeout=0):
+        """
+        Dispatches pending Qt events. QClipboard has no asynchronous read API,
+        so `request_text`/`request_image` answer immediately.
+
+        :param timeout: Longest time to spend processing events, in seconds, or
+                        None to wait until one arrives or `wakeup` is called (default: 0)
+        """
+        if timeout is None:
+            self.app.processEvents(QEventLoop.AllEvents | QEventLoop.WaitForMoreEvents)
+        elif timeout > 0:
+            self.app.processEvents(QEventLoop.AllEvents, int(timeout * 1000))
+        else:
+            self.app.processEvents()
+
+    def wakeup(self):
+        """
+        Makes a waiting `process_events` return. Posting an event is safe from
+        any thread, and it stays queued if nothing is waiting yet.
+        """
+        QCoreApplication.postEvent(self.app, QEvent(QEvent.User))
+
+    def owns_clipboard(self):
+        return self.clipboard.ownsClipboard()
+
+    def call_later(self, delay, callback):
+        return QtTimeout(delay, callback)
+
+    def _connect_changes(self):
+        self.clipboard.dataChanged.connect(self._on_data_changed)
+        self._listening = True
+
+    def _on_data_changed(self):
+        self._notify_change(ClipboardChange(self.available_targets))
+
+    def available_targets(self):
+        mime = self.clipboard.mimeData()
+        if mime is None:
+            return []
+        return list(mime.formats())
+
+    def has_text(self):
+        mime = self.clipboard.mimeData()
+        return mime is not None and mime.hasText()
+
+    def has_image(self):
+        mime = self.clipboard.mimeData()
+        return mime is not None and mime.hasImage()
+
+    def get_contents(self, target):
+        """
+        Synchronously gets the raw bytes of a target. Qt buffers the whole
+        transfer, so `iter_contents` only slices the payload afterwards.
+
+        :param target: Target name
+        :returns bytes: Payload, or None if target isn't offered
+        """
+        mime = self.clipboard.mimeData()
+        if mime is None or not mime.hasFormat(target):
+            return None
+        return mime.data(target).data()
+
+    def get_image(self, format='pil', converter=None):
         img = self.clipboard.image()
-        if format == self.image_converter.native_image_str:
+        if img.isNull():
+            return None
+
+        if format == self.image_converter.image_str:
             return img
         elif format == 'pil':
             return self.image_converter.to_pillow(img)
+        elif converter is not None and isinstance(converter, AbstractImageConverter):
+            graph = default_graph.layered(converter)
+            return graph.convert(img, converter.image_str, self.image_converter.image_str)
         else:
             raise RuntimeWarning('Image format is not supported')
-            return None
 
     def set_text(self, text):
         self.clipboard.setText(text)
 
-    def set_image(self, image, format='pil'):
-        if format == self.image_converter.native_image_str:
+    def set_data(self, data):
+        """
+        Offers several targets in a single clipboard ownership. Values are
+        rendered only when another application retrieves their format.
+
+        :param data: dict of mime type to str, bytes, `PIL.Image`, or a callable
+                     returning one of those
+        """
+        self.mime_data = LazyMimeData(TargetOffer(data))
+        self.clipboard.setMimeData(self.mime_data)
+
+    def set_image(self, image, converter=None):
+        if isinstance(image, PilImageType):
+            self.clipboard.setImage(self.image_converter.from_pillow(image))
+        elif isinstance(image, self.image_converter.image_type):
             self.clipboard.setImage(image)
-        elif format == 'pil':
-            qimg = self.image_converter.from_pillow(image)
-            self.clipboard.setImage(qimg)
+        elif converter is not None and isinstance(converter, AbstractImageConverter):
+            graph = default_graph.layered(converter)
+            self.set_image(graph.convert(image, self.image_converter.image_str, converter.image_str))
         else:
             raise RuntimeWarning('Image format is not supported')
-            return None
@@ -0,0 +1,334 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# registry.py -- lazy backend discovery
+
+import sys
+import os
+import json
+import shutil
+import hashlib
+import importlib
+import threading
+import subprocess
+from collections.abc import Mapping
+
+
+# Desktops that are known to be built on one of the toolkits. XDG_CURRENT_DESKTOP
+# may hold a colon separated list (e.g. 'ubuntu:GNOME'), so every entry is checked.
+GTK_DESKTOPS = ['MATE', 'GNOME', 'X-Cinnamon', 'LXDE', 'XFCE', 'Unity']
+QT_DESKTOPS = ['LXQt', 'KDE']
+
+# Environment variables that influence the probe. The on-disk cache is keyed
+# by these, so a cached answer is never reused under a different session.
+PROBE_ENVIRONMENT = [
+    'XDG_CURRENT_DESKTOP',
+    'XDG_SESSION_TYPE',
+    'DESKTOP_SESSION',
+    'DISPLAY',
+    'WAYLAND_DISPLAY',
+    'PATH',
+]
+
+PROBE_CACHE_VARIABLE = 'CROSSCLIP_PROBE_CACHE'
+""" Environment variable enabling the on-disk probe cache. Set it to '1' to use
+the default location, or to a file path.
+"""
+
+_UNPROBED = object()
+
+
+def default_probe_cache_path():
+    """
+    Returns the default location of the on-disk probe cache.
+
+    :returns str: Path of the cache file
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'crossclip', 'probe.json')
+
+
+def environment_key():
+    """
+    Computes a key identifying the current desktop environment.
+
+    :returns str: Hex digest of the probe-relevant environment
+    """
+    env = [sys.platform] + [os.environ.get(name, '') for name in PROBE_ENVIRONMENT]
+    return hashlib.sha1('\0'.join(env).encode('utf-8')).hexdigest()
+
+
+def _is_xfce4():
+    """
+    Checks if the running X session is Xfce4 by reading the root window
+    property. xprop is only spawned if it is actually installed.
+
+    :returns bool: True if the desktop is Xfce4
+    """
+    xprop = shutil.which('xprop')
+    if xprop is None:
+        return False
+    try:
+        result = subprocess.run([xprop, '-root', '_DT_SAVE_MODE'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                timeout=2)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return b' = "xfce4"' in result.stdout
+
+
+def probe_platform():
+    """
+    Determines the name of the backend that matches the running platform. This
+    does not import any toolkit.
+
+    :returns str: Backend name, or None if no backend matches
+    """
+    if sys.platform == 'linux':
+        # cmdbackend needs Pillow, which plain `import crossclip` shouldn't load
+        from .cmdbackend import find_tool
+
+        desktops = os.environ.get('XDG_CURRENT_DESKTOP', '').split(':')
+        if any(desktop in GTK_DESKTOPS for desktop in desktops):
+            return 'gtk'
+        elif any(desktop in QT_DESKTOPS for desktop in desktops):
+            return 'qt'
+        elif _is_xfce4():
+            return 'gtk'
+        elif find_tool() is not None:
+            # No toolkit desktop, but a command line tool can reach the clipboard
+            return 'cmd'
+        return None
+    elif sys.platform == 'darwin':
+        return 'apple'
+    elif sys.platform == 'win32':
+        return 'win'
+    return None
+
+
+class BackendRegistry:
+    """ Registry of clipboard backends
+
+    Backends are registered by name along with the module that defines them.
+    Nothing is imported until a backend is actually requested, and the platform
+    probe runs at most once per process (or once per environment if the disk
+    cache is enabled).
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._loaded = {}
+        self._platform = _UNPROBED
+        self._selected = None
+        self._lock = threading.RLock()
+
+    def register(self, name, backend):
+        """
+        Registers a backend under a name.
+
+        :param name: Name of the backend (e.g 'gtk')
+        :param backend: Backend class, a ('module', 'ClassName') tuple for lazy
+                        loading, or None for a known but unavailable backend
+        """
+        with self._lock:
+            self._loaded.pop(name, None)
+            if isinstance(backend, type):
+                self._loaded[name] = backend
+            self._sources[name] = backend
+
+    def names(self):
+        """
+        Returns the names of every registered backend.
+
+        :returns list: Registered names
+        """
+        return list(self._sources)
+
+    def load(self, name):
+        """
+        Imports and returns the backend registered under `name`.
+
+        :param name: Name of the backend
+        :returns: Backend class
+        :raises RuntimeError: If the backend is unknown or cannot be imported
+        """
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            if name not in self._sources:
+                raise RuntimeError('Unknown clipboard backend: {}'.format(name))
+            source = self._sources[name]
+            if source is None:
+                raise RuntimeError('No clipboard backend is available for {}'.format(name))
+
+            module_name, class_name = source
+            try:
+                module = importlib.import_module(module_name)
+            except ImportError as err:
+                raise RuntimeError('Could not load the {} backend: {}'.format(name, err)) from err
+            backend = getattr(module, class_name)
+            self._loaded[name] = backend
+            return backend
+
+    def platform(self, disk_cache=None):
+        """
+        Returns the backend name matching the platform, probing it on first use.
+
+        :param disk_cache: Path of an on-disk cache, True for the default path,
+                           False to disable it, or None to consult the
+                           CROSSCLIP_PROBE_CACHE environment variable (default: None)
+        :returns str: Backend name, or None if no backend matches
+        """
+        with self._lock:
+            if self._platform is _UNPROBED:
+                self._platform = self._probe(disk_cache)
+            return self._platform
+
+    def _probe(self, disk_cache):
+        """
+        Runs the platform probe, going through the disk cache if enabled.
+        """
+        if disk_cache is None:
+            disk_cache = os.environ.get(PROBE_CACHE_VARIABLE) or False
+            if disk_cache in ('1', 'true', 'yes'):
+                disk_cache = True
+        if disk_cache is True:
+            disk_cache = default_probe_cache_path()
+        if not disk_cache:
+            return probe_platform()
+
+        key = environment_key()
+        try:
+            with open(disk_cache, 'r') as fh:
+                entries = json.load(fh)
+        except (OSError, ValueError):
+            entries = {}
+        if not isinstance(entries, dict):
+            entries = {}
+        if key in entries:
+            return entries[key]
+
+        name = probe_platform()
+        entries[key] = name
+        try:
+            os.makedirs(os.path.dirname(disk_cache), exist_ok=True)
+            tmp = '{}.{}.tmp'.format(disk_cache, os.getpid())
+            with open(tmp, 'w') as fh:
+                json.dump(entries, fh)
+            os.replace(tmp, disk_cache)
+        except OSError:
+            # The cache is an optimization only
+            pass
+        return name
+
+    def reset(self):
+        """
+        Forgets the probed platform and any explicit selection.
+        """
+        with self._lock:
+            self._platform = _UNPROBED
+            self._selected = None
+
+    @property
+    def selected(self):
+        """
+        Name of the explicitly selected backend, or None.
+        """
+        return self._selected
+
+    def current(self):
+        """
+        Returns the name of the backend that `Clipboard()` would use, without
+        importing it.
+
+        :returns str: Backend name or None
+        """
+        if self._selected is not None:
+            return self._selected
+        return self.platform()
+
+    def select(self, backend=None, disk_cache=None):
+        """
+        Selects the backend used by `Clipboard()` and returns its class.
+
+        :param backend: Name or backend class. If None, the backend matching the
+                        platform is probed (default: None)
+        :param disk_cache: See `BackendRegistry.platform`
+        :returns: Backend class
+        :raises RuntimeError: If no usable backend is found
+        """
+        with self._lock:
+            if isinstance(backend, type):
+                from .absbackend import AbstractBackend
+                if not issubclass(backend, AbstractBackend):
+                    raise RuntimeError("Clipboard backend is of invalid type")
+                name = backend.__name__
+                self.register(name, backend)
+                self._selected = name
+                return backend
+
+            if backend is None:
+                if self._selected is not None:
+                    return self.load(self._selected)
+                name = self.platform(disk_cache)
+                if name is None:
+                    if sys.platform == 'linux':
+                        raise RuntimeError('Not using a GTK or Qt-based Desktop, and no clipboard command found')
+                    raise RuntimeError('Your platform is not supported')
+                return self.load(name)
+
+            backend_type = self.load(backend)
+            self._selected = backend
+            return backend_type
+
+
+class BackendsView(Mapping):
+    """ Read-only mapping of backend name to backend class
+
+    Looking up a name imports the backend on demand. Backends that cannot be
+    imported map to None, matching the old module-level `backends` dict.
+    """
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    def __getitem__(self, name):
+        if name not in self._registry.names():
+            raise KeyError(name)
+        try:
+            return self._registry.load(name)
+        except RuntimeError:
+            return None
+
+    def __iter__(self):
+        return iter(self._registry.names())
+
+    def __len__(self):
+        return len(self._registry.names())
+
+    def __repr__(self):
+        return 'BackendsView({})'.format(self._registry.names())
+
+
+default_registry = BackendRegistry()
+default_registry.register('gtk', ('crossclip.gtkbackend', 'GtkBackend'))
+default_registry.register('qt', ('crossclip.qtbackend', 'QtBackend'))
+default_registry.register('apple', None)
+default_registry.register('win', ('crossclip.winbackend', 'WindowsBackend'))
+default_registry.register('cmd', ('crossclip.cmdbackend', 'CommandBackend'))
+default_registry.register('memory', ('crossclip.memorybackend', 'MemoryBackend'))
+default_registry.register('broker', ('crossclip.broker', 'BrokerBackend'))
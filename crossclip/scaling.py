@@ -0,0 +1,91 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# scaling.py -- reduced-size image reads
+
+from io import BytesIO
+
+from PIL import Image as PilImage
+
+DRAFT_TARGETS = ['image/jpeg']
+""" Encoded targets Pillow can decode at a reduced scale, skipping most of the
+full-resolution decode
+"""
+
+
+def fit_size(size, max_size=None, reduce=None):
+    """
+    Computes the size of a reduced image. The aspect ratio is kept and images
+    are never enlarged.
+
+    :param size: (width, height) of the full image
+    :param max_size: (width, height) box the image must fit in, or None
+    :param reduce: Factor to divide both sides by, or None
+    :returns tuple: (width, height), each at least 1
+    :raises RuntimeError: If reduce is smaller than 1
+    """
+    w, h = size
+    ratio = 1.0
+    if reduce is not None:
+        if reduce < 1:
+            raise RuntimeError('reduce must be at least 1')
+        ratio = 1.0 / reduce
+    if max_size is not None:
+        ratio = min(ratio, max_size[0] / w, max_size[1] / h)
+    if ratio >= 1.0:
+        return (w, h)
+    return (max(1, round(w * ratio)), max(1, round(h * ratio)))
+
+
+def scale_pillow(image, size):
+    """
+    Scales a Pillow image down. Exact integer factors use `Image.reduce`,
+    anything else reduces first and resamples the rest.
+
+    :param image: `PIL.Image`
+    :param size: (width, height) to scale to
+    :returns PIL.Image: Scaled image, or image itself if it already has size
+    """
+    if image.size == tuple(size):
+        return image
+    if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    w, h = size
+    factor = image.width // w
+    if factor > 1 and image.width == w * factor and image.height == h * factor:
+        return image.reduce(factor)
+    return image.resize((w, h), PilImage.BILINEAR, reducing_gap=2.0)
+
+
+def decode_reduced(data, max_size=None, reduce=None):
+    """
+    Decodes an encoded image at reduced size. JPEG images are decoded at the
+    smallest DCT scale that still covers the requested size.
+
+    :param data: Encoded image, bytes-like
+    :param max_size: See `fit_size`
+    :param reduce: See `fit_size`
+    :returns PIL.Image: Decoded and scaled image
+    """
+    image = PilImage.open(BytesIO(data))
+    size = fit_size(image.size, max_size, reduce)
+    if image.format == 'JPEG':
+        image.draft(image.mode, size)
+    image.load()
+    return scale_pillow(image, size)
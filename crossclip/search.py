@@ -0,0 +1,222 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# search.py -- trigram index over captured clipboard text
+
+import re
+import time
+import bisect
+import threading
+from array import array
+from collections import namedtuple
+
+from .targets import is_text_target
+
+SearchResult = namedtuple('SearchResult', ['id', 'text', 'time', 'key'])
+""" One match: entry id, text, capture time and the key given to `TextIndex.add`
+"""
+
+# Marks a trigram anchored at the start of a word
+_WORD_START = '\x02'
+_WORD_START_RE = re.compile(r'(?<!\w)\w', re.UNICODE)
+
+
+def trigrams(text):
+    """
+    :param text: Text to split
+    :returns set: Every substring of three characters
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def word_anchors(text):
+    """
+    :param text: Text to split
+    :returns set: Anchored trigrams made of the first two characters of each word
+    """
+    return {_WORD_START + text[m.start():m.start() + 2] for m in _WORD_START_RE.finditer(text)}
+
+
+class TextIndex:
+    """ Incremental trigram index for substring and prefix search
+
+    Each text gets an increasing id. The index maps every trigram of a text,
+    plus an anchored trigram per word start, to the sorted array of ids that
+    contain it. A query looks up its rarest trigram, walks those ids newest
+    first and checks each candidate, so it stops as soon as `limit` matches
+    are found. Queries shorter than a trigram fall back to a scan.
+
+    As long as texts are added in time order, a time range is turned into an
+    id range by bisection and never looks at entries outside of it.
+    """
+
+    max_indexed_length = 64 * 1024
+    """ Only this many leading characters of a text are indexed. Matches past
+    it are only found by queries too short to use the index
+    """
+
+    def __init__(self, ignore_case=True):
+        """
+        :param ignore_case: If true, queries match regardless of case (default: True)
+        """
+        self.ignore_case = ignore_case
+        self._texts = []
+        self._folded = []
+        self._keys = []
+        self._times = array('d')
+        self._postings = {}
+        self._monotonic = True
+        self._removed = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._texts) - self._removed
+
+    def _fold(self, text):
+        return text.casefold() if self.ignore_case else text
+
+    def add(self, text, when=None, key=None):
+        """
+        Indexes a text.
+
+        :param text: Text to index
+        :param when: Capture time in seconds since the epoch (default: now)
+        :param key: Any value to return along with matches, e.g a content digest
+        :returns int: Id of the entry
+        """
+        when = time.time() if when is None else when
+        folded = self._fold(text)
+        indexed = folded[:self.max_indexed_length]
+        grams = trigrams(indexed) | word_anchors(indexed)
+
+        with self._lock:
+            doc = len(self._texts)
+            if self._times and when < self._times[-1]:
+                self._monotonic = False
+            self._texts.append(text)
+            self._folded.append(folded)
+            self._keys.append(key)
+            self._times.append(when)
+            for gram in grams:
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('I')
+                postings.append(doc)
+        return doc
+
+    def remove(self, doc):
+        """
+        Drops an entry from the results. Its postings are left in place.
+
+        :param doc: Id of the entry
+        """
+        with self._lock:
+            if self._texts[doc] is not None:
+                self._texts[doc] = None
+                self._folded[doc] = None
+                self._removed += 1
+
+    def get(self, doc):
+        """
+        :param doc: Id of the entry
+        :returns: `SearchResult`, or None if it was removed
+        """
+        text = self._texts[doc]
+        if text is None:
+            return None
+        return SearchResult(doc, text, self._times[doc], self._keys[doc])
+
+    def _id_range(self, since, until):
+        """
+        :returns: (first id, end id) that can fall in the time range
+        """
+        if not self._monotonic:
+            return 0, len(self._texts)
+        lo = 0 if since is None else bisect.bisect_left(self._times, since)
+        hi = len(self._texts) if until is None else bisect.bisect_left(self._times, until)
+        return lo, hi
+
+    def _candidates(self, grams, lo, hi):
+        """
+        Yields ids in [lo, hi) that may match, newest first.
+        """
+        postings = None
+        for gram in grams:
+            found = self._postings.get(gram)
+            if found is None:
+                return
+            if postings is None or len(found) < len(postings):
+                postings = found
+        if postings is None:
+            yield from range(hi - 1, lo - 1, -1)
+            return
+        start = bisect.bisect_left(postings, lo)
+        for i in range(bisect.bisect_left(postings, hi) - 1, start - 1, -1):
+            yield postings[i]
+
+    def search(self, query, prefix=False, since=None, until=None, limit=100):
+        """
+        Finds the entries containing query, newest first.
+
+        :param query: Text to look for
+        :param prefix: If true, query must start a word (default: False)
+        :param since: Only entries captured at or after this time (default: None)
+        :param until: Only entries captured before this time (default: None)
+        :param limit: Most results returned, or None for all (default: 100)
+        :returns list: `SearchResult` matches
+        """
+        folded = self._fold(query)
+        if prefix:
+            pattern = re.compile(r'(?<!\w)' + re.escape(folded))
+            matches = lambda text: pattern.search(text) is not None
+            grams = trigrams(folded)
+            if len(folded) >= 2 and _WORD_START_RE.match(folded):
+                grams.add(_WORD_START + folded[:2])
+        else:
+            matches = lambda text: folded in text
+            grams = trigrams(folded)
+
+        with self._lock:
+            lo, hi = self._id_range(since, until)
+            results = []
+            for doc in self._candidates(grams, lo, hi):
+                text = self._folded[doc]
+                if text is None or not matches(text):
+                    continue
+                when = self._times[doc]
+                if (since is not None and when < since) or (until is not None and when >= until):
+                    continue
+                results.append(SearchResult(doc, self._texts[doc], when, self._keys[doc]))
+                if limit is not None and len(results) >= limit:
+                    break
+            return results
+
+    def attach(self, clipboard):
+        """
+        Indexes every text placed on a clipboard from now on.
+
+        :param clipboard: `Clipboard` to watch
+        :returns: `ClipboardWatcher`; close it to stop indexing
+        :raises NotImplementedError: If the backend can't report changes
+        """
+        def record(change):
+            if any(is_text_target(target) for target in change.targets or []):
+                text = clipboard.get_text()
+                if text:
+                    self.add(text, change.time)
+
+        return clipboard.watch(record)
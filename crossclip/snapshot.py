@@ -0,0 +1,144 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# snapshot.py -- consistent multi-target clipboard reads
+
+import sys
+import time
+import threading
+from io import BytesIO
+from collections.abc import Mapping
+
+from PIL import Image as PilImage
+
+from .targets import TEXT_TARGETS, is_text_target, is_image_target
+from .timeouts import TIMED_OUT
+
+TIMESTAMP_TARGET = 'TIMESTAMP'
+""" X11 target answering the time at which the owner took the clipboard
+"""
+
+
+def parse_timestamp(data):
+    """
+    :param data: Payload of the TIMESTAMP target, a native-endian CARDINAL
+    :returns int: X server time in milliseconds, or None
+    """
+    if data is None or len(data) not in (4, 8):
+        return None
+    return int.from_bytes(bytes(data), sys.byteorder) & 0xffffffff
+
+
+class ClipboardSnapshot(Mapping):
+    """ Payloads of several targets, all read from the same clipboard owner
+
+    Maps each requested target to its raw bytes, or to None if the owner
+    didn't offer it.
+    """
+
+    def __init__(self, data, offered, timestamp, count, time):
+        self._data = data
+        self.offered = offered
+        """ Targets offered by the owner, or None if the backend can't list them
+        """
+        self.timestamp = timestamp
+        """ Toolkit time at which the owner took the clipboard, or None if it doesn't tell
+        """
+        self.count = count
+        """ Backend's `change_count` while the snapshot was taken
+        """
+        self.time = time
+        """ Time the snapshot was taken, in seconds since the epoch
+        """
+
+    def __getitem__(self, target):
+        return self._data[target]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'ClipboardSnapshot({}, timestamp={})'.format(list(self._data), self.timestamp)
+
+    def get_text(self):
+        """
+        Decodes the first plain text target of the snapshot.
+
+        :returns str: Text, or None if no text target was read
+        """
+        texts = [target for target in self._data if is_text_target(target) and self._data[target] is not None]
+        if not texts:
+            return None
+        # Prefer the targets that are known to be UTF-8
+        texts.sort(key=lambda target: TEXT_TARGETS.index(target) if target in TEXT_TARGETS else len(TEXT_TARGETS))
+        return str(self._data[texts[0]], 'utf-8', 'replace')
+
+    def get_image(self):
+        """
+        Decodes the first image target of the snapshot.
+
+        :returns PIL.Image: Image, or None if no image target was read
+        """
+        for target, data in self._data.items():
+            if data is not None and is_image_target(target):
+                image = PilImage.open(BytesIO(data))
+                image.load()
+                return image
+        return None
+
+
+def read_batch(backend, targets, poll_interval=0.005, deadline=None):
+    """
+    Requests every target before waiting for any of them, so that all the
+    transfers are in flight at once.
+
+    :param backend: Backend to read from
+    :param targets: Target names
+    :param poll_interval: Longest time between two event dispatches, in seconds
+    :param deadline: `time.monotonic()` deadline, or None (default: None)
+    :returns list: Payloads, in the order of targets, or `TIMED_OUT`
+    """
+    results = [None] * len(targets)
+    remaining = [len(targets)]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def receiver(i):
+        def receive(data):
+            with lock:
+                results[i] = None if data is None else memoryview(data)
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    done.set()
+        return receive
+
+    if not targets:
+        return results
+    for i, target in enumerate(targets):
+        backend.request_contents(target, receiver(i))
+    while not done.is_set():
+        interval = poll_interval
+        if deadline is not None:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return TIMED_OUT
+            interval = min(interval, left)
+        backend.process_events(interval)
+    return results
@@ -0,0 +1,199 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# targets.py -- clipboard target names and lazy target rendering
+
+import struct
+import threading
+from io import BytesIO
+
+from PIL.Image import Image as PilImageType
+
+TEXT_TARGETS = ['text/plain;charset=utf-8', 'UTF8_STRING', 'text/plain', 'STRING', 'TEXT']
+""" Targets carrying plain text, most specific first
+"""
+
+X11_TEXT_TARGETS = ['UTF8_STRING', 'STRING', 'TEXT']
+""" Legacy X11 text targets that most applications still ask for
+"""
+
+IMAGE_FORMATS = {
+    'image/png': 'PNG',
+    'image/bmp': 'BMP',
+    'image/x-bmp': 'BMP',
+    'image/jpeg': 'JPEG',
+    'image/tiff': 'TIFF',
+    'image/webp': 'WEBP',
+}
+""" Image targets mapped to the Pillow format that encodes them
+"""
+
+
+def is_text_target(target):
+    """
+    :returns bool: True if target carries plain text
+    """
+    return target in TEXT_TARGETS or target.startswith('text/plain')
+
+
+def is_image_target(target):
+    """
+    :returns bool: True if target carries an encoded image
+    """
+    return target.startswith('image/')
+
+
+def encode_image(image, target, **options):
+    """
+    Encodes a Pillow image for an image target.
+
+    :param image: `PIL.Image` to encode
+    :param target: Image target, e.g 'image/png'
+    :param options: Passed on to the Pillow encoder, e.g compress_level or quality
+    :returns bytes: Encoded image
+    :raises RuntimeWarning: If no encoder is known for target
+    """
+    fmt = IMAGE_FORMATS.get(target)
+    if fmt is None:
+        raise RuntimeWarning('No image encoder for target {}'.format(target))
+    if fmt == 'BMP' and ('A' in image.getbands() or 'transparency' in image.info):
+        return _encode_bmp_alpha(image)
+    if fmt in ('JPEG', 'BMP') and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buf = BytesIO()
+    image.save(buf, format=fmt, **options)
+    return buf.getvalue()
+
+
+BMP_FILE_HEADER = struct.Struct('<2sIHHI')
+BMP_V4_HEADER = struct.Struct('<IiiHHIIiiII4I4s36s12s')
+
+
+def _encode_bmp_alpha(image):
+    """
+    Encodes an image with alpha as a 32-bit BMP with a version 4 header,
+    whose alpha mask makes readers keep the alpha channel. Pillow only
+    writes BMPs without it.
+    """
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    # Rows are stored bottom up
+    pixels = image.tobytes('raw', ('BGRA', 0, -1))
+    info = BMP_V4_HEADER.pack(BMP_V4_HEADER.size, image.width, image.height, 1, 32,
+                              3,  # BI_BITFIELDS
+                              len(pixels), 2835, 2835, 0, 0,
+                              0x00ff0000, 0x0000ff00, 0x000000ff, 0xff000000,
+                              b'BGRs',  # LCS_sRGB
+                              b'', b'')
+    offset = BMP_FILE_HEADER.size + len(info)
+    return BMP_FILE_HEADER.pack(b'BM', offset + len(pixels), 0, 0, offset) + info + pixels
+
+
+def render(target, value):
+    """
+    Turns the value offered for a target into the bytes sent to a consumer.
+
+    :param target: Requested target
+    :param value: str, bytes-like, `PIL.Image`, or a callable returning one of those
+    :returns bytes: Payload, or None if value is None
+    :raises RuntimeWarning: If value can't be rendered for target
+    """
+    if callable(value):
+        value = value()
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, PilImageType):
+        return encode_image(value, target)
+    raise RuntimeWarning('Cannot offer {} for target {}'.format(type(value).__name__, target))
+
+
+def expand_text_targets(data):
+    """
+    Adds the legacy X11 text targets to an offer that contains plain text, so
+    that older applications can paste it too.
+
+    :param data: dict of target to value
+    :returns dict: Offer including the X11 text targets
+    """
+    data = dict(data)
+    text = next((target for target in data if is_text_target(target)), None)
+    if text is not None:
+        for target in X11_TEXT_TARGETS:
+            data.setdefault(target, data[text])
+    return data
+
+
+class TargetOffer:
+    """ Set of targets offered by one clipboard ownership
+
+    Values are rendered the first time a consumer asks for their target and
+    then kept, so a callable runs at most once per target.
+    """
+
+    def __init__(self, data):
+        """
+        :param data: dict of target to value or callable, see `render`
+        :raises RuntimeError: If data is empty
+        """
+        if not data:
+            raise RuntimeError('At least one target must be offered')
+        self._values = dict(data)
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    @property
+    def targets(self):
+        """
+        :returns list: Offered target names
+        """
+        return list(self._values)
+
+    def __contains__(self, target):
+        return target in self._values
+
+    def rendered_size(self, target):
+        """
+        :returns int: Size of a target if it is already rendered or given as
+                      bytes, else None
+        """
+        with self._lock:
+            if self._rendered.get(target) is not None:
+                return len(self._rendered[target])
+            value = self._values.get(target)
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                return len(value)
+        return None
+
+    def get(self, target):
+        """
+        Renders a target.
+
+        :param target: Target name
+        :returns bytes: Payload, or None if target isn't offered
+        """
+        with self._lock:
+            if target in self._rendered:
+                return self._rendered[target]
+            if target not in self._values:
+                return None
+            data = render(target, self._values[target])
+            self._rendered[target] = data
+            return data
@@ -0,0 +1,103 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..archive import ClipboardArchive
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image, eval_images
+
+
+class ArchiveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.archive = ClipboardArchive(self.path)
+
+    def tearDown(self):
+        self.archive.close()
+        shutil.rmtree(self.path)
+
+    def blobs(self):
+        return sum(len(files) for _, _, files in os.walk(os.path.join(self.path, 'blobs')))
+
+    def test_text(self):
+        short = self.archive.store('Hello World')
+        long = self.archive.store('Hello World ' * 100)
+        self.assertEqual(short.encoding, 'utf-8')
+        self.assertEqual(long.encoding, 'zlib')
+        self.assertTrue(long.size < 1200)
+        self.assertEqual(self.archive.get_text(short.digest), 'Hello World')
+        self.assertEqual(self.archive.get_text(long.digest), 'Hello World ' * 100)
+        self.assertEqual(bytes(self.archive.get_bytes(short.digest)), b'Hello World')
+
+    def test_dedup(self):
+        image = generate_random_image()
+        first = self.archive.store(image)
+        second = self.archive.store(image.copy())
+        self.assertTrue(first is second)
+        self.assertEqual(second.count, 2)
+        self.assertEqual(len(self.archive), 1)
+        self.assertEqual(self.blobs(), 1)
+        self.assertTrue(eval_images(image, self.archive.get_image(first.digest)))
+
+    def test_persistent_and_shared(self):
+        record = self.archive.store('Hello World')
+        reader = ClipboardArchive(self.path)
+        self.assertEqual(reader.get_text(record.digest), 'Hello World')
+        other = self.archive.store('Second')
+        self.assertTrue(other.digest not in reader)
+        reader.refresh()
+        self.assertEqual([r.digest for r in reader], [other.digest, record.digest])
+        reader.close()
+
+    def test_remove_and_compact(self):
+        keep = self.archive.store('keep')
+        drop = self.archive.store('drop')
+        view = self.archive.get_bytes(drop.digest)
+        self.assertTrue(self.archive.remove(drop.digest))
+        self.assertFalse(self.archive.remove(drop.digest))
+        self.assertEqual(self.blobs(), 2)
+        self.assertEqual(self.archive.compact(), 1)
+        self.assertEqual(self.blobs(), 1)
+        self.assertEqual(bytes(view), b'drop')
+        reopened = ClipboardArchive(self.path)
+        self.assertEqual([r.digest for r in reopened], [keep.digest])
+        with open(os.path.join(self.path, 'index.jsonl')) as fh:
+            self.assertEqual(len(fh.readlines()), 1)
+
+    def test_converted(self):
+        image = generate_random_image().convert('RGB')
+        record = self.archive.store(image)
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            self.assertTrue(self.archive.store(numpy.asarray(image)) is record)
+            self.assertEqual(record.count, 2)
+        with self.assertRaises(RuntimeError):
+            self.archive.store(object())
+
+    def test_compacted_elsewhere(self):
+        record = self.archive.store('gone')
+        other = ClipboardArchive(self.path)
+        other.remove(record.digest)
+        other.compact()
+        other.close()
+        self.assertTrue(record.digest in self.archive)
+        self.assertTrue(self.archive.get_bytes(record.digest) is None)
+        self.assertTrue(self.archive.get_text(record.digest) is None)
+        self.assertFalse(record.digest in self.archive)
+
+    def test_capture(self):
+        clipboard = Clipboard(MemoryBackend)
+        self.assertTrue(self.archive.capture(clipboard) is None)
+        clipboard.set_text('Hello World')
+        record = self.archive.capture(clipboard)
+        self.assertEqual(self.archive.get_text(record.digest), 'Hello World')
+        with self.archive.attach(clipboard):
+            clipboard.set_image(generate_random_image())
+        self.assertEqual(next(iter(self.archive)).kind, 'image')
@@ -0,0 +1,82 @@
+
+import time
+import asyncio
+import unittest
+from ..clipboard import AsyncClipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image, eval_images
+
+
+class DeferredBackend(MemoryBackend):
+    """ Memory backend that answers requests from process_events, like Gtk
+    """
+    notifies_in_background = False
+
+    def __init__(self):
+        super().__init__()
+        self.queued = []
+        self.dispatches = 0
+
+    def request_text(self, callback):
+        self.queued.append(lambda: callback(self.get_text()))
+
+    def request_image(self, callback):
+        self.queued.append(lambda: callback(self.get_image()))
+
+    def process_events(self, timeout=0):
+        self.dispatches += 1
+        queued, self.queued = self.queued, []
+        for func in queued:
+            func()
+
+
+class AsyncClipboardTestCase(unittest.TestCase):
+
+    def test_immediate_backend(self):
+        async def run():
+            clipboard = AsyncClipboard(MemoryBackend)
+            await clipboard.set_text('Hello World')
+            return await clipboard.get_text()
+
+        self.assertEqual(asyncio.run(run()), 'Hello World')
+
+    def test_concurrent_requests(self):
+        async def run():
+            clipboard = AsyncClipboard(DeferredBackend)
+            await clipboard.set_text('Hello World')
+            texts = await asyncio.gather(*[clipboard.get_text() for _ in range(20)])
+            return clipboard, texts
+
+        clipboard, texts = asyncio.run(run())
+        self.assertEqual(texts, ['Hello World'] * 20)
+        # All of the requests were answered by a single dispatch
+        self.assertEqual(clipboard.backend.dispatches, 1)
+
+    def test_backoff(self):
+        class SlowBackend(DeferredBackend):
+            def process_events(self, timeout=0):
+                if time.monotonic() >= self.ready:
+                    super().process_events(timeout)
+                else:
+                    self.dispatches += 1
+
+        async def run():
+            clipboard = AsyncClipboard(SlowBackend)
+            await clipboard.set_text('Hello World')
+            clipboard.backend.ready = time.monotonic() + 0.3
+            return clipboard, await clipboard.get_text()
+
+        clipboard, text = asyncio.run(run())
+        self.assertEqual(text, 'Hello World')
+        # A fixed 5 ms pump would have dispatched about 60 times
+        self.assertTrue(clipboard.backend.dispatches < 20)
+
+    def test_image(self):
+        test_image = generate_random_image()
+
+        async def run():
+            clipboard = AsyncClipboard(DeferredBackend)
+            await clipboard.set_image(test_image)
+            return await clipboard.get_image()
+
+        self.assertTrue(eval_images(test_image, asyncio.run(run())))
@@ -0,0 +1,168 @@
+
+import os
+import socket
+import shutil
+import tempfile
+import time
+import threading
+import unittest
+from unittest import mock
+
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .. import broker
+from ..broker import BrokerServer, BrokerBackend
+from .clipboard_test import generate_random_image, eval_images
+
+
+@unittest.skipIf(not hasattr(socket, 'AF_UNIX'), 'Needs Unix domain sockets')
+class BrokerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'crossclip.sock')
+        self.server = BrokerServer(self.path, MemoryBackend)
+        self.server.bind()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.env = mock.patch.dict(os.environ, {broker.SOCKET_VARIABLE: self.path})
+        self.env.start()
+        self.clipboard = Clipboard(BrokerBackend)
+
+    def tearDown(self):
+        self.clipboard.backend.close()
+        self.env.stop()
+        self.server.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.dir)
+
+    def test_text(self):
+        self.assertTrue(self.clipboard.get_text() is None)
+        self.clipboard.set_text('Hello World')
+        self.assertEqual(self.clipboard.get_text(), 'Hello World')
+        self.assertEqual(self.server.backend.get_text(), 'Hello World')
+        self.assertIn('text/plain', self.clipboard.available_targets())
+        self.assertTrue(self.clipboard.backend.owns_clipboard())
+
+    def test_image(self):
+        image = generate_random_image()
+        self.clipboard.set_image(image)
+        self.assertTrue(eval_images(image, self.clipboard.get_image()))
+        self.assertTrue(eval_images(image.convert('RGB'), self.server.backend.get_image()))
+
+    def test_large_payload(self):
+        text = 'x' * (broker.ZERO_COPY_THRESHOLD * 4)
+        self.clipboard.set_text(text)
+        self.assertEqual(self.clipboard.get_text(), text)
+        self.assertEqual(bytes(self.clipboard.get_bytes('text/plain')), text.encode('utf-8'))
+
+    def test_inline_fallback(self):
+        with mock.patch.object(broker, 'HAVE_MEMFD', False):
+            text = 'y' * (broker.ZERO_COPY_THRESHOLD * 2)
+            self.clipboard.set_text(text)
+            self.assertEqual(self.clipboard.get_text(), text)
+
+    def test_set_data(self):
+        self.clipboard.set_data({'text/html': '<b>Hi</b>', 'application/x-test': b'\0\1'})
+        self.assertEqual(bytes(self.clipboard.get_bytes('text/html')), b'<b>Hi</b>')
+        self.assertEqual(bytes(self.clipboard.get_bytes('application/x-test')), b'\0\1')
+        self.assertTrue(self.clipboard.get_bytes('image/png') is None)
+
+    def test_watch(self):
+        changed = threading.Event()
+        received = []
+
+        def on_change(change):
+            received.append(change)
+            changed.set()
+
+        self.clipboard.backend.add_change_listener(on_change)
+        self.server.backend.set_text('From elsewhere')
+        self.assertTrue(changed.wait(5))
+        self.assertIn('text/plain', received[0].targets)
+
+    def test_errors(self):
+        with self.assertRaises(RuntimeError):
+            BrokerBackend(os.path.join(self.dir, 'missing.sock'))
+        with self.assertRaises(RuntimeWarning):
+            self.clipboard.backend.set_image(object())
+
+    def test_bind(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        # A live broker's socket is left alone
+        with self.assertRaises(RuntimeError):
+            BrokerServer(self.path, MemoryBackend).bind()
+        backend = BrokerBackend()
+        self.addCleanup(backend.close)
+        self.assertTrue(backend.owns_clipboard() is not None)
+
+        other = os.path.join(self.dir, 'other.sock')
+        with open(other, 'w'):
+            pass
+        with self.assertRaises(RuntimeError):
+            BrokerServer(other, MemoryBackend).bind()
+        self.assertTrue(os.path.isfile(other))
+
+        # A stale socket is replaced
+        os.unlink(other)
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(other)
+        stale.close()
+        server = BrokerServer(other, MemoryBackend)
+        server.bind()
+        server._listener.close()
+        os.unlink(other)
+
+    def _raw_client(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.settimeout(5)
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_malformed(self):
+        with self.assertRaises(RuntimeError):
+            self.clipboard.backend._request(broker.SET_IMAGE, b'abc')
+        sock = self._raw_client()
+        # A frame claiming a memory file that wasn't passed
+        sock.sendall(broker.HEADER.pack(broker.SET_TEXT, broker.FLAG_FD, 10))
+        self.assertEqual(broker.recv_frame(sock), (None, None))
+        backend = BrokerBackend()
+        self.addCleanup(backend.close)
+        backend.set_text('Still serving')
+        self.assertEqual(backend.get_text(), 'Still serving')
+
+    def test_stalled_client(self):
+        sock = self._raw_client()
+        sock.sendall(broker.HEADER.pack(broker.SET_TEXT, 0, 100) + b'partial')
+        self.clipboard.set_text('Not blocked')
+        self.assertEqual(self.clipboard.get_text(), 'Not blocked')
+        sock.sendall(b'x' * 93)
+        self.assertEqual(broker.recv_frame(sock)[0], broker.OK)
+        self.assertEqual(self.server.backend.get_text(), 'partial' + 'x' * 93)
+
+
+    def test_slow_reader(self):
+        text = 'z' * (4 * 1024 * 1024)
+        self.server.backend.set_text(text)
+        with mock.patch.object(broker, 'HAVE_MEMFD', False):
+            sock = self._raw_client()
+            sock.sendall(broker.HEADER.pack(broker.GET_TEXT, 0, 0))
+            deadline = time.monotonic() + 5
+            while not any(key.data is not None and key.data.outbox
+                          for key in list(self.server._selector.get_map().values())):
+                self.assertTrue(time.monotonic() < deadline)
+                time.sleep(0.001)
+            # The reply waits in the server while other clients are served
+            self.assertEqual(self.clipboard.backend.available_targets()[:1], ['UTF8_STRING'])
+            op, payload = broker.recv_frame(sock)
+            self.assertEqual((op, len(payload)), (broker.OK, len(text)))
+
+            # Falling too far behind gets a client dropped
+            self.server.backend.set_text(text)
+            self.server.max_backlog = 1024 * 1024
+            sock.sendall(broker.HEADER.pack(broker.GET_TEXT, 0, 0))
+            self.assertEqual(broker.recv_frame(sock), (None, None))
+
+if __name__ == '__main__':
+    unittest.main()
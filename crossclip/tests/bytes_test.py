@@ -0,0 +1,35 @@
+
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image
+
+
+class BytesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_get_bytes(self):
+        self.clipboard.set_data({'text/html': '<b>Hello</b>', 'application/octet-stream': b'\0\1\2'})
+        html = self.clipboard.get_bytes('text/html')
+        self.assertTrue(isinstance(html, memoryview))
+        self.assertEqual(html.tobytes(), b'<b>Hello</b>')
+        self.assertEqual(bytes(self.clipboard.get_bytes('application/octet-stream')), b'\0\1\2')
+        self.assertTrue(self.clipboard.get_bytes('image/png') is None)
+
+    def test_text_target(self):
+        self.clipboard.set_text('Hello World')
+        self.assertEqual(bytes(self.clipboard.get_bytes('text/plain')), b'Hello World')
+
+    def test_iter_bytes(self):
+        payload = bytes(range(256)) * 1000
+        self.clipboard.set_data({'application/octet-stream': payload})
+        chunks = list(self.clipboard.iter_bytes('application/octet-stream', chunk_size=4096))
+        self.assertTrue(all(len(chunk) <= 4096 for chunk in chunks))
+        self.assertEqual(b''.join(chunks), payload)
+        self.assertEqual(list(self.clipboard.iter_bytes('text/html')), [])
+
+    def test_image_png(self):
+        self.clipboard.set_image(generate_random_image())
+        self.assertTrue(bytes(self.clipboard.get_bytes('image/png')).startswith(b'\x89PNG'))
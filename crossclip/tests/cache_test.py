@@ -0,0 +1,85 @@
+
+import unittest
+from ..cache import ReadCache, MISS, payload_size
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image, eval_images
+
+
+class CountingBackend(MemoryBackend):
+    """ Memory backend that counts reads
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_text(self):
+        self.reads += 1
+        return super().get_text()
+
+    def get_image(self, format='pil', converter=None):
+        self.reads += 1
+        return super().get_image(format, converter)
+
+
+class ReadCacheTestCase(unittest.TestCase):
+
+    def test_generation(self):
+        cache = ReadCache()
+        cache.put('a', 'value', 1)
+        self.assertEqual(cache.get('a', 1), 'value')
+        self.assertTrue(cache.get('a', 2) is MISS)
+        self.assertEqual(len(cache), 0)
+
+    def test_budget(self):
+        cache = ReadCache(budget=100)
+        cache.put('a', b'x' * 60, 0)
+        cache.put('b', b'x' * 30, 0)
+        # Touch 'a' so that 'b' is the least recently used
+        cache.get('a', 0)
+        cache.put('c', b'x' * 30, 0)
+        self.assertTrue(cache.get('b', 0) is MISS)
+        self.assertEqual(cache.size, 90)
+
+        cache.put('huge', b'x' * 101, 0)
+        self.assertTrue(cache.get('huge', 0) is MISS)
+
+    def test_image_size(self):
+        self.assertEqual(payload_size(generate_random_image()), 100 * 100 * 3)
+
+
+class ClipboardCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(CountingBackend, cache=True)
+
+    def test_text(self):
+        self.clipboard.set_text('Hello World')
+        for _ in range(3):
+            self.assertEqual(self.clipboard.get_text(), 'Hello World')
+        self.assertEqual(self.clipboard.backend.reads, 1)
+
+        # A change made behind the frontend's back invalidates the cache
+        self.clipboard.backend.set_text('Changed')
+        self.assertEqual(self.clipboard.get_text(), 'Changed')
+        self.assertEqual(self.clipboard.backend.reads, 2)
+
+    def test_image(self):
+        self.clipboard.set_image(generate_random_image())
+        first = self.clipboard.get_image()
+        second = self.clipboard.get_image()
+        self.assertTrue(second is not first)
+        self.assertTrue(eval_images(first, second))
+        self.assertEqual(self.clipboard.backend.reads, 1)
+        self.assertEqual(self.clipboard.cache.hits, 1)
+
+        # One caller drawing on its image doesn't change what others read
+        first.paste((0, 0, 0), (0, 0) + first.size)
+        self.assertTrue(eval_images(second, self.clipboard.get_image()))
+
+    def test_disabled(self):
+        clipboard = Clipboard(CountingBackend)
+        clipboard.get_text()
+        clipboard.get_text()
+        self.assertEqual(clipboard.backend.reads, 2)
@@ -7,8 +7,9 @@ from PIL import Image as PilImage
 from PIL import ImageChops as PilImageChops
 import numpy
 
-def generate_random_image(image_format='RGB'):
-    imarray = numpy.random.rand(100, 100, 3) * 255
+def generate_random_image(image_format='RGB', size=(100, 100)):
+    width, height = size
+    imarray = numpy.random.rand(height, width, 3) * 255
     # TODO: for now, clipboard does not support RGBA. This will need some
     # work
     test_image = PilImage.fromarray(imarray.astype('uint8')).convert(image_format)
@@ -0,0 +1,115 @@
+
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ..clipboard import Clipboard
+from .. import cmdbackend
+from ..cmdbackend import CommandBackend, find_tool
+from .. import registry as registry_module
+from ..timeouts import TIMED_OUT
+from .clipboard_test import generate_random_image, eval_images
+
+# Stand-in for xclip keeping the clipboard in files next to it
+STUB_XCLIP = '''#!/bin/sh
+dir=$(dirname "$0")
+for arg; do target=$arg; done
+case "$*" in
+    *-in*)
+        cat > "$dir/data"
+        printf '%s\\n' "$target" > "$dir/target" ;;
+    *TARGETS*)
+        [ -f "$dir/target" ] || exit 1
+        cat "$dir/target" ;;
+    *)
+        [ -f "$dir/hang" ] && exec sleep 60
+        [ -f "$dir/target" ] && [ "$(cat "$dir/target")" = "$target" ] || exit 1
+        cat "$dir/data" ;;
+esac
+'''
+
+
+@unittest.skipIf(shutil.which('sh') is None, 'Needs a POSIX shell')
+class CommandBackendTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.bin = tempfile.mkdtemp()
+        path = os.path.join(self.bin, 'xclip')
+        with open(path, 'w') as fh:
+            fh.write(STUB_XCLIP)
+        os.chmod(path, stat.S_IRWXU)
+        self.env = mock.patch.dict(os.environ, {'PATH': os.pathsep.join([self.bin, os.defpath]), 'DISPLAY': ':99'})
+        self.env.start()
+        os.environ.pop('WAYLAND_DISPLAY', None)
+        self.backend = CommandBackend()
+
+    def tearDown(self):
+        self.backend.close()
+        self.env.stop()
+        shutil.rmtree(self.bin)
+
+    def test_tool(self):
+        self.assertEqual(self.backend.tool, 'xclip')
+        self.assertEqual(find_tool(environ={'PATH': self.bin}), None)
+
+    def test_text(self):
+        self.assertTrue(self.backend.get_text() is None)
+        self.backend.set_text('Hello World')
+        self.assertEqual(self.backend.get_text(), 'Hello World')
+        self.assertEqual(self.backend.available_targets(), ['UTF8_STRING'])
+        self.backend.set_text('Second write')
+        self.assertEqual(self.backend.get_text(), 'Second write')
+
+    def test_text_only_tool(self):
+        path = os.path.join(self.bin, 'xsel')
+        with open(path, 'w') as fh:
+            fh.write('#!/bin/sh\ncat > "$(dirname "$0")/data"\n')
+        os.chmod(path, stat.S_IRWXU)
+        backend = CommandBackend('xsel')
+        try:
+            with self.assertRaises(NotImplementedError):
+                backend.set_data({'image/png': b'\x89PNG'})
+            self.assertFalse(os.path.exists(os.path.join(self.bin, 'data')))
+            backend.set_data({'text/plain': 'Hello'})
+            with open(os.path.join(self.bin, 'data'), 'rb') as fh:
+                self.assertEqual(fh.read(), b'Hello')
+        finally:
+            backend.close()
+
+    def test_image(self):
+        image = generate_random_image()
+        clipboard = Clipboard(CommandBackend)
+        clipboard.set_image(image)
+        self.assertTrue(clipboard.has_image())
+        self.assertTrue(eval_images(image, clipboard.get_image()))
+        clipboard.backend.close()
+
+    def test_stream(self):
+        payload = os.urandom(256 * 1024)
+        self.backend.set_contents('application/octet-stream', [payload[:1000], payload[1000:]])
+        chunks = list(self.backend.iter_contents('application/octet-stream', 4096))
+        self.assertTrue(all(len(chunk) <= 4096 for chunk in chunks))
+        self.assertEqual(b''.join(chunks), payload)
+
+    def test_timeout_kills_tool(self):
+        started = []
+        start_tool = cmdbackend._start_tool
+
+        def tracked(*args):
+            started.append(start_tool(*args))
+            return started[-1]
+
+        open(os.path.join(self.bin, 'hang'), 'w').close()
+        clipboard = Clipboard(backend=self.backend)
+        with mock.patch.object(cmdbackend, '_start_tool', tracked):
+            self.assertTrue(clipboard.get_text(timeout=0.2) is TIMED_OUT)
+        self.assertEqual(len(started), 1)
+        self.assertNotEqual(started[0].wait(5), 0)
+
+    def test_probe(self):
+        with mock.patch.dict(os.environ, {'XDG_CURRENT_DESKTOP': ''}):
+            with mock.patch.object(registry_module, '_is_xfce4', return_value=False):
+                self.assertEqual(registry_module.probe_platform(), 'cmd')
@@ -0,0 +1,94 @@
+
+import unittest
+from ..memorybackend import MemoryBackend
+from ..connections import ConnectionPool, PooledClipboard
+
+
+class DisplayBackend(MemoryBackend):
+    """ Memory backend pretending to connect to a display
+    """
+    created = 0
+
+    def __init__(self, display=None):
+        super().__init__()
+        DisplayBackend.created += 1
+        self.display = display
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        DisplayBackend.created = 0
+        self.pool = ConnectionPool(idle_timeout=60)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_shared(self):
+        first = self.pool.clipboard(DisplayBackend)
+        second = self.pool.clipboard(DisplayBackend)
+        self.assertIsInstance(first, PooledClipboard)
+        self.assertIs(first.backend, second.backend)
+        self.assertEqual(DisplayBackend.created, 1)
+        first.set_text('Shared')
+        self.assertEqual(second.get_text(), 'Shared')
+        self.assertEqual(self.pool.connections()[0].refs, 2)
+
+    def test_deduplicate(self):
+        first = self.pool.clipboard(DisplayBackend)
+        second = self.pool.clipboard(DisplayBackend)
+        first.set_text('x')
+        second.set_text('y')
+        first.set_text('x')
+        self.assertEqual(second.get_text(), 'x')
+        # Repeating a write nobody replaced is still skipped
+        count = first.backend.change_count
+        first.set_text('x')
+        self.assertEqual(first.backend.change_count, count)
+
+    def test_displays(self):
+        with self.pool.clipboard(DisplayBackend, ':1') as one, self.pool.clipboard(DisplayBackend, ':2') as two:
+            self.assertIsNot(one.backend, two.backend)
+            self.assertEqual(one.backend.display, ':1')
+            one.set_text('One')
+            self.assertTrue(two.get_text() is None)
+        self.assertEqual(len(self.pool), 2)
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire(MemoryBackend, ':1')
+
+    def test_idle_teardown(self):
+        clipboard = self.pool.clipboard(DisplayBackend)
+        backend = clipboard.backend
+        clipboard.close()
+        clipboard.close()
+        self.assertEqual(self.pool.connections()[0].refs, 0)
+        self.assertEqual(self.pool.reap(), 0)
+        self.assertFalse(backend.closed)
+
+        # Reused while idle
+        self.assertIs(self.pool.acquire(DisplayBackend), backend)
+        self.pool.release(backend)
+        idle_since = self.pool.connections()[0].idle_since
+        self.assertEqual(self.pool.reap(idle_since + 60), 1)
+        self.assertTrue(backend.closed)
+        self.assertEqual(len(self.pool), 0)
+        with self.assertRaises(RuntimeError):
+            self.pool.release(backend)
+
+        self.assertIsNot(self.pool.acquire(DisplayBackend), backend)
+        self.assertEqual(DisplayBackend.created, 2)
+
+    def test_immediate_teardown(self):
+        pool = ConnectionPool(idle_timeout=0)
+        with pool.clipboard(DisplayBackend) as clipboard:
+            backend = clipboard.backend
+        self.assertTrue(backend.closed)
+        self.assertEqual(len(pool), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+
+import unittest
+from ..absbackend import AbstractImageConverter, Conversion
+from ..converters import ConversionGraph
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image, eval_images
+
+
+class Boxed:
+    """ Fake native image wrapping a Pillow image and a conversion trail
+    """
+
+    def __init__(self, pil, trail):
+        self.pil = pil
+        self.trail = trail
+
+
+class BoxA(Boxed):
+    pass
+
+
+class BoxB(Boxed):
+    pass
+
+
+class BoxConverter(AbstractImageConverter):
+    box_type = None
+    name = None
+
+    @property
+    def image_type(self):
+        return self.box_type
+
+    @property
+    def image_str(self):
+        return self.name
+
+    def to_pillow(self, box):
+        return box.pil
+
+    def from_pillow(self, pil):
+        return self.box_type(pil, ['pil'])
+
+
+class AConverter(BoxConverter):
+    box_type = BoxA
+    name = 'a'
+
+
+class BConverter(BoxConverter):
+    box_type = BoxB
+    name = 'b'
+
+    def conversions(self):
+        return super().conversions() + [
+            Conversion('a', 'b', 5, lambda box: BoxB(box.pil, box.trail + ['a->b'])),
+        ]
+
+
+class ConversionGraphTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = ConversionGraph()
+        self.graph.register(AConverter())
+        self.image = generate_random_image()
+
+    def test_pil_hub(self):
+        steps = self.graph.path('a', 'pil')
+        self.assertEqual([(c.source, c.target) for c in steps], [('a', 'pil')])
+        self.assertTrue(self.graph.path('a', 'b') is None)
+
+    def test_direct_path(self):
+        self.graph.register(BConverter())
+        steps = self.graph.path('a', 'b')
+        self.assertEqual([(c.source, c.target) for c in steps], [('a', 'b')])
+
+        converted = self.graph.convert(BoxA(self.image, ['a']), 'b')
+        self.assertTrue(isinstance(converted, BoxB))
+        self.assertEqual(converted.trail, ['a', 'a->b'])
+
+        # No direct edge back, so Pillow is used as the hub
+        steps = self.graph.path('b', 'a')
+        self.assertEqual([(c.source, c.target) for c in steps], [('b', 'pil'), ('pil', 'a')])
+
+    def test_cheaper_path_wins(self):
+        self.graph.add_conversion(Conversion('a', 'b', 50, lambda box: None))
+        self.graph.add_conversion(Conversion('pil', 'b', 1, lambda pil: BoxB(pil, ['cheap'])))
+        steps = self.graph.path('a', 'b')
+        self.assertEqual([(c.source, c.target) for c in steps], [('a', 'pil'), ('pil', 'b')])
+
+    def test_unknown(self):
+        with self.assertRaises(RuntimeWarning):
+            self.graph.convert(object(), 'pil')
+        with self.assertRaises(RuntimeWarning):
+            self.graph.convert(self.image, 'nothing')
+
+    def test_identify(self):
+        self.assertEqual(self.graph.identify(self.image), 'pil')
+        self.assertEqual(self.graph.identify(BoxA(self.image, [])), 'a')
+        self.assertTrue(self.graph.identify(object()) is None)
+
+    def test_replace(self):
+        self.graph.register(BConverter())
+        self.assertEqual(len(self.graph.path('a', 'b')), 1)
+
+        class PlainBConverter(BConverter):
+            def conversions(self):
+                return BoxConverter.conversions(self)
+
+        # The replaced converter's direct edge goes with it
+        self.graph.register(PlainBConverter())
+        steps = self.graph.path('a', 'b')
+        self.assertEqual([(c.source, c.target) for c in steps], [('a', 'pil'), ('pil', 'b')])
+
+    def test_layered(self):
+        child = ConversionGraph(self.graph)
+        self.assertEqual(child.identify(BoxA(self.image, [])), 'a')
+        self.assertTrue(child.path('a', 'b') is None)
+
+        # Registrations with the parent are seen by the child...
+        self.graph.register(BConverter())
+        self.assertEqual(len(child.path('a', 'b')), 1)
+
+        # ...but not the other way around
+        child.add_conversion(Conversion('b', 'a', 1, lambda box: BoxA(box.pil, ['b->a'])))
+        self.assertEqual(len(child.path('b', 'a')), 1)
+        self.assertEqual(len(self.graph.path('b', 'a')), 2)
+
+        single = self.graph.layered(BConverter(), AConverter())
+        self.assertEqual(single.identify(BoxB(self.image, [])), 'b')
+        self.assertTrue(ConversionGraph().layered(AConverter()).parent.converter('a') is None)
+
+
+class ClipboardConversionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+        self.clipboard.converters = ConversionGraph()
+        self.image = generate_random_image()
+
+    def test_foreign_converter(self):
+        self.clipboard.set_image(BoxA(self.image, []), converter=AConverter())
+        box = self.clipboard.get_image(converter=AConverter())
+        self.assertTrue(isinstance(box, BoxA))
+        self.assertTrue(eval_images(self.image, box.pil))
+
+        # Once registered, the form can be requested by name
+        self.assertTrue(isinstance(self.clipboard.get_image('a'), BoxA))
+
+    def test_private_converters(self):
+        clipboard = Clipboard(MemoryBackend)
+        clipboard.set_image(self.image)
+        self.assertTrue(isinstance(clipboard.get_image(converter=AConverter()), BoxA))
+        other = Clipboard(MemoryBackend)
+        other.set_image(self.image)
+        self.assertTrue(other.converters.converter('a') is None)
+        with self.assertRaises(RuntimeWarning):
+            other.get_image('a')
@@ -0,0 +1,143 @@
+
+import unittest
+from PIL import Image as PilImage
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..encoding import ImageEncoding, FAST_DECODE_ORDER
+from ..targets import encode_image
+from .clipboard_test import generate_random_image, eval_images
+
+
+class RecordingBackend(MemoryBackend):
+    """ Memory backend remembering which targets were read
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.read = []
+
+    def get_contents(self, target):
+        self.read.append(target)
+        return super().get_contents(target)
+
+
+class SingleTargetBackend(MemoryBackend):
+    """ Memory backend owning the clipboard with one target at a time, like the cmd backend
+    """
+
+    def set_data(self, data):
+        if len(data) != 1:
+            raise NotImplementedError('One target at a time')
+        super().set_data(data)
+
+
+class ImageEncodingTestCase(unittest.TestCase):
+
+    def test_invalid(self):
+        for kwargs in (dict(formats=[]), dict(formats=['gif']), dict(formats=['raw', 'png']),
+                       dict(compress_level=10), dict(quality=0)):
+            with self.assertRaises(RuntimeError):
+                ImageEncoding(**kwargs)
+
+    def test_choose(self):
+        encoding = ImageEncoding()
+        # Other toolkits' BMPs may have lost their alpha
+        self.assertEqual(encoding.choose(['image/png', 'image/bmp', 'text/plain']), 'image/png')
+        self.assertEqual(encoding.choose(['image/bmp', 'image/jpeg']), 'image/bmp')
+        self.assertEqual(ImageEncoding(read_order=FAST_DECODE_ORDER).choose(['image/png', 'image/bmp']),
+                         'image/bmp')
+        self.assertEqual(encoding.choose(['image/jpeg', 'image/png']), 'image/png')
+        self.assertEqual(encoding.choose(['image/webp', 'image/jpeg']), 'image/jpeg')
+        self.assertTrue(encoding.choose(['text/plain']) is None)
+        self.assertEqual(ImageEncoding(read_order=['image/webp', 'image/png'], prefer_lossless=False)
+                         .choose(['image/png', 'image/webp']), 'image/webp')
+        self.assertTrue(ImageEncoding(read_order=None).choose(['image/png']) is None)
+
+    def test_settings(self):
+        image = generate_random_image()
+        low = ImageEncoding('jpeg', quality=10).encode(image, 'image/jpeg')
+        high = ImageEncoding('jpeg', quality=95).encode(image, 'image/jpeg')
+        self.assertTrue(len(low) < len(high))
+        flat = PilImage.new('RGB', (100, 100), (200, 100, 50))
+        stored = ImageEncoding('png', compress_level=0).encode(flat, 'image/png')
+        self.assertTrue(len(stored) > len(encode_image(flat, 'image/png')))
+
+
+class EncodedClipboardTestCase(unittest.TestCase):
+
+    def test_write(self):
+        clipboard = Clipboard(RecordingBackend,
+                              image_encoding=ImageEncoding(['bmp', 'png'], read_order=FAST_DECODE_ORDER))
+        image = generate_random_image()
+        clipboard.set_image(image)
+        self.assertEqual(clipboard.available_targets(), ['image/bmp', 'image/png'])
+        # Nothing is encoded until a consumer asks
+        self.assertTrue(clipboard.size_hint('image/png') is None)
+        self.assertTrue(eval_images(clipboard.get_image(), image))
+        self.assertEqual(clipboard.backend.read, ['image/bmp'])
+        self.assertTrue(clipboard.size_hint('image/png') is None)
+
+    def test_alpha(self):
+        clipboard = Clipboard(RecordingBackend,
+                              image_encoding=ImageEncoding(['bmp', 'png'], read_order=FAST_DECODE_ORDER))
+        image = generate_random_image('RGBA')
+        image.putalpha(PilImage.linear_gradient('L').resize(image.size))
+        clipboard.set_image(image)
+        pasted = clipboard.get_image()
+        self.assertEqual(clipboard.backend.read, ['image/bmp'])
+        self.assertEqual(pasted.mode, 'RGBA')
+        self.assertEqual(pasted.tobytes(), image.tobytes())
+
+    def test_offer_copy(self):
+        clipboard = Clipboard(RecordingBackend, image_encoding='png')
+        image = PilImage.new('RGB', (10, 10), (255, 0, 0))
+        clipboard.set_image(image)
+        image.paste((0, 0, 255), (0, 0, 10, 10))
+        self.assertEqual(clipboard.get_image().getpixel((0, 0)), (255, 0, 0))
+
+    def test_negotiate(self):
+        clipboard = Clipboard(RecordingBackend, image_encoding=ImageEncoding())
+        image = generate_random_image()
+        clipboard.set_data({'image/png': encode_image(image, 'image/png'),
+                            'image/jpeg': encode_image(image, 'image/jpeg'),
+                            'image/bmp': encode_image(image, 'image/bmp')})
+        self.assertTrue(eval_images(clipboard.get_image(), image))
+        self.assertEqual(clipboard.backend.read, ['image/png'])
+        self.assertEqual(clipboard.get_image('numpy').shape, (100, 100, 3))
+
+        clipboard.set_text('No image')
+        self.assertTrue(clipboard.get_image() is None)
+
+    def test_undecodable(self):
+        image = generate_random_image()
+
+        class BrokenPngBackend(RecordingBackend):
+            def get_contents(self, target):
+                super().get_contents(target)
+                return b'not a png'
+
+            def get_image(self, form='pil', converter=None):
+                return image
+
+        clipboard = Clipboard(BrokenPngBackend, image_encoding=ImageEncoding())
+        clipboard.set_data({'image/png': b'not a png'})
+        # The toolkit's own read is tried when the chosen target doesn't decode
+        self.assertTrue(eval_images(clipboard.get_image(), image))
+        self.assertEqual(clipboard.backend.read, ['image/png'])
+
+    def test_raw(self):
+        clipboard = Clipboard(RecordingBackend, image_encoding='raw')
+        image = generate_random_image()
+        clipboard.set_image(image)
+        self.assertIs(clipboard.backend.get_image(), image)
+
+    def test_single_target(self):
+        clipboard = Clipboard(SingleTargetBackend, image_encoding=['png', 'bmp'])
+        image = generate_random_image()
+        clipboard.set_image(image)
+        self.assertEqual(clipboard.available_targets(), ['image/png'])
+        self.assertTrue(eval_images(clipboard.get_image(), image))
+
+
+if __name__ == '__main__':
+    unittest.main()
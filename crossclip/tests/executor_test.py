@@ -0,0 +1,135 @@
+
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..executor import BackendExecutor, DispatchedBackend
+
+
+class ThreadCheckingBackend(MemoryBackend):
+    """ Records the threads its clipboard methods run on
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get_text(self):
+        self.threads.add(threading.current_thread())
+        return super().get_text()
+
+    def set_text(self, text):
+        self.threads.add(threading.current_thread())
+        super().set_text(text)
+
+
+class ExecutorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = BackendExecutor(ThreadCheckingBackend)
+        self.clipboard = Clipboard(backend=self.executor.proxy())
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_workers(self):
+        def work(i):
+            self.clipboard.set_text('Worker {}'.format(i))
+            return self.clipboard.get_text()
+
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(work, range(200)))
+        self.assertTrue(all(result.startswith('Worker ') for result in results))
+        self.assertEqual(self.executor.backend.threads, {self.executor._thread})
+        self.assertIsInstance(self.clipboard.backend, DispatchedBackend)
+
+    def test_futures(self):
+        self.executor.submit('set_text', 'Hello').result()
+        self.assertEqual(self.executor.submit('get_text').result(), 'Hello')
+        self.assertEqual(self.executor.request('request_text').result(), 'Hello')
+        self.assertEqual(bytes(self.executor.request('request_contents', 'text/plain').result()), b'Hello')
+        self.assertTrue(self.executor.submit(lambda backend: backend.owns_clipboard()).result())
+        with self.assertRaises(RuntimeWarning):
+            self.executor.submit('set_image', object()).result()
+
+    def test_shared_writes(self):
+        other = Clipboard(backend=self.executor.proxy())
+        self.clipboard.set_text('x')
+        other.set_text('y')
+        self.clipboard.set_text('x')
+        self.assertEqual(other.get_text(), 'x')
+
+    def test_changes(self):
+        changed = threading.Event()
+        self.clipboard.watch(lambda change: changed.set())
+        self.executor.submit('set_text', 'Changed').result()
+        self.assertTrue(changed.wait(5))
+        self.assertEqual(self.clipboard.backend.change_count, 1)
+
+    def test_disconnect(self):
+        listeners = lambda: self.executor.backend.__dict__.get('_change_listeners', [])
+        proxy = self.executor.proxy()
+        handle = proxy.add_change_listener(lambda change: None)
+        self.assertEqual(len(listeners()), 1)
+        proxy.remove_change_listener(handle)
+        self.assertEqual(listeners(), [])
+
+        proxy.add_change_listener(lambda change: None)
+        self.assertEqual(len(listeners()), 1)
+        proxy.close()
+        self.assertEqual(listeners(), [])
+
+        proxy.add_change_listener(lambda change: None)
+        backend = self.executor.backend
+        self.executor.shutdown()
+        self.assertEqual(backend.__dict__.get('_change_listeners'), [])
+
+    def test_bounded_queue(self):
+        release = threading.Event()
+        executor = BackendExecutor(MemoryBackend, max_pending=1)
+        try:
+            blocker = executor.submit(lambda backend: release.wait())
+            # Wait for the blocking call to leave the queue
+            while not blocker.running():
+                pass
+            queued = executor.submit('get_text')
+            with self.assertRaises(RuntimeError):
+                executor.submit('get_text', timeout=0.01)
+            release.set()
+            self.assertTrue(queued.result() is None)
+        finally:
+            release.set()
+            executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            executor.submit('get_text')
+
+    def test_idle(self):
+        self.executor.submit('set_text', 'Hello').result()
+        polls = []
+        process_events = self.executor.backend.process_events
+
+        def counting(timeout=0):
+            polls.append(timeout)
+            process_events(timeout)
+
+        self.executor.backend.process_events = counting
+        time.sleep(0.2)
+        # An idle thread sleeps in the backend until a call wakes it
+        self.assertTrue(len(polls) <= 1)
+        self.assertEqual(self.executor.submit('get_text').result(), 'Hello')
+
+    def test_creation_error(self):
+        class BrokenBackend(MemoryBackend):
+            def __init__(self):
+                raise OSError('No display')
+
+        with self.assertRaises(RuntimeError):
+            BackendExecutor(BrokenBackend)
+        with self.assertRaises(RuntimeError):
+            Clipboard(backend=object())
+
+
+if __name__ == '__main__':
+    unittest.main()
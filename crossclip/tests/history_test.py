@@ -0,0 +1,64 @@
+
+import unittest
+
+from ..clipboard import Clipboard
+from ..hashing import content_digest
+from ..history import ClipboardHistory
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image
+
+
+class HistoryTestCase(unittest.TestCase):
+
+    def test_order_and_dedup(self):
+        history = ClipboardHistory()
+        history.add('first')
+        history.add('second')
+        history.add('first')
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history.latest().value, 'first')
+        self.assertEqual(history.latest().seen, 2)
+        self.assertEqual([entry.value for entry in history], ['first', 'second'])
+        self.assertEqual(history[1].value, 'second')
+        self.assertIn(content_digest('second'), history)
+        with self.assertRaises(IndexError):
+            history[2]
+
+    def test_entry_limit(self):
+        history = ClipboardHistory(max_entries=3, eviction_window=1)
+        for i in range(5):
+            history.add(str(i))
+        self.assertEqual([entry.value for entry in history], ['4', '3', '2'])
+
+        history = ClipboardHistory(max_entries=0)
+        self.assertTrue(history.add('a') is None)
+        self.assertEqual((len(history), history.size), (0, 0))
+
+    def test_budget_evicts_largest_old_entry(self):
+        image = generate_random_image()
+        history = ClipboardHistory()
+        history.add('small')
+        history.add(image)
+        history.add('recent')
+        history.budget = history.size - 1
+        history.add('newest')
+        self.assertTrue(history.get(content_digest(image)) is None)
+        self.assertEqual([entry.value for entry in history], ['newest', 'recent', 'small'])
+        self.assertTrue(history.size <= history.budget)
+
+    def test_too_large(self):
+        history = ClipboardHistory(budget=10)
+        self.assertTrue(history.add('x' * 1000) is None)
+        self.assertEqual(len(history), 0)
+
+    def test_attach(self):
+        clipboard = Clipboard(MemoryBackend)
+        history = ClipboardHistory()
+        image = generate_random_image()
+        with history.attach(clipboard):
+            clipboard.set_text('Hello World')
+            clipboard.set_image(image)
+        clipboard.set_text('not recorded')
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history.latest().kind, 'image')
+        self.assertEqual(history[1].value, 'Hello World')
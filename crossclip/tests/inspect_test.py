@@ -0,0 +1,45 @@
+
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image
+
+
+class InspectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_empty(self):
+        self.assertEqual(self.clipboard.available_targets(), [])
+        self.assertFalse(self.clipboard.has_text())
+        self.assertFalse(self.clipboard.has_image())
+
+    def test_text(self):
+        self.clipboard.set_text('Hello World')
+        self.assertTrue(self.clipboard.has_text())
+        self.assertFalse(self.clipboard.has_image())
+        self.assertIn('text/plain', self.clipboard.available_targets())
+        self.assertEqual(self.clipboard.size_hint('text/plain'), len('Hello World'))
+
+    def test_no_payload_transfer(self):
+        rendered = []
+
+        def png():
+            rendered.append(True)
+            return generate_random_image()
+
+        self.clipboard.set_data({'image/png': png})
+        self.assertTrue(self.clipboard.has_image())
+        self.assertFalse(self.clipboard.has_text())
+        self.assertEqual(self.clipboard.available_targets(), ['image/png'])
+        self.assertTrue(self.clipboard.size_hint('image/png') is None)
+        self.assertEqual(rendered, [])
+
+    def test_cached(self):
+        clipboard = Clipboard(MemoryBackend, cache=True)
+        clipboard.set_text('Hello World')
+        self.assertTrue(clipboard.has_text())
+        clipboard.set_image(generate_random_image())
+        self.assertFalse(clipboard.has_text())
+        self.assertTrue(clipboard.has_image())
@@ -0,0 +1,101 @@
+
+import shutil
+import tempfile
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..archive import ClipboardArchive
+from ..instrument import Instrument, HistogramCollector, Histogram, phase, _NULL_PHASE
+from .clipboard_test import generate_random_image
+
+
+class InstrumentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.records = []
+        self.clipboard = Clipboard(MemoryBackend, instrument=self.records.append)
+
+    def test_records(self):
+        self.clipboard.set_text('Hello World')
+        self.assertEqual(self.clipboard.get_text(), 'Hello World')
+        write, read = self.records
+        self.assertEqual((write.operation, read.operation), ('set_text', 'get_text'))
+        self.assertEqual(read.source, 'MemoryBackend')
+        self.assertEqual(read.bytes, 11)
+        self.assertEqual(write.bytes, 11)
+        self.assertIn('backend', read.phases)
+        self.assertIn('hash', write.phases)
+        self.assertTrue(read.duration >= read.phases['backend'])
+        self.assertTrue(read.error is None)
+
+    def test_phases(self):
+        self.clipboard.set_image(generate_random_image())
+        self.clipboard.get_image(max_size=(10, 10))
+        self.assertIn('scale', self.records[-1].phases)
+        self.assertEqual(self.records[-1].bytes, 10 * 10 * 3)
+
+    def test_errors(self):
+        with self.assertRaises(RuntimeError):
+            self.clipboard.set_data({})
+        self.assertEqual(self.records[-1].error, 'RuntimeError')
+
+    def test_nested(self):
+        clipboard = Clipboard(MemoryBackend, coalesce=10, instrument=self.records.append)
+        clipboard.set_text('Pending')
+        self.assertEqual(clipboard.get_text(), 'Pending')
+        self.assertEqual([record.operation for record in self.records], ['set_text', 'get_text'])
+        # The coalesced write is committed within the read
+        self.assertIn('hash', self.records[-1].phases)
+
+    def test_cache(self):
+        collector = HistogramCollector()
+        clipboard = Clipboard(MemoryBackend, cache=True, instrument=Instrument(collector))
+        clipboard.set_text('Cached')
+        for _ in range(3):
+            clipboard.get_text()
+        entry = [entry for entry in collector.summary() if entry['operation'] == 'get_text'][0]
+        self.assertEqual((entry['cache_hits'], entry['cache_misses']), (2, 1))
+        self.assertEqual(entry['count'], 3)
+        self.assertEqual(entry['source'], 'MemoryBackend')
+        self.assertIn('backend', entry['phases'])
+        self.assertEqual(collector.histogram('get_text').count, 3)
+        collector.reset()
+        self.assertEqual(collector.summary(), [])
+
+    def test_disabled(self):
+        clipboard = Clipboard(MemoryBackend)
+        self.assertTrue(clipboard.instrument is None)
+        self.assertIs(phase('backend'), _NULL_PHASE)
+        clipboard.set_text('Quiet')
+        self.assertEqual(clipboard.get_text(), 'Quiet')
+
+    def test_archive(self):
+        path = tempfile.mkdtemp()
+        try:
+            with ClipboardArchive(path, instrument=self.records.append) as archive:
+                archive.store('x' * 1000)
+            record = self.records[-1]
+            self.assertEqual((record.operation, record.source), ('store', 'ClipboardArchive'))
+            self.assertEqual(record.bytes, 1000)
+            self.assertTrue({'hash', 'encode', 'write'} <= set(record.phases))
+        finally:
+            shutil.rmtree(path)
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_quantiles(self):
+        histogram = Histogram()
+        self.assertTrue(histogram.quantile(0.5) is None)
+        for _ in range(99):
+            histogram.add(0.001)
+        histogram.add(1.0)
+        self.assertTrue(0.001 <= histogram.quantile(0.5) < 0.002)
+        self.assertEqual(histogram.quantile(1.0), 1.0)
+        self.assertEqual(histogram.count, 100)
+        histogram.add(1e6)
+        self.assertEqual(histogram.counts[-1], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image, eval_images
+
+
+class MemoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_empty(self):
+        self.assertTrue(self.clipboard.get_text() is None)
+        self.assertTrue(self.clipboard.get_image() is None)
+
+    def test_text(self):
+        msg = 'Hello World'
+        self.clipboard.set_text(msg)
+        self.assertEqual(self.clipboard.get_text(), msg)
+
+    def test_image(self):
+        test_image = generate_random_image()
+        self.clipboard.set_image(test_image)
+        self.assertTrue(eval_images(test_image, self.clipboard.get_image()))
+
+    def test_single_owner(self):
+        # Setting one kind of content replaces the other, like a real clipboard
+        self.clipboard.set_text('Hello World')
+        self.clipboard.set_image(generate_random_image())
+        self.assertTrue(self.clipboard.get_text() is None)
+
+    def test_invalid_format(self):
+        self.clipboard.set_image(generate_random_image())
+        with self.assertRaises(RuntimeWarning):
+            self.clipboard.get_image('not-a-format')
@@ -0,0 +1,59 @@
+
+import os
+import sys
+import subprocess
+import unittest
+
+import numpy
+
+from ..clipboard import Clipboard
+from ..converters import ConversionGraph
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image
+
+
+class NumpyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_get(self):
+        image = generate_random_image()
+        self.clipboard.set_image(image)
+        array = self.clipboard.get_image('numpy')
+        self.assertTrue(isinstance(array, numpy.ndarray))
+        self.assertEqual(array.shape, (image.height, image.width, 3))
+        self.assertTrue(numpy.array_equal(array, numpy.asarray(image)))
+
+    def test_set(self):
+        array = (numpy.random.rand(20, 30, 4) * 255).astype(numpy.uint8)
+        self.clipboard.set_image(array)
+        self.assertTrue(numpy.array_equal(self.clipboard.get_image('numpy'), array))
+        self.assertEqual(self.clipboard.get_image().mode, 'RGBA')
+
+    def test_strided(self):
+        array = (numpy.random.rand(20, 30, 3) * 255).astype(numpy.uint8)[::2, ::3]
+        self.clipboard.set_image(array)
+        self.assertTrue(numpy.array_equal(self.clipboard.get_image('numpy'), array))
+
+    def test_invalid(self):
+        with self.assertRaises(RuntimeWarning):
+            self.clipboard.set_image(numpy.zeros((10, 10, 2), dtype=numpy.uint8))
+        with self.assertRaises(RuntimeWarning):
+            self.clipboard.set_image(numpy.zeros((10, 10, 3), dtype=numpy.float32))
+
+    def test_graph(self):
+        graph = ConversionGraph()
+        self.assertIn('numpy', graph.forms())
+        self.assertEqual(graph.identify(numpy.zeros((2, 2), dtype=numpy.uint8)), 'numpy')
+
+    def test_lazy_import(self):
+        # numpy is an optional extra: only converting an array may load it
+        code = ('import sys\nfrom crossclip.clipboard import Clipboard\n'
+                'from crossclip.memorybackend import MemoryBackend\n'
+                'from PIL import Image\n'
+                'Clipboard(MemoryBackend).set_image(Image.new("RGB", (2, 2)))\n'
+                'print("numpy" in sys.modules)')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(output.strip(), b'False')
@@ -0,0 +1,102 @@
+
+import os
+import sys
+import json
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from .. import registry as registry_module
+from ..registry import BackendRegistry, BackendsView
+from ..absbackend import AbstractBackend
+
+
+class DummyBackend(AbstractBackend):
+
+    def get_text(self):
+        return None
+
+    def get_image(self, form):
+        return None
+
+    def set_text(self, text):
+        pass
+
+    def set_image(self, img):
+        pass
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = BackendRegistry()
+        self.registry.register('dummy', ('crossclip.tests.registry_test', 'DummyBackend'))
+        self.registry.register('missing', ('crossclip.does_not_exist', 'Nothing'))
+        self.registry.register('none', None)
+
+    def test_lazy_load(self):
+        self.assertTrue(self.registry.load('dummy') is DummyBackend)
+
+    def test_unavailable(self):
+        with self.assertRaises(RuntimeError):
+            self.registry.load('missing')
+        with self.assertRaises(RuntimeError):
+            self.registry.load('none')
+        with self.assertRaises(RuntimeError):
+            self.registry.load('unknown')
+
+    def test_view(self):
+        view = BackendsView(self.registry)
+        self.assertTrue(view['dummy'] is DummyBackend)
+        self.assertTrue(view['missing'] is None)
+        self.assertTrue(view['none'] is None)
+        self.assertEqual(set(view), {'dummy', 'missing', 'none'})
+        with self.assertRaises(KeyError):
+            view['unknown']
+
+    def test_probe_runs_once(self):
+        with mock.patch.object(registry_module, 'probe_platform', return_value='dummy') as probe:
+            self.assertEqual(self.registry.platform(disk_cache=False), 'dummy')
+            self.assertEqual(self.registry.platform(disk_cache=False), 'dummy')
+            self.assertEqual(probe.call_count, 1)
+        self.assertTrue(self.registry.select() is DummyBackend)
+
+    def test_explicit_select(self):
+        with mock.patch.object(registry_module, 'probe_platform') as probe:
+            self.assertTrue(self.registry.select('dummy') is DummyBackend)
+            self.assertEqual(self.registry.current(), 'dummy')
+            self.assertTrue(self.registry.select() is DummyBackend)
+            probe.assert_not_called()
+
+        with self.assertRaises(RuntimeError):
+            self.registry.select(int)
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'probe.json')
+            with mock.patch.object(registry_module, 'probe_platform', return_value='dummy') as probe:
+                self.assertEqual(self.registry.platform(disk_cache=path), 'dummy')
+                self.assertEqual(probe.call_count, 1)
+
+            with open(path) as fh:
+                self.assertEqual(json.load(fh), {registry_module.environment_key(): 'dummy'})
+
+            # A fresh process (registry) reuses the cached answer
+            fresh = BackendRegistry()
+            with mock.patch.object(registry_module, 'probe_platform') as probe:
+                self.assertEqual(fresh.platform(disk_cache=path), 'dummy')
+                probe.assert_not_called()
+
+    @unittest.skipUnless(sys.platform == 'linux', 'Desktop detection is linux specific')
+    def test_probe_desktops(self):
+        with mock.patch.dict(os.environ, {'XDG_CURRENT_DESKTOP': 'ubuntu:GNOME'}):
+            self.assertEqual(registry_module.probe_platform(), 'gtk')
+        with mock.patch.dict(os.environ, {'XDG_CURRENT_DESKTOP': 'KDE'}):
+            self.assertEqual(registry_module.probe_platform(), 'qt')
+
+    def test_cheap_import(self):
+        code = 'import sys, crossclip; print(sorted({"PIL", "numpy"} & set(sys.modules)))'
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+        self.assertEqual(output.strip(), b'[]')
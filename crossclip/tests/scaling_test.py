@@ -0,0 +1,52 @@
+
+import unittest
+from io import BytesIO
+
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..scaling import fit_size, scale_pillow, decode_reduced
+from .clipboard_test import generate_random_image
+
+
+class FitSizeTestCase(unittest.TestCase):
+
+    def test_fit(self):
+        self.assertEqual(fit_size((1000, 500), max_size=(100, 100)), (100, 50))
+        self.assertEqual(fit_size((1000, 500), reduce=4), (250, 125))
+        self.assertEqual(fit_size((1000, 500), max_size=(200, 200), reduce=10), (100, 50))
+        self.assertEqual(fit_size((50, 50), max_size=(100, 100)), (50, 50))
+        self.assertEqual(fit_size((1000, 1), max_size=(10, 10)), (10, 1))
+        with self.assertRaises(RuntimeError):
+            fit_size((10, 10), reduce=0.5)
+
+    def test_scale_pillow(self):
+        image = generate_random_image(size=(64, 32))
+        self.assertEqual(scale_pillow(image, (16, 8)).size, (16, 8))
+        self.assertEqual(scale_pillow(image, (20, 10)).size, (20, 10))
+        self.assertTrue(scale_pillow(image, (64, 32)) is image)
+
+    def test_decode_jpeg(self):
+        buf = BytesIO()
+        generate_random_image(size=(800, 400)).save(buf, format='JPEG')
+        image = decode_reduced(buf.getvalue(), max_size=(100, 100))
+        self.assertEqual(image.size, (100, 50))
+
+
+class ReducedReadTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_native(self):
+        self.clipboard.set_image(generate_random_image(size=(300, 200)))
+        self.assertEqual(self.clipboard.get_image(max_size=(30, 30)).size, (30, 20))
+        self.assertEqual(self.clipboard.get_image(reduce=2).size, (150, 100))
+        self.assertEqual(self.clipboard.get_image().size, (300, 200))
+
+    def test_jpeg_offer(self):
+        image = generate_random_image(size=(640, 480))
+        self.clipboard.set_data({'image/jpeg': image})
+        self.assertEqual(self.clipboard.get_image(max_size=(64, 64)).size, (64, 48))
+
+    def test_empty(self):
+        self.assertTrue(self.clipboard.get_image(max_size=(10, 10)) is None)
@@ -0,0 +1,53 @@
+
+import unittest
+
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..search import TextIndex
+
+
+class SearchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TextIndex()
+        self.index.add('def parse_args(argv):', when=10)
+        self.index.add('The Quick brown fox', when=20)
+        self.index.add('brownies recipe', when=30)
+        self.index.add('ssh user@example.com', when=40)
+
+    def texts(self, results):
+        return [result.text for result in results]
+
+    def test_substring(self):
+        self.assertEqual(self.texts(self.index.search('brown')), ['brownies recipe', 'The Quick brown fox'])
+        self.assertEqual(self.texts(self.index.search('QUICK')), ['The Quick brown fox'])
+        self.assertEqual(self.texts(self.index.search('rse_ar')), ['def parse_args(argv):'])
+        self.assertEqual(self.index.search('missing'), [])
+
+    def test_short_query(self):
+        self.assertEqual(self.texts(self.index.search('@')), ['ssh user@example.com'])
+
+    def test_prefix(self):
+        self.assertEqual(self.texts(self.index.search('row', prefix=True)), [])
+        self.assertEqual(self.texts(self.index.search('exam', prefix=True)), ['ssh user@example.com'])
+        self.assertEqual(self.texts(self.index.search('qu', prefix=True)), ['The Quick brown fox'])
+
+    def test_time_range(self):
+        self.assertEqual(self.texts(self.index.search('brown', since=25)), ['brownies recipe'])
+        self.assertEqual(self.texts(self.index.search('brown', until=25)), ['The Quick brown fox'])
+        self.index.add('brown paper', when=5)
+        self.assertEqual(self.texts(self.index.search('brown', until=15)), ['brown paper'])
+
+    def test_limit_and_remove(self):
+        self.assertEqual(len(self.index.search('o', limit=2)), 2)
+        result = self.index.search('fox')[0]
+        self.index.remove(result.id)
+        self.assertEqual(self.index.search('fox'), [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_attach(self):
+        clipboard = Clipboard(MemoryBackend)
+        index = TextIndex()
+        with index.attach(clipboard):
+            clipboard.set_text('copied last week')
+        self.assertEqual(self.texts(index.search('last')), ['copied last week'])
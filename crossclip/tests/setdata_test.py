@@ -0,0 +1,58 @@
+
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..targets import TargetOffer, expand_text_targets, render
+from .clipboard_test import generate_random_image, eval_images
+
+
+class TargetOfferTestCase(unittest.TestCase):
+
+    def test_lazy(self):
+        calls = []
+
+        def html():
+            calls.append('html')
+            return '<b>Hello</b>'
+
+        offer = TargetOffer({'text/plain': 'Hello', 'text/html': html})
+        self.assertEqual(calls, [])
+        self.assertEqual(offer.get('text/html'), b'<b>Hello</b>')
+        self.assertEqual(offer.get('text/html'), b'<b>Hello</b>')
+        self.assertEqual(calls, ['html'])
+        self.assertTrue(offer.get('image/png') is None)
+
+    def test_expand(self):
+        data = expand_text_targets({'text/plain': 'Hello', 'text/html': '<b>Hello</b>'})
+        self.assertEqual(data['UTF8_STRING'], 'Hello')
+        self.assertEqual(data['text/html'], '<b>Hello</b>')
+
+    def test_render_image(self):
+        payload = render('image/png', generate_random_image())
+        self.assertTrue(payload.startswith(b'\x89PNG'))
+        with self.assertRaises(RuntimeWarning):
+            render('text/plain', object())
+
+
+class SetDataTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_text_and_image(self):
+        image = generate_random_image()
+        rendered = []
+
+        def png():
+            rendered.append(True)
+            return image
+
+        self.clipboard.set_data({'text/plain': 'Hello World', 'image/png': png})
+        self.assertEqual(self.clipboard.get_text(), 'Hello World')
+        self.assertEqual(rendered, [])
+        self.assertTrue(eval_images(image, self.clipboard.get_image()))
+        self.assertEqual(rendered, [True])
+
+    def test_empty(self):
+        with self.assertRaises(RuntimeError):
+            self.clipboard.set_data({})
@@ -0,0 +1,118 @@
+
+import sys
+import time
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..snapshot import parse_timestamp, read_batch
+from .clipboard_test import generate_random_image, eval_images
+
+
+class ChangingBackend(MemoryBackend):
+    """ Replaces the clipboard contents while the first few batches are read
+    """
+    changes = 1
+
+    def request_contents(self, target, callback):
+        if self.changes > 0:
+            self.changes -= 1
+            self.set_text('Changed {}'.format(self.changes))
+        super().request_contents(target, callback)
+
+
+class StampedBackend(MemoryBackend):
+    """ Can't report changes, but offers a TIMESTAMP that moves on every read
+    of the first batch
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stamps = [1, 2]
+
+    def _connect_changes(self):
+        raise NotImplementedError('No change notifications')
+
+    def available_targets(self):
+        return super().available_targets() + ['TIMESTAMP']
+
+    def get_contents(self, target):
+        if target == 'TIMESTAMP':
+            stamp = self.stamps.pop(0) if self.stamps else 3
+            return stamp.to_bytes(4, sys.byteorder)
+        return super().get_contents(target)
+
+
+class DeferredBackend(MemoryBackend):
+    """ Answers requests from `process_events`, like the toolkit backends
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.queued = []
+
+    def request_contents(self, target, callback):
+        self.queued.append(lambda: callback(self.get_contents(target)))
+
+    def request_targets(self, callback):
+        self.queued.append(lambda: callback(self.available_targets()))
+
+    def process_events(self, timeout=0):
+        queued, self.queued = self.queued, []
+        for answer in queued:
+            answer()
+
+
+class SnapshotTestCase(unittest.TestCase):
+
+    def test_snapshot(self):
+        clipboard = Clipboard(MemoryBackend)
+        image = generate_random_image()
+        clipboard.set_data({'text/plain': 'Hello', 'text/html': '<b>Hello</b>', 'image/png': image})
+        snap = clipboard.snapshot(['text/plain', 'text/html', 'image/png', 'text/rtf'])
+        self.assertEqual(list(snap), ['text/plain', 'text/html', 'image/png', 'text/rtf'])
+        self.assertEqual(bytes(snap['text/html']), b'<b>Hello</b>')
+        self.assertTrue(snap['text/rtf'] is None)
+        self.assertEqual(snap.get_text(), 'Hello')
+        self.assertTrue(eval_images(image, snap.get_image()))
+        self.assertEqual(snap.count, clipboard.backend.change_count)
+        self.assertTrue(snap.timestamp is None)
+
+    def test_retry(self):
+        clipboard = Clipboard(ChangingBackend)
+        clipboard.set_text('Hello')
+        snap = clipboard.snapshot(['text/plain', 'UTF8_STRING'])
+        self.assertEqual(snap.get_text(), 'Changed 0')
+        self.assertEqual(snap['text/plain'], snap['UTF8_STRING'])
+
+        clipboard.backend.changes = 10
+        with self.assertRaises(RuntimeError):
+            clipboard.snapshot(['text/plain'], retries=2)
+
+    def test_timestamp(self):
+        clipboard = Clipboard(StampedBackend)
+        clipboard.set_text('Hello')
+        snap = clipboard.snapshot(['text/plain'])
+        self.assertEqual(snap.timestamp, 3)
+        self.assertEqual(snap.get_text(), 'Hello')
+        self.assertEqual(clipboard.backend.stamps, [])
+
+    def test_deadline(self):
+        clipboard = Clipboard(DeferredBackend)
+        clipboard.set_data({'text/plain': 'Hello', 'text/html': '<b>Hello</b>'})
+        snap = clipboard.snapshot(['text/plain', 'text/html'], timeout=5)
+        self.assertEqual(snap.get_text(), 'Hello')
+        self.assertEqual(bytes(snap['text/html']), b'<b>Hello</b>')
+        results = read_batch(clipboard.backend, ['text/plain'], deadline=time.monotonic() + 5)
+        self.assertEqual([bytes(data) for data in results], [b'Hello'])
+
+    def test_helpers(self):
+        self.assertEqual(parse_timestamp((1234).to_bytes(8, sys.byteorder)), 1234)
+        self.assertTrue(parse_timestamp(b'\1') is None)
+        backend = MemoryBackend()
+        backend.set_text('Hi')
+        self.assertEqual([bytes(data) for data in read_batch(backend, ['text/plain'])], [b'Hi'])
+        self.assertEqual(read_batch(backend, []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
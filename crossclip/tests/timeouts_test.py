@@ -0,0 +1,86 @@
+
+import time
+import threading
+import unittest
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from ..timeouts import ReadRequest, TIMED_OUT, CANCELLED
+
+
+class SlowBackend(MemoryBackend):
+    """ Memory backend whose owner answers requests after a delay, or never
+    """
+    delay = None
+
+    def _answer_later(self, read, callback):
+        if self.delay is not None:
+            timer = threading.Timer(self.delay, lambda: callback(read()))
+            timer.daemon = True
+            timer.start()
+
+    def request_text(self, callback):
+        self._answer_later(self.get_text, callback)
+
+    def request_contents(self, target, callback):
+        self._answer_later(lambda: self.get_contents(target), callback)
+
+    def request_targets(self, callback):
+        self._answer_later(self.available_targets, callback)
+
+
+class TimeoutTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(SlowBackend, cache=True)
+        self.clipboard.set_text('Hello World')
+
+    def test_timed_out(self):
+        start = time.monotonic()
+        self.assertIs(self.clipboard.get_text(timeout=0.05), TIMED_OUT)
+        self.assertTrue(time.monotonic() - start < 1)
+        self.assertFalse(TIMED_OUT)
+        self.assertIs(self.clipboard.get_bytes('text/plain', timeout=0.01), TIMED_OUT)
+        self.assertIs(self.clipboard.available_targets(timeout=0.01), TIMED_OUT)
+        self.assertIs(self.clipboard.has_image(timeout=0.01), TIMED_OUT)
+        self.assertIs(self.clipboard.snapshot(['text/plain'], timeout=0.01), TIMED_OUT)
+
+        # Timeouts aren't cached
+        self.clipboard.backend.delay = 0
+        self.assertEqual(self.clipboard.get_text(timeout=1), 'Hello World')
+        self.assertEqual(bytes(self.clipboard.get_bytes('text/plain', timeout=1)), b'Hello World')
+        self.assertTrue(self.clipboard.has_text(timeout=1))
+
+    def test_no_timeout(self):
+        # Without a timeout the blocking reads are used
+        self.assertEqual(self.clipboard.get_text(), 'Hello World')
+
+    def test_cancel(self):
+        request = self.clipboard.request_text()
+        self.assertFalse(request.done())
+        self.assertIs(request.wait(0.01), TIMED_OUT)
+        self.assertTrue(request.cancel())
+        self.assertTrue(request.cancelled())
+        self.assertIs(request.wait(), CANCELLED)
+
+    def test_late_answer(self):
+        self.clipboard.backend.delay = 0.05
+        request = self.clipboard.request_text()
+        request.cancel()
+        time.sleep(0.1)
+        self.assertIs(request.wait(), CANCELLED)
+
+        request = self.clipboard.request_bytes('text/plain')
+        self.assertEqual(bytes(request.wait(timeout=5)), b'Hello World')
+        self.assertFalse(request.cancel())
+
+    def test_synchronous(self):
+        clipboard = Clipboard(MemoryBackend)
+        clipboard.set_text('Now')
+        request = ReadRequest(clipboard.backend, clipboard.backend.request_text)
+        self.assertTrue(request.done())
+        self.assertEqual(request.wait(0), 'Now')
+        self.assertEqual(clipboard.request_targets().wait(), clipboard.available_targets())
+
+
+if __name__ == '__main__':
+    unittest.main()
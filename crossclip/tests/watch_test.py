@@ -0,0 +1,86 @@
+
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image
+
+
+class WatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(MemoryBackend)
+
+    def test_callback(self):
+        changes = []
+        watcher = self.clipboard.watch(changes.append)
+        self.clipboard.set_text('Hello World')
+        self.clipboard.set_image(generate_random_image())
+        watcher.close()
+        self.clipboard.set_text('Not seen')
+
+        self.assertEqual([change.count for change in changes], [1, 2])
+        self.assertTrue('UTF8_STRING' in changes[0].targets)
+        self.assertEqual(changes[1].targets, ['image/png'])
+
+    def test_iterator(self):
+        def writer():
+            for i in range(3):
+                self.clipboard.set_text(str(i))
+
+        with self.clipboard.watch() as watcher:
+            thread = threading.Thread(target=writer)
+            thread.start()
+            counts = [next(watcher).count for _ in range(3)]
+            thread.join()
+        self.assertEqual(counts, [1, 2, 3])
+        self.assertEqual(list(watcher), [])
+
+    def test_async_iterator(self):
+        async def run():
+            watcher = self.clipboard.watch()
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, self.clipboard.set_text, 'Hello World')
+            async for change in watcher:
+                watcher.close()
+                return change
+
+        change = asyncio.run(run())
+        self.assertEqual(change.count, 1)
+
+    def test_async_change_while_starting(self):
+        async def run():
+            watcher = self.clipboard.watch()
+            make_event = asyncio.Event
+
+            def event():
+                # A change arriving while the iterator starts up
+                self.clipboard.set_text('Early')
+                return make_event()
+
+            with mock.patch.object(asyncio, 'Event', event):
+                change = await watcher.__anext__()
+            watcher.close()
+            return change
+
+        self.assertEqual(asyncio.run(run()).count, 1)
+
+    def test_no_polling(self):
+        polls = []
+        self.clipboard.backend.process_events = lambda timeout=0: polls.append(timeout)
+
+        async def run():
+            watcher = self.clipboard.watch()
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.1, self.clipboard.set_text, 'Hello World')
+            change = await watcher.__anext__()
+            watcher.close()
+            return change
+
+        self.assertEqual(asyncio.run(run()).count, 1)
+        threading.Timer(0.1, self.clipboard.set_text, ['Again']).start()
+        with self.clipboard.watch() as watcher:
+            self.assertEqual(next(watcher).count, 2)
+        self.assertEqual(polls, [])
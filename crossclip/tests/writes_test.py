@@ -0,0 +1,100 @@
+
+import time
+import unittest
+from .. import clipboard as clipboard_module
+from ..clipboard import Clipboard
+from ..memorybackend import MemoryBackend
+from .clipboard_test import generate_random_image
+
+
+class CountingBackend(MemoryBackend):
+    """ Memory backend that counts writes and can lose ownership
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+        self.owner = True
+
+    def owns_clipboard(self):
+        return self.owner
+
+    def set_text(self, text):
+        self.writes += 1
+        self.owner = True
+        super().set_text(text)
+
+    def set_image(self, image, converter=None):
+        self.writes += 1
+        self.owner = True
+        super().set_image(image, converter)
+
+
+class DeduplicateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(CountingBackend)
+
+    def test_text(self):
+        for _ in range(3):
+            self.clipboard.set_text('Hello World')
+        self.assertEqual(self.clipboard.backend.writes, 1)
+        self.clipboard.set_text('Changed')
+        self.assertEqual(self.clipboard.backend.writes, 2)
+
+    def test_image(self):
+        image = generate_random_image()
+        self.clipboard.set_image(image)
+        self.clipboard.set_image(image.copy())
+        self.assertEqual(self.clipboard.backend.writes, 1)
+
+        # Same pixels but a different mode is different content
+        self.clipboard.set_image(image.convert('RGBA'))
+        self.assertEqual(self.clipboard.backend.writes, 2)
+
+    def test_lost_ownership(self):
+        self.clipboard.set_text('Hello World')
+        self.clipboard.backend.owner = False
+        self.clipboard.set_text('Hello World')
+        self.assertEqual(self.clipboard.backend.writes, 2)
+
+    def test_disabled(self):
+        clipboard = Clipboard(CountingBackend, deduplicate=False)
+        clipboard.set_text('Hello World')
+        clipboard.set_text('Hello World')
+        self.assertEqual(clipboard.backend.writes, 2)
+
+
+class CoalesceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clipboard = Clipboard(CountingBackend, coalesce=0.05)
+
+    def test_burst(self):
+        for i in range(10):
+            self.clipboard.set_text('progress {}'.format(i))
+        self.assertEqual(self.clipboard.backend.writes, 0)
+
+        deadline = time.monotonic() + 5
+        while self.clipboard.backend.writes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.clipboard.backend.writes, 1)
+        self.assertEqual(self.clipboard.backend.get_text(), 'progress 9')
+
+    def test_read_flushes(self):
+        self.clipboard.set_text('Hello World')
+        self.assertEqual(self.clipboard.get_text(), 'Hello World')
+        self.assertEqual(self.clipboard.backend.writes, 1)
+
+    def test_exit_flushes(self):
+        self.clipboard.coalesce = 60
+        self.clipboard.set_text('Hello World')
+        self.assertEqual(self.clipboard.backend.writes, 0)
+        clipboard_module._flush_coalesced()
+        self.assertEqual(self.clipboard.backend.writes, 1)
+        self.assertEqual(self.clipboard.backend.get_text(), 'Hello World')
+        self.assertFalse(self.clipboard in clipboard_module._coalescing)
+
+    def test_invalid_image(self):
+        with self.assertRaises(RuntimeWarning):
+            self.clipboard.set_image(object())
@@ -0,0 +1,148 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# timeouts.py -- cancellable reads with deadlines
+
+import time
+import threading
+
+
+class _Outcome:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+    def __bool__(self):
+        return False
+
+
+TIMED_OUT = _Outcome('TIMED_OUT')
+""" Returned by a read whose deadline passed before the owner answered.
+Distinct from None, which means the clipboard holds nothing of that kind
+"""
+
+CANCELLED = _Outcome('CANCELLED')
+""" Returned by waiting on a read that was cancelled
+"""
+
+
+def deadline_after(timeout):
+    """
+    :param timeout: Seconds from now, or None
+    :returns float: `time.monotonic()` deadline, or None for no deadline
+    """
+    return None if timeout is None else time.monotonic() + timeout
+
+
+class ReadRequest:
+    """ Handle of an asynchronous clipboard read
+
+    The read is issued through one of the backend's `request_*` calls as
+    soon as the handle is created. `wait` dispatches the toolkit's events
+    until the answer arrives or the deadline passes; it never enters a
+    nested toolkit loop the way the `wait_for_*` calls do, so a hung owner
+    can't hold the caller past its deadline.
+
+    Cancelling stops waiting, and aborts the read if the backend's request
+    call returned a way to. Otherwise the toolkit may still complete the
+    transfer, and its answer is then dropped.
+    """
+
+    poll_interval = 0.005
+    """ Longest time between two toolkit event dispatches while waiting, in seconds
+    """
+
+    def __init__(self, backend, issue, convert=None):
+        """
+        :param backend: Backend dispatching the answer
+        :param issue: Callable taking the callback, e.g `backend.request_text`
+        :param convert: Applied to the answer by `wait`, on the waiting thread (default: None)
+        """
+        self._backend = backend
+        self._convert = convert
+        self._lock = threading.Lock()
+        self._answered = threading.Event()
+        self._cancelled = False
+        self._value = None
+        self._abort = issue(self._resolve)
+
+    def _resolve(self, value):
+        with self._lock:
+            if self._answered.is_set():
+                return
+            self._value = value
+            self._answered.set()
+
+    def done(self):
+        """
+        :returns bool: True once answered or cancelled
+        """
+        return self._answered.is_set()
+
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """
+        Stops waiting for the answer. Waiting threads return `CANCELLED`.
+
+        :returns bool: False if the answer had already arrived
+        """
+        with self._lock:
+            if self._answered.is_set():
+                return self._cancelled
+            self._cancelled = True
+            self._answered.set()
+        if callable(self._abort):
+            self._abort()
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Waits for the answer.
+
+        :param timeout: Longest wait in seconds, or None to wait for as long as
+                        the owner takes (default: None)
+        :returns: The value read, `TIMED_OUT` or `CANCELLED`
+        """
+        return self.wait_until(deadline_after(timeout))
+
+    def wait_until(self, deadline):
+        """
+        Waits for the answer until a deadline.
+
+        :param deadline: `time.monotonic()` value, or None
+        :returns: The value read, `TIMED_OUT` or `CANCELLED`
+        """
+        while not self._answered.is_set():
+            interval = self.poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return TIMED_OUT
+                interval = min(interval, remaining)
+            self._backend.process_events(interval)
+        if self._cancelled:
+            return CANCELLED
+        value = self._value
+        if self._convert is not None and value is not None:
+            value = self._convert(value)
+        return value
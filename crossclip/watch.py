@@ -0,0 +1,183 @@
+
+# crossclip -- cross platform clipboard API
+# Copyright (C) 2019  Charlie Sale
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# watch.py -- clipboard change notifications
+
+import asyncio
+import threading
+from collections import deque
+
+from .targets import is_text_target, is_image_target
+
+
+def read_change(clipboard, change, images=True):
+    """
+    Reads the value a change placed on the clipboard. Only the list of
+    targets is fetched for changes that carry neither text nor an image.
+
+    :param clipboard: `Clipboard` the change was seen on
+    :param change: `ClipboardChange`
+    :param images: If false, images are ignored (default: True)
+    :returns: Text, image, or None
+    """
+    targets = change.targets or []
+    if any(is_text_target(target) for target in targets):
+        return clipboard.get_text()
+    if images and any(is_image_target(target) for target in targets):
+        return clipboard.get_image()
+    return None
+
+
+class ClipboardWatcher:
+    """ Subscription to clipboard changes
+
+    A watcher either forwards each `ClipboardChange` to a callback, or queues
+    them to be consumed by iterating over it, with a plain or an async for
+    loop. Iterating sleeps until a change arrives when the backend notifies
+    on its own, e.g because the toolkit's main loop runs elsewhere; otherwise
+    it dispatches the toolkit's events while waiting. Nothing is fetched from
+    the clipboard unless `ClipboardChange.targets` is read.
+    """
+    poll_interval = 0.05
+    """ Longest time between two toolkit event dispatches while iterating
+    asynchronously, in seconds. Only backends whose events nobody else
+    dispatches are polled; see `AbstractBackend.notifies_in_background`
+    """
+
+    def __init__(self, backend, callback=None, max_queue=1024):
+        """
+        Starts watching the clipboard.
+
+        :param backend: Backend to watch
+        :type backend: instance of `AbstractBackend`
+        :param callback: Called with each `ClipboardChange`. If None, changes
+                         are queued for iteration (default: None)
+        :param max_queue: Most changes kept while nobody iterates. The oldest
+                          are dropped first (default: 1024)
+        :raises NotImplementedError: If the backend can't report changes
+        """
+        self.backend = backend
+        self._callback = callback
+        self._queue = deque(maxlen=max_queue)
+        self._condition = threading.Condition()
+        self._loop = None
+        self._wakeup = None
+        self._closed = False
+        self._handle = backend.add_change_listener(self._on_change)
+
+    def _on_change(self, change):
+        if self._callback is not None:
+            self._callback(change)
+            return
+
+        with self._condition:
+            self._queue.append(change)
+            self._condition.notify_all()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    @property
+    def closed(self):
+        """
+        True once `close` has been called.
+        """
+        return self._closed
+
+    def close(self):
+        """
+        Stops watching. Iterators stop once the queued changes are consumed.
+        """
+        if not self._closed:
+            self._closed = True
+            self.backend.remove_change_listener(self._handle)
+            with self._condition:
+                self._condition.notify_all()
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            self.backend.wakeup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _pop(self):
+        with self._condition:
+            if self._queue:
+                return self._queue.popleft()
+        return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """
+        Blocks until the next change. If nothing else dispatches the backend's
+        events, they are dispatched while waiting.
+
+        :returns: `ClipboardChange`
+        """
+        while True:
+            change = self._pop()
+            if change is not None:
+                return change
+            if self._closed:
+                raise StopIteration
+            if self.backend.notifies_in_background:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._queue or self._closed)
+            elif self.backend.has_events:
+                # Sleeps in the toolkit until an event, or close() wakes it
+                self.backend.process_events(None)
+            else:
+                self.backend.process_events(self.poll_interval)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """
+        Waits for the next change without blocking the event loop.
+
+        :returns: `ClipboardChange`
+        """
+        if self._loop is None:
+            # Change callbacks may run on other threads: _wakeup must exist
+            # by the time they see _loop
+            self._wakeup = asyncio.Event()
+            self._loop = asyncio.get_running_loop()
+
+        delay = 0.001
+        while True:
+            change = self._pop()
+            if change is not None:
+                return change
+            if self._closed:
+                raise StopAsyncIteration
+            if self.backend.notifies_in_background:
+                await self._wakeup.wait()
+            else:
+                # Nobody else dispatches the toolkit's events: poll, backing
+                # off while the clipboard stays quiet
+                self.backend.process_events()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    delay = min(delay * 2, self.poll_interval)
+            self._wakeup.clear()
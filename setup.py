@@ -14,13 +14,14 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/softwaresale/crossclip",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=['benchmarks']),
     install_requires=[
         'Pillow',
     ],
     extras_require={
         'GTK': ['pygobject'],
         'Qt': ['PyQt5'],
+        'numpy': ['numpy'],
     },
     test_suite='nose.collector',
     tests_require=['nose', 'numpy'],